@@ -0,0 +1 @@
+# benchmarks and test data generators for mtf2json (not part of the installed package)
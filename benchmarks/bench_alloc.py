@@ -0,0 +1,92 @@
+"""
+Per-file allocation benchmark of the MTF tokenizers.
+
+Tokenizes a synthetic corpus (see `benchmarks.synth`) or a real MTF tree with
+the bytes tokenizer (file paths and raw content, used by 'read_mtf()') and with
+the text tokenizer (decoded text streams, i.e. every line decoded to `str` before
+it's split) and reports the time and the peak of the allocated memory per file
+(measured with 'tracemalloc', parse caches warmed up).
+
+Usage: `python -m benchmarks.bench_alloc [--count N] [--mtf-dir DIR]`
+"""
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+from mtf2json.mtf2json import read_mtf, iter_mtf_events, MTFEvent
+
+
+def _bytes_events(path: Path) -> Iterator[MTFEvent]:
+    return iter_mtf_events(path)
+
+
+def _text_events(path: Path) -> Iterator[MTFEvent]:
+    with open(path, 'r', encoding='utf8', errors='mixed') as file:
+        yield from iter_mtf_events(file)
+
+
+def _read_mtf(path: Path) -> None:
+    read_mtf(path)
+
+
+def _consume(tokenize: Callable[[Path], Iterator[MTFEvent]]) -> Callable[[Path], None]:
+    def run(path: Path) -> None:
+        deque(tokenize(path), maxlen=0)
+    return run
+
+
+def measure(files: List[Path], convert: Callable[[Path], None]) -> Tuple[float, float]:
+    """
+    Return the mean time (in µs) and the mean allocation peak (in KiB) per file.
+    """
+    # warm up the file system and parse caches
+    for path in files:
+        convert(path)
+    start = time.perf_counter()
+    for path in files:
+        convert(path)
+    duration = time.perf_counter() - start
+    peak = 0
+    tracemalloc.start()
+    try:
+        for path in files:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            convert(path)
+            peak += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return duration / len(files) * 1e6, peak / len(files) / 1024
+
+
+def run(files: List[Path]) -> None:
+    print(f"Tokenizing {len(files)} files")
+    cases = [
+        ('bytes tokenizer', _consume(_bytes_events)),
+        ('text tokenizer', _consume(_text_events)),
+        ('read_mtf()', _read_mtf),
+    ]
+    for name, convert in cases:
+        micros, kib = measure(files, convert)
+        print(f"  {name:16} {micros:8.1f} µs/file  peak {kib:8.1f} KiB/file")
+
+
+def main() -> None:
+    import argparse
+    from benchmarks.synth import write_dir
+    parser = argparse.ArgumentParser(description="Per-file allocation benchmark of the mtf2json tokenizers.")
+    parser.add_argument('--count', '-n', type=int, default=1000, help="Nr. of synthetic files.")
+    parser.add_argument('--seed', '-s', type=int, default=0, help="Random seed of the synthetic corpus.")
+    parser.add_argument('--mtf-dir', '-M', type=str, help="Use the MTF files in this directory instead of a synthetic corpus.")
+    args = parser.parse_args()
+    if args.mtf_dir:
+        run(sorted(Path(args.mtf_dir).rglob('*.mtf')))
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run(write_dir(Path(tmpdir), args.count, args.seed))
+
+
+if __name__ == '__main__':
+    main()
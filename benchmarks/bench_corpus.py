@@ -0,0 +1,70 @@
+"""
+Full-corpus conversion benchmark.
+
+Converts a synthetic corpus (see `benchmarks.synth`) or a real MTF tree
+(e.g. a MegaMek checkout) and reports the throughput with and without
+the parse caches, as well as the cache hit rates.
+
+Usage: `python -m benchmarks.bench_corpus [--count N] [--mtf-dir DIR]`
+"""
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from mtf2json.mtf2json import read_mtf, parse_cache_info, clear_parse_cache
+from benchmarks.synth import write_dir
+
+
+def convert_all(files: List[Path], cached: bool = True) -> float:
+    """
+    Convert all given files and return the duration in seconds.
+    If `cached` is False, the parse caches are cleared before each file.
+    """
+    clear_parse_cache()
+    start = time.perf_counter()
+    for mtf_file in files:
+        if not cached:
+            clear_parse_cache()
+        read_mtf(mtf_file)
+    return time.perf_counter() - start
+
+
+def hit_rates() -> Dict[str, float]:
+    """
+    Return the hit rate of each parse cache.
+    """
+    rates: Dict[str, float] = {}
+    for name, info in parse_cache_info().items():
+        total = info['hits'] + info['misses']
+        rates[name] = info['hits'] / total if total else 0.0
+    return rates
+
+
+def run(files: List[Path], repeat: int = 3) -> None:
+    print(f"Converting {len(files)} files")
+    # warm up the file system cache
+    convert_all(files)
+    uncached = min(convert_all(files, cached=False) for _ in range(repeat))
+    print(f"  without parse cache: {uncached:7.3f}s ({len(files) / uncached:8.1f} files/s)")
+    cached = min(convert_all(files, cached=True) for _ in range(repeat))
+    print(f"  with parse cache:    {cached:7.3f}s ({len(files) / cached:8.1f} files/s)")
+    for name, rate in hit_rates().items():
+        print(f"  {name} hit rate: {rate:.1%}")
+
+
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Full-corpus conversion benchmark for mtf2json.")
+    parser.add_argument('--count', '-n', type=int, default=2000, help="Nr. of synthetic files.")
+    parser.add_argument('--seed', '-s', type=int, default=0, help="Random seed of the synthetic corpus.")
+    parser.add_argument('--mtf-dir', '-M', type=str, help="Use the MTF files in this directory instead of a synthetic corpus.")
+    args = parser.parse_args()
+    if args.mtf_dir:
+        run(sorted(Path(args.mtf_dir).rglob('*.mtf')))
+    else:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            run(write_dir(Path(tmpdir), args.count, args.seed))
+
+
+if __name__ == '__main__':
+    main()
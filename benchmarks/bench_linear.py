@@ -0,0 +1,141 @@
+"""
+Worst-case input benchmark for the MTF line classification and parsing.
+
+Inserts adversarial lines (huge fluff, thousands of commas and colons) of
+increasing size into a valid MTF file and measures the conversion time.
+The time per input byte must stay (roughly) constant, i.e. the conversion
+scales linearly with the input size. 'call_ratio()' is a deterministic supplement:
+it counts the Python and builtin function calls (i.e. it can't detect quadratic work
+inside a single builtin call like 'str.find()').
+
+Usage: `python -m benchmarks.bench_linear [--max-size BYTES]`
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+from mtf2json.mtf2json import read_mtf, read_mtf_bytes
+
+
+template = Path(__file__).parent.parent / 'tests/mtf/biped/Atlas_AS7-K.mtf'
+
+
+# each case returns the key of the line that is replaced and the adversarial line
+def _fluff(n: int) -> Tuple[str, str]:
+    return ('overview', 'overview:' + 'word ' * (n // 5))
+
+
+def _commas(n: int) -> Tuple[str, str]:
+    # commas before a colon -> not a key line
+    return ('history', 'history:' + ',' * (n - 1) + ':')
+
+
+def _colons(n: int) -> Tuple[str, str]:
+    return ('capabilities', 'capabilities:' + ':' * n)
+
+
+def _mixed(n: int) -> Tuple[str, str]:
+    return ('deployment', 'deployment:' + 'a, b: ' * (n // 6))
+
+
+def _weapon(n: int) -> Tuple[str, str]:
+    # weapon line with thousands of commas and 'Ammo:' strings without numbers
+    return ('weapons', '1 ISERLargeLaser, Left Arm' + ', Ammo:x' * (n // 8))
+
+
+cases: Dict[str, Callable[[int], Tuple[str, str]]] = {
+    'fluff': _fluff,
+    'commas': _commas,
+    'colons': _colons,
+    'mixed': _mixed,
+    'weapon': _weapon,
+}
+
+
+def adversarial_mtf(case: str, size: int) -> bytes:
+    """
+    Return the template MTF file with an adversarial line of ~`size` bytes.
+    """
+    key, line = cases[case](size)
+    lines = template.read_bytes().decode('utf8', errors='replace').splitlines()
+    index = next(i for i, text in enumerate(lines) if text.lower().startswith(key + ':'))
+    if key == 'weapons':
+        # add a weapon line
+        lines.insert(index + 1, line)
+    else:
+        lines[index] = line
+    return '\n'.join(lines).encode('utf8')
+
+
+def measure(case: str, size: int, repeat: int = 3) -> float:
+    """
+    Return the min. conversion time (in seconds) of the given case and size.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / f"{case}_{size}.mtf"
+        path.write_bytes(adversarial_mtf(case, size))
+        timings: List[float] = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            read_mtf(path)
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def scaling_ratio(case: str, small: int, factor: int = 16, repeat: int = 3) -> float:
+    """
+    Return the ratio of the (best of `repeat`) conversion time of a `factor` times larger
+    adversarial line to the conversion time of the small one.
+    Linear scaling results in a ratio of (at most) `factor`, quadratic scaling in `factor ** 2`.
+    """
+    return measure(case, small * factor, repeat) / measure(case, small, repeat)
+
+
+def count_calls(case: str, size: int) -> int:
+    """
+    Return the nr. of Python and builtin function calls of the conversion of the given case and size
+    (parse caches warmed up).
+    """
+    data = adversarial_mtf(case, size)
+    read_mtf_bytes(data)
+    calls = 0
+
+    def profile(frame: Any, event: str, arg: Any) -> None:
+        nonlocal calls
+        if event in ('call', 'c_call'):
+            calls += 1
+    sys.setprofile(profile)
+    try:
+        read_mtf_bytes(data)
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+def call_ratio(case: str, small: int, factor: int = 16) -> float:
+    """
+    Like 'scaling_ratio()', but the ratio of the nr. of function calls (see 'count_calls()').
+    """
+    return count_calls(case, small * factor) / count_calls(case, small)
+
+
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Worst-case input benchmark for mtf2json.")
+    parser.add_argument('--max-size', type=int, default=4 * 1024 * 1024, help="Max. size of the adversarial line in bytes.")
+    args = parser.parse_args()
+    sizes: List[int] = []
+    size = 4096
+    while size <= args.max_size:
+        sizes.append(size)
+        size *= 4
+    print(f"{'case':<8} {'size':>10} {'time [ms]':>10} {'ns/byte':>8}")
+    for case in cases:
+        for size in sizes:
+            t = measure(case, size)
+            print(f"{case:<8} {size:>10} {t * 1000:>10.2f} {t * 1e9 / size:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Threads vs. processes benchmark for batch conversion.
+
+Converts a synthetic corpus (see `benchmarks.synth`) with 'convert_dir()'
+using different nr. of parser threads and processes. Run it with a regular
+and a free-threaded interpreter (e.g. `python3.13t`) to compare both modes.
+
+Usage: `python -m benchmarks.bench_parallel [--count N] [--workers 1 2 4]`
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from mtf2json.batch import convert_dir, default_workers, free_threaded
+from benchmarks.synth import write_dir
+
+
+def measure(mtf_dir: Path, json_dir: Path, threads: int, processes: int) -> float:
+    """
+    Return the duration of converting `mtf_dir` in seconds.
+    """
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        convert_dir(mtf_dir, json_dir, threads=threads, processes=processes)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Threads vs. processes benchmark for mtf2json.")
+    parser.add_argument('--count', '-n', type=int, default=2000, help="Nr. of synthetic files.")
+    parser.add_argument('--workers', '-w', type=int, nargs='+', help="Nr. of workers to compare.")
+    args = parser.parse_args()
+    cpus = os.cpu_count() or 1
+    workers: List[int] = args.workers or sorted({1, 2, 4, cpus})
+    mode, default = default_workers()
+    print(f"Python {sys.version.split()[0]}, free-threaded: {free_threaded()}, CPUs: {cpus}")
+    print(f"CLI default: {mode} ({default} workers)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_dir = Path(tmpdir) / 'mtf'
+        write_dir(mtf_dir, args.count)
+        print(f"{'workers':>8} {'threads [files/s]':>18} {'processes [files/s]':>20}")
+        for n in workers:
+            t_threads = measure(mtf_dir, Path(tmpdir) / 'json', n, 0)
+            t_processes = measure(mtf_dir, Path(tmpdir) / 'json', 1, n)
+            print(f"{n:>8} {args.count / t_threads:>18.1f} {args.count / t_processes:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Synthetic MTF corpus generator for scale testing.
+
+Produces valid biped MTF files by mutating the fixtures in `tests/mtf/biped`.
+Each generated file is derived from a template fixture and gets a random
+mass (covering the full structure pip table), a random weapon list, optional
+patchwork armor, random fluff sizes, a random number of quirks and some
+fluff lines encoded in CP-1252 (like many of the older MegaMek files).
+
+Generation is seeded and reproducible: file `n` of a corpus only depends on
+the seed and `n`, so corpora can be generated in parts (or in parallel) and
+still be identical.
+"""
+import io
+import random
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, BinaryIO
+from mtf2json.mtf2json import chassis_layouts
+
+
+template_dir = Path(__file__).parent.parent / 'tests/mtf/biped'
+
+# all masses supported by the structure pip table
+masses = list(range(10, 205, 5))
+biped_locations = ['Left Arm', 'Right Arm', 'Left Torso', 'Right Torso', 'Center Torso', 'Head', 'Left Leg', 'Right Leg']
+# locations that can mount rear facing weapons
+torso_locations = ['Left Torso', 'Right Torso', 'Center Torso']
+# MTF armor keys (front locations only, rear locations never contain an armor type)
+armor_front_keys = ['LA', 'RA', 'LT', 'RT', 'CT', 'HD', 'LL', 'RL']
+armor_rear_keys = ['RTL', 'RTR', 'RTC']
+# location of each MTF armor key (a rear location shares the max. armor of its torso location)
+armor_locations = {'LA': 'left_arm', 'RA': 'right_arm', 'LT': 'left_torso', 'RT': 'right_torso', 'CT': 'center_torso',
+                   'HD': 'head', 'LL': 'left_leg', 'RL': 'right_leg', 'RTL': 'left_torso', 'RTR': 'right_torso',
+                   'RTC': 'center_torso'}
+patchwork_types = ['Standard(IS/Clan)', 'Reactive(Inner Sphere)', 'Reflective(Inner Sphere)',
+                   'Ferro-Fibrous(Clan)', 'Hardened(Inner Sphere)', 'Stealth(Inner Sphere)']
+quirk_pool = ['bad_rep_is', 'battle_fists_la', 'battle_fists_ra', 'command_mech', 'difficult_maintain',
+              'distracting', 'ext_twist', 'good_rep_1', 'imp_com', 'low_profile', 'no_arms', 'rugged_1',
+              'stable', 'cramped_cockpit', 'hard_pilot', 'imp_target_short', 'multi_trac', 'protected_actuators',
+              'reinforced_legs', 'easy_maintain', 'fast_reload', 'improved_sensors', 'sensor_ghosts']
+# characters whose CP-1252 encoding is a single byte in the range 0x80-0xBF,
+# i.e. a byte that can never start a valid UTF-8 sequence
+cp1252_chars = '’—“”•…£°½'
+# fluff text sizes (in characters)
+fluff_sizes = [0, 80, 400, 1500, 6000, 20000]
+fluff_size_weights = [1, 10, 30, 30, 10, 2]
+fluff_keys = ['overview', 'capabilities', 'deployment', 'history']
+
+
+class _Templates:
+    """
+    Lines of all template fixtures and the value pools extracted from them.
+    """
+    def __init__(self, path: Path) -> None:
+        self.files: List[Tuple[str, List[str]]] = []
+        self.weapons: List[str] = []
+        self.words: List[str] = []
+        for mtf_file in sorted(path.glob('*.mtf')):
+            text = mtf_file.read_bytes().decode('utf8', errors='replace')
+            lines = text.splitlines()
+            self.files.append((mtf_file.stem, lines))
+            for line in lines:
+                key = line.split(':', 1)[0].strip().lower()
+                if key in fluff_keys:
+                    self.words.extend(w for w in line.split(':', 1)[1].split() if ':' not in w and '<' not in w)
+            for name in _section_lines(lines, 'weapons:'):
+                # strip quantity and keep the weapon name only
+                name = name.split(',', 1)[0]
+                if name[:1].isdigit():
+                    name = name.split(' ', 1)[1]
+                self.weapons.append(name.strip())
+        if not self.files:
+            raise ValueError(f"No MTF templates found in '{path}'.")
+        self.weapons = sorted(set(self.weapons))
+        # fluff words must never contain any delimiter and are restricted to ASCII,
+        # so that the CP-1252 characters we add never merge into a valid UTF-8 sequence
+        self.words = [w.replace(',', '') for w in self.words if w.isascii() and w.isprintable()] or ['lorem', 'ipsum']
+
+
+_template_cache: Dict[Path, _Templates] = {}
+
+
+def _templates(path: Path) -> _Templates:
+    if path not in _template_cache:
+        _template_cache[path] = _Templates(path)
+    return _template_cache[path]
+
+
+def _section_lines(lines: List[str], header: str) -> List[str]:
+    """
+    Return the lines of the section starting with `header` (until the next empty line).
+    """
+    result: List[str] = []
+    in_section = False
+    for line in lines:
+        if line.lower().startswith(header):
+            in_section = True
+        elif in_section:
+            if not line.strip():
+                break
+            result.append(line.strip())
+    return result
+
+
+def _fluff_text(rng: random.Random, words: List[str], size: int, cp1252: bool) -> str:
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(words)
+        if cp1252 and rng.random() < 0.05:
+            word += rng.choice(cp1252_chars)
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)
+
+
+def _armor_pips(rng: random.Random, mass: int) -> Dict[str, int]:
+    """
+    Return random armor pips for each MTF armor key within the max. armor of the given mass
+    (front + rear pips of a torso location don't exceed the max. armor of that location).
+    """
+    layout = chassis_layouts['Biped']
+    max_pips = dict(zip(layout.locations, layout.max_armor_pips[mass // 5] or ()))
+    pips = {key: rng.randint(0, max_pips[armor_locations[key]]) for key in armor_front_keys}
+    for rear_key in armor_rear_keys:
+        front_key = rear_key[2] + 'T'
+        pips[rear_key] = rng.randint(0, pips[front_key])
+        pips[front_key] -= pips[rear_key]
+    return pips
+
+
+def _mutate(rng: random.Random, templates: _Templates, max_weapons: int, max_quirks: int) -> Tuple[str, bytes]:
+    """
+    Create a single mutated MTF file. Returns the template name and the file content.
+    """
+    name, template = rng.choice(templates.files)
+    mass = rng.choice(masses)
+    patchwork = rng.random() < 0.2
+    armor_pips = _armor_pips(rng, mass)
+    quirks = rng.sample(quirk_pool, rng.randint(0, min(max_quirks, len(quirk_pool))))
+    weapons: List[str] = []
+    for _ in range(rng.randint(0, max_weapons)):
+        location = rng.choice(biped_locations)
+        if location in torso_locations and rng.random() < 0.1:
+            location += ' (R)'
+        line = f"{rng.choice(templates.weapons)}, {location}"
+        if rng.random() < 0.3:
+            line = f"{rng.randint(1, 4)} {line}"
+        if rng.random() < 0.2:
+            line += f", Ammo:{rng.randint(1, 60)}"
+        weapons.append(line)
+
+    # (line, encode as CP-1252)
+    out: List[Tuple[str, bool]] = []
+    skip_section = False
+    quirks_written = False
+    for line in template:
+        key = line.split(':', 1)[0].strip().lower() if ':' in line else None
+        if skip_section:
+            if line.strip():
+                continue
+            skip_section = False
+        if key == 'mass':
+            out.append((f"mass:{mass}", False))
+        elif key == 'quirk':
+            if not quirks_written:
+                out.extend((f"quirk:{q}", False) for q in quirks)
+                quirks_written = True
+        elif key == 'armor' and patchwork:
+            out.append(("armor:Patchwork", False))
+        elif key is not None and key.endswith(' armor'):
+            loc = key.split(' ')[0].upper()
+            pips = armor_pips[loc]
+            if patchwork and loc in armor_front_keys:
+                out.append((f"{loc} armor:{rng.choice(patchwork_types)}:{pips}", False))
+            else:
+                out.append((f"{loc} armor:{pips}", False))
+        elif key == 'weapons':
+            out.append((f"Weapons:{len(weapons)}", False))
+            out.extend((w, False) for w in weapons)
+            skip_section = True
+        elif key in fluff_keys:
+            size = rng.choices(fluff_sizes, fluff_size_weights)[0]
+            cp1252 = rng.random() < 0.3
+            out.append((f"{key}:{_fluff_text(rng, templates.words, size, cp1252)}", cp1252))
+        else:
+            out.append((line, False))
+        # quirks are placed right after the role if the template has none
+        if key == 'role' and not quirks_written and quirks:
+            out.append(("", False))
+            out.extend((f"quirk:{q}", False) for q in quirks)
+            quirks_written = True
+
+    buffer = io.BytesIO()
+    for line, cp1252 in out:
+        buffer.write(line.encode('cp1252' if cp1252 else 'utf8'))
+        buffer.write(b'\r\n')
+    return name, buffer.getvalue()
+
+
+def iter_corpus(count: int,
+                seed: int = 0,
+                start: int = 0,
+                templates: Optional[Path] = None,
+                max_weapons: int = 20,
+                max_quirks: int = 10) -> Iterator[Tuple[str, bytes]]:
+    """
+    Generate `count` MTF files, starting with file nr. `start`.
+    Yields tuples of (relative path, MTF content as bytes). The files are distributed
+    over subdirectories of max. 1000 files each, e.g. `0003/Atlas_AS7-K_0003042.mtf`.
+    """
+    tmpl = _templates(templates or template_dir)
+    for n in range(start, start + count):
+        rng = random.Random(f"{seed}:{n}")
+        name, content = _mutate(rng, tmpl, max_weapons, max_quirks)
+        yield f"{n // 1000:04d}/{name}_{n:07d}.mtf", content
+
+
+def write_dir(path: Path, count: int, seed: int = 0, **kwargs: Any) -> List[Path]:
+    """
+    Write a generated corpus to directory `path`. Returns the list of created files.
+    """
+    files: List[Path] = []
+    for rel_path, content in iter_corpus(count, seed, **kwargs):
+        mtf_path = path / rel_path
+        mtf_path.parent.mkdir(parents=True, exist_ok=True)
+        mtf_path.write_bytes(content)
+        files.append(mtf_path)
+    return files
+
+
+def write_archive(target: Union[Path, BinaryIO], count: int, seed: int = 0, fmt: str = 'zip', **kwargs: Any) -> None:
+    """
+    Write a generated corpus to a ZIP or TAR archive. `target` can be a path or
+    a binary stream (e.g. `io.BytesIO` for in-memory benchmarks).
+    """
+    if fmt == 'zip':
+        with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for rel_path, content in iter_corpus(count, seed, **kwargs):
+                zf.writestr(rel_path, content)
+    elif fmt == 'tar':
+        if isinstance(target, Path):
+            tf = tarfile.open(target, 'w')
+        else:
+            tf = tarfile.open(fileobj=target, mode='w')
+        with tf:
+            for rel_path, content in iter_corpus(count, seed, **kwargs):
+                info = tarfile.TarInfo(rel_path)
+                info.size = len(content)
+                tf.addfile(info, io.BytesIO(content))
+    else:
+        raise ValueError(f"Unsupported archive format '{fmt}'.")
+
+
+def memory_corpus(count: int, seed: int = 0, **kwargs: Any) -> Dict[str, bytes]:
+    """
+    Return a generated corpus as an in-memory dictionary (relative path -> content).
+    """
+    return dict(iter_corpus(count, seed, **kwargs))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic MTF corpus.")
+    parser.add_argument('target', type=str, help="Target directory or archive (.zip / .tar).")
+    parser.add_argument('--count', '-n', type=int, default=1000, help="Nr. of files to generate.")
+    parser.add_argument('--seed', '-s', type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+    target = Path(args.target)
+    if target.suffix in ['.zip', '.tar']:
+        write_archive(target, args.count, args.seed, fmt=target.suffix[1:])
+    else:
+        write_dir(target, args.count, args.seed)
@@ -1,2 +1,5 @@
 # this enables direct import from 'mtf2json' (instead of 'mtf2json.mtf2json')
-from .mtf2json import read_mtf, write_json, ConversionError, version, mm_commit  # noqa
+from .mtf2json import read_mtf, read_mtf_bytes, write_json, write_json_text, ConversionError, version, mm_commit, parse_cache_info, clear_parse_cache  # noqa
+from .mtf2json import iter_mtf_events, parse_mtf_events, KeyValue, SectionStart, WeaponSlot, CritSlot, ArmorPips, FluffEntry  # noqa
+from .mtf2json import canonical_json, content_hash, to_json, metadata_key  # noqa
+from .validate import validate_mech, check_mech, ValidationError  # noqa
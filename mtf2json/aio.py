@@ -0,0 +1,124 @@
+"""
+Asyncio API for non-blocking conversion inside async services.
+File I/O is done in the default executor of the event loop (threads),
+parsing and JSON serialization in the given `executor` (e.g. a
+`ProcessPoolExecutor`), so the event loop is never blocked.
+"""
+import asyncio
+import json
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from .mtf2json import read_mtf_bytes, write_json_text
+from .discovery import discover
+
+
+# nr. of paths taken from the directory walk at once
+discovery_batch = 64
+
+
+async def aread_mtf_bytes(data: bytes, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Convert the given MTF file content in `executor` (default: the loop's default executor)
+    and return it as JSON.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, read_mtf_bytes, data)
+
+
+async def aread_mtf(path: Union[str, Path], executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Read the given MTF file without blocking the event loop and return its content as JSON.
+    The file is read in the loop's default executor and parsed in `executor`.
+    """
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(None, Path(path).read_bytes)
+    return await aread_mtf_bytes(data, executor)
+
+
+def __convert_bytes(data: bytes) -> str:
+    """
+    Convert the given MTF file content to a JSON string (formatted like 'write_json()').
+    Parsing and serializing in one call avoids sending the JSON data back and forth
+    between processes.
+    """
+    return json.dumps(read_mtf_bytes(data), indent=4)
+
+
+def __next_paths(rel_paths: Iterator[str], count: int) -> List[str]:
+    """
+    Return the next `count` paths of the directory walk (less at the end).
+    """
+    return [rel_path for _, rel_path in zip(range(count), rel_paths)]
+
+
+def __write_text(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_text(text, path)
+
+
+async def aconvert_dir(mtf_dir: Path,
+                       json_dir: Optional[Path] = None,
+                       recursive: bool = True,
+                       ignore_errors: bool = False,
+                       executor: Optional[Executor] = None,
+                       concurrency: int = 8) -> Tuple[int, List[Tuple[str, str]]]:
+    """
+    Convert all MTF files in the `mtf_dir` folder to JSON, like 'convert_dir()', but without
+    blocking the event loop. The files are processed by `concurrency` worker tasks while the
+    directory tree is walked (see 'discover()'), i.e. the memory usage doesn't depend on the
+    nr. of files.
+    Returns the nr. of converted files and a list of (MTF file, error) tuples.
+    If `ignore_errors` is False, the first error is raised (after cancelling the remaining files).
+    Cancelling the returned coroutine cancels all pending conversions.
+    """
+    if not mtf_dir.is_dir():
+        raise ValueError(f"'{mtf_dir}' is not a directory.")
+    if json_dir and json_dir.exists() and not json_dir.is_dir():
+        raise ValueError(f"'{json_dir}' is not a directory.")
+
+    loop = asyncio.get_running_loop()
+    workers = max(concurrency, 1)
+    # bounded -> the walk doesn't get far ahead of the workers
+    paths: 'asyncio.Queue[Optional[str]]' = asyncio.Queue(maxsize=2 * workers)
+    error_files: List[Tuple[str, str]] = []
+    num_success = 0
+
+    async def produce() -> None:
+        rel_paths = discover(mtf_dir, recursive)
+        while True:
+            batch = await loop.run_in_executor(None, __next_paths, rel_paths, discovery_batch)
+            for rel_path in batch:
+                await paths.put(rel_path)
+            if len(batch) < discovery_batch:
+                break
+        for _ in range(workers):
+            await paths.put(None)
+
+    async def convert() -> None:
+        nonlocal num_success
+        while True:
+            rel_path = await paths.get()
+            if rel_path is None:
+                return
+            mtf_path = mtf_dir / rel_path
+            json_path = (json_dir / rel_path if json_dir else mtf_path).with_suffix('.json')
+            try:
+                data = await loop.run_in_executor(None, mtf_path.read_bytes)
+                text = await loop.run_in_executor(executor, __convert_bytes, data)
+                await loop.run_in_executor(None, __write_text, json_path, text)
+                num_success += 1
+            except Exception as ex:
+                if not ignore_errors:
+                    raise
+                error_files.append((str(mtf_path), str(ex)))
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(convert()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # cancel all pending tasks (in case of an error or if we got cancelled)
+        for task in tasks:
+            task.cancel()
+    error_files.sort()
+    return num_success, error_files
@@ -0,0 +1,1056 @@
+"""
+Batch conversion of MTF directories and file lists.
+The conversion runs as a staged pipeline with bounded queues, so disk reads,
+parsing and disk writes overlap:
+    reader thread -> parse queue -> parser worker(s) -> write queue -> writer
+The writer stage runs in the calling thread. The parser workers are either
+threads (parsing in parallel on free-threaded Python builds) or threads that
+hand the files to a process pool.
+Optionally, a run report (result of each file), a bundle (all mechs in one
+JSON lines file, see 'mtf2json.bundle') and an index (content hash of each mech) are written, and
+only a shard of the files is converted (see 'mtf2json.shard').
+'convert_git()' reads the MTF files from a git repository instead of a directory.
+'convert_to_jsonl()' replaces the writer stage: it writes one JSON line per file to a stream
+(in input order), e.g. for 'find | mtf2json --files-from - --jsonl' pipelines.
+With a per-file time or memory budget, each parser thread hands the files to its own worker
+process, which is killed and restarted if a file exceeds the budget. Such files are
+quarantined, i.e. skipped by later runs until their content changes.
+With deduplication, the reader stage hashes the MTF content and only the first of several
+identical files is parsed. The JSON files of the others are hardlinks, reflinks or copies
+of its JSON file (see 'link_modes').
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from .mtf2json import read_mtf_bytes, write_json_text, canonical_json, metadata_key, version
+from .shard import in_shard, shard_str, write_report, dedup_ratio
+from .bundle import OffsetIndex, offsets_path
+from .validate import check_mech
+from .gitrepo import GitRepo, GitFile
+from .disk_cache import ParseCache
+from .discovery import discover
+
+
+# default max. nr. of files per pipeline queue
+queue_depth = 64
+# ways to materialize the JSON files of duplicate MTF files (hardlinks and reflinks fall back to copies)
+link_modes = ('hardlink', 'reflink', 'copy')
+# ioctl request to clone a file on Linux (Btrfs, XFS, ...)
+_ficlone = 0x40049409
+
+
+class _Output(NamedTuple):
+    """
+    The outputs of the parser stage.
+    """
+    bundle: bool
+    hashed: bool
+    canonical: bool
+    embed_hash: bool
+    validate: bool
+    # False if only the bundle line is needed (no JSON file)
+    files: bool = True
+    cache: Optional[ParseCache] = None
+
+
+class Budget(NamedTuple):
+    """
+    The max. time (seconds) and additional memory (bytes) of a worker process per file (`None` -> unlimited).
+    """
+    time: Optional[float] = None
+    memory: Optional[int] = None
+
+
+class BudgetError(Exception):
+    """
+    A file exceeded the time or memory budget (or crashed its worker process).
+    """
+    def __init__(self, message: str, sha256: str) -> None:
+        super().__init__(message)
+        # content hash of the MTF file (see 'quarantine')
+        self.sha256 = sha256
+
+
+class QuarantinedError(Exception):
+    """
+    A file is skipped because it has exceeded the budget in a previous run and hasn't changed since then.
+    """
+    def __init__(self, reason: str, sha256: str) -> None:
+        super().__init__(f"quarantined: {reason}")
+        self.reason = reason
+        self.sha256 = sha256
+
+
+class _Result(NamedTuple):
+    """
+    The result of the parser stage.
+    """
+    text: str
+    # bundle line and offset index keys (MUL id, chassis, model)
+    record: Optional[str] = None
+    keys: Optional[Tuple[Optional[int], str, str]] = None
+    sha256: Optional[str] = None
+
+
+class _Job:
+    """
+    A single file passing through the pipeline.
+    """
+    __slots__ = ['mtf_path', 'json_path', 'rel_path', 'seq', 'data', 'result', 'error', 'source', 'duplicate']
+
+    def __init__(self, mtf_path: Path, json_path: Path, rel_path: str) -> None:
+        self.mtf_path = mtf_path
+        self.json_path = json_path
+        # path used in reports and bundles
+        self.rel_path = rel_path
+        # position in the input (set by the reader stage)
+        self.seq = 0
+        self.data: Optional[bytes] = None
+        self.result: Optional[_Result] = None
+        self.error: Optional[Exception] = None
+        # hash of the MTF content (only with deduplication)
+        self.source: Optional[bytes] = None
+        # True if an earlier file has the same content (i.e. it's not parsed)
+        self.duplicate = False
+
+
+class _Original(NamedTuple):
+    """
+    The outcome of a file that has duplicates (needed to write the duplicates).
+    """
+    rel_path: str
+    json_path: Path
+    # without the JSON string and the bundle line
+    result: Optional[_Result]
+    error: Optional[Exception]
+    # position and length of the bundle line
+    bundle_offset: int = 0
+    bundle_length: int = 0
+
+
+def free_threaded() -> bool:
+    """
+    Return 'True' if the interpreter runs without the GIL (e.g. Python 3.13t).
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def default_workers() -> Tuple[str, int]:
+    """
+    Return the parallel mode ('threads' or 'processes') and the nr. of workers
+    that the CLI uses by default: threads on free-threaded builds (no pickling
+    of the results), processes otherwise (threads can't parse in parallel).
+    On single CPU machines, a single thread is always the fastest option.
+    """
+    cpus = os.cpu_count() or 1
+    if cpus == 1 or free_threaded():
+        return ('threads', cpus)
+    return ('processes', cpus)
+
+
+def _process_context() -> Union[multiprocessing.context.ForkServerContext, multiprocessing.context.SpawnContext]:
+    """
+    Return the multiprocessing context of the worker processes. The workers are started while
+    the pipeline threads are running, and forking a process with running threads can deadlock
+    (e.g. if another thread holds a lock) -> use 'forkserver' (or 'spawn' if it's not available).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def __convert_bytes(data: bytes, rel_path: str, output: _Output) -> _Result:
+    """
+    Convert the given MTF content to a JSON string (like 'to_json()').
+    Also returns the bundle line and the content hash of the mech (if requested by `output`).
+    """
+    mech_data = output.cache.read_mtf_bytes(data) if output.cache is not None else read_mtf_bytes(data)
+    if output.validate:
+        check_mech(mech_data)
+    record = keys = sha256 = None
+    if output.hashed:
+        # serialize canonically only once (for the hash, the bundle and the file)
+        canonical = canonical_json(mech_data)
+        sha256 = hashlib.sha256(canonical.encode('utf8')).hexdigest()
+        if output.bundle:
+            record = f'{{"path":{json.dumps(rel_path)},"sha256":"{sha256}","mech":{canonical}}}'
+            keys = (mech_data.get('mul_id'), str(mech_data.get('chassis', '')), str(mech_data.get('model', '')))
+        if not output.files:
+            return _Result('', record, keys, sha256)
+        if output.embed_hash:
+            mech_data = {metadata_key: {'sha256': sha256}, **mech_data}
+        elif output.canonical:
+            return _Result(canonical, record, keys, sha256)
+    if output.canonical:
+        return _Result(canonical_json(mech_data), record, keys, sha256)
+    return _Result(json.dumps(mech_data, indent=4), record, keys, sha256)
+
+
+def __limit_memory(budget: int) -> None:
+    """
+    Limit the address space of this process to its current size + `budget` bytes,
+    i.e. allocations beyond the budget raise a 'MemoryError'.
+    Not enforced on platforms without 'resource' or '/proc/self/statm' (e.g. Windows or macOS).
+    """
+    try:
+        import resource
+        with open('/proc/self/statm', 'r') as f:
+            size = int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (ImportError, OSError, ValueError):
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = size + budget
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _budget_worker(conn: Connection, memory_budget: Optional[int]) -> None:
+    """
+    The main function of a budgeted worker process: converts the files received from `conn`
+    (see '_BudgetWorker'). Exits after a 'MemoryError' (the process may be in a bad state).
+    """
+    if memory_budget is not None:
+        __limit_memory(memory_budget)
+    conn.send(None)
+    while True:
+        try:
+            task = conn.recv()
+            if task is None:
+                return
+            result: Tuple[bool, Any] = (True, __convert_bytes(*task))
+        except EOFError:
+            return
+        except MemoryError:
+            conn.send((False, MemoryError()))
+            return
+        except Exception as ex:
+            result = (False, ex)
+        try:
+            conn.send(result)
+        except Exception:
+            # e.g. exceptions that can't be pickled
+            conn.send((False, RuntimeError(str(result[1]))))
+
+
+class _BudgetWorker:
+    """
+    A worker process that converts one file at a time within the given budget.
+    The process is killed if a file exceeds the time budget and restarted for the next file.
+    """
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn: Optional[Connection] = None
+
+    def _start(self) -> Connection:
+        context = _process_context()
+        conn, child_conn = context.Pipe()
+        process = context.Process(target=_budget_worker, args=(child_conn, self.budget.memory), daemon=True)
+        process.start()
+        child_conn.close()
+        # wait until the worker is ready (i.e. the startup time doesn't count)
+        conn.recv()
+        self._process = process
+        self._conn = conn
+        return conn
+
+    def _kill(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._process = self._conn = None
+
+    def convert(self, data: bytes, rel_path: str, output: _Output) -> _Result:
+        """
+        Convert the given MTF content in the worker process (see '__convert_bytes()').
+        Raises a 'BudgetError' if the budget is exceeded.
+        """
+        conn = self._conn or self._start()
+        try:
+            conn.send((data, rel_path, output))
+            sent = True
+        except OSError:
+            # the worker has exited while receiving the file (e.g. it exceeded the memory budget)
+            sent = False
+        if sent and not conn.poll(self.budget.time):
+            self._kill()
+            raise BudgetError(f"time budget of {self.budget.time}s exceeded", hashlib.sha256(data).hexdigest())
+        try:
+            success, value = conn.recv()
+        except EOFError:
+            exitcode = None
+            if self._process is not None:
+                self._process.join(1)
+                exitcode = self._process.exitcode
+            self._kill()
+            raise BudgetError(f"worker process died (exit code {exitcode})", hashlib.sha256(data).hexdigest())
+        if success:
+            return value
+        if isinstance(value, MemoryError):
+            self._kill()
+            raise BudgetError(f"memory budget of {self.budget.memory} bytes exceeded", hashlib.sha256(data).hexdigest())
+        raise value
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+        if self._process is not None:
+            self._process.join(1)
+        self._kill()
+
+
+def __budget(time_budget: Optional[float], memory_budget: Optional[int]) -> Optional[Budget]:
+    if time_budget is None and memory_budget is None:
+        return None
+    if (time_budget is not None and time_budget <= 0) or (memory_budget is not None and memory_budget <= 0):
+        raise ValueError("Budgets must be positive.")
+    return Budget(time_budget, memory_budget)
+
+
+def __iter_jobs(mtf_dir: Path,
+                json_dir: Optional[Path],
+                recursive: bool,
+                shard: Optional[Tuple[int, int]],
+                include: Optional[Sequence[str]] = None,
+                exclude: Optional[Sequence[str]] = None,
+                walkers: int = 1,
+                manifest: Optional[Path] = None) -> Iterator[_Job]:
+    """
+    Yield a job for each MTF file in `mtf_dir` that belongs to the given `shard`
+    while the directory tree is walked (see 'discover()').
+    """
+    for rel_path in discover(mtf_dir, recursive, include, exclude, walkers, manifest):
+        if not in_shard(rel_path, shard):
+            continue
+        mtf_path = mtf_dir / rel_path
+        if json_dir:
+            json_path = json_dir / rel_path
+        else:
+            json_path = mtf_path
+        yield _Job(mtf_path, json_path.with_suffix('.json'), rel_path)
+
+
+def __git_rel_path(path: str, subdir: Optional[str], recursive: bool, shard: Optional[Tuple[int, int]]) -> Optional[str]:
+    """
+    Return the path of the given file in the repository relative to `subdir`,
+    or None if it's not an MTF file in `subdir` of the given `shard`.
+    """
+    prefix = subdir.strip('/') + '/' if subdir else ''
+    if not path.endswith('.mtf') or not path.startswith(prefix):
+        return None
+    rel_path = path[len(prefix):]
+    if (not recursive and '/' in rel_path) or not in_shard(rel_path, shard):
+        return None
+    return rel_path
+
+
+def __iter_git_jobs(repo: GitRepo,
+                    files: List[GitFile],
+                    json_dir: Path,
+                    subdir: Optional[str],
+                    recursive: bool,
+                    shard: Optional[Tuple[int, int]]) -> Iterator[_Job]:
+    """
+    Yield a job for each MTF file in `files` (relative to `subdir`) that belongs to the given `shard`.
+    The blobs are read here, i.e. in the reader stage.
+    """
+    for file in files:
+        rel_path = __git_rel_path(file.path, subdir, recursive, shard)
+        if rel_path is None:
+            continue
+        job = _Job(Path(file.path), json_dir / Path(rel_path).with_suffix('.json'), rel_path)
+        try:
+            job.data = repo.read_blob(file.oid)
+        except Exception as ex:
+            job.error = ex
+        yield job
+
+
+def load_quarantine(path: Path) -> Dict[str, Dict[str, str]]:
+    """
+    Return the quarantined files of the given quarantine file
+    (MTF path -> content hash and reason), empty if it doesn't exist.
+    """
+    try:
+        with open(path, 'r') as f:
+            quarantine: Dict[str, Dict[str, str]] = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return quarantine
+
+
+def __skip_quarantined(jobs: Iterator[_Job], quarantine: Dict[str, Dict[str, str]]) -> Iterator[_Job]:
+    """
+    Mark the jobs of quarantined files that haven't changed with a 'QuarantinedError'
+    (runs in the reader stage, i.e. the quarantined files are read here).
+    """
+    for job in jobs:
+        entry = quarantine.get(job.rel_path)
+        if entry is not None and job.error is None:
+            try:
+                if job.data is None:
+                    job.data = job.mtf_path.read_bytes()
+                if hashlib.sha256(job.data).hexdigest() == entry['sha256']:
+                    job.error = QuarantinedError(entry['reason'], entry['sha256'])
+                    job.data = None
+            except Exception as ex:
+                job.error = ex
+        yield job
+
+
+def __dedup(jobs: Iterator[_Job]) -> Iterator[_Job]:
+    """
+    Set the content hash of each MTF file and mark the files with the same content
+    as an earlier file as duplicates (runs in the reader stage, i.e. the files are read here).
+    """
+    seen: Set[bytes] = set()
+    for job in jobs:
+        if job.error is None:
+            try:
+                if job.data is None:
+                    job.data = job.mtf_path.read_bytes()
+                job.source = hashlib.sha256(job.data).digest()
+                if job.source in seen:
+                    job.duplicate = True
+                    job.data = None
+                else:
+                    seen.add(job.source)
+            except Exception as ex:
+                job.error = ex
+        yield job
+
+
+def __order_duplicates(jobs: Iterator[_Job]) -> Iterator[_Job]:
+    """
+    Yield duplicates after the first file with the same content has been yielded
+    (duplicates aren't parsed, so they can overtake it if there are several parsers).
+    """
+    yielded: Set[bytes] = set()
+    waiting: Dict[bytes, List[_Job]] = {}
+    for job in jobs:
+        if job.source is None:
+            yield job
+        elif not job.duplicate:
+            yield job
+            yielded.add(job.source)
+            yield from waiting.pop(job.source, ())
+        elif job.source in yielded:
+            yield job
+        else:
+            waiting.setdefault(job.source, []).append(job)
+
+
+def __reflink(source: Path, target: Path) -> None:
+    """
+    Create `target` as a copy-on-write clone of `source`.
+    Raises an OSError if the platform or file system doesn't support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), getattr(fcntl, 'FICLONE', _ficlone), src.fileno())
+
+
+def __link_json(source: Path, target: Path, mode: str, skip_unchanged: bool) -> bool:
+    """
+    Write `target` as a hardlink, reflink or copy of the JSON file `source` (see 'link_modes').
+    The file is replaced atomically. If `skip_unchanged` is True, it's not touched if it already
+    has the same content.
+    Returns True if the file has been written, False if it has been skipped.
+    """
+    try:
+        if os.path.samefile(source, target):
+            return not skip_unchanged
+        if skip_unchanged and target.stat().st_size == source.stat().st_size and target.read_bytes() == source.read_bytes():
+            return False
+    except FileNotFoundError:
+        pass
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        try:
+            if mode == 'hardlink':
+                os.link(source, tmp_path)
+            elif mode == 'reflink':
+                __reflink(source, tmp_path)
+            else:
+                shutil.copyfile(source, tmp_path)
+        except OSError:
+            # e.g. different file systems or no support for links
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def __put(q: 'queue.Queue[Optional[_Job]]', item: Optional[_Job], stop: threading.Event) -> None:
+    """
+    Put `item` into the bounded queue `q`, unless the pipeline is stopped.
+    Sentinels (`None`) are always delivered.
+    """
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            if stop.is_set() and item is not None:
+                return
+
+
+def __reader(jobs: Iterator[_Job],
+             parse_queue: 'queue.Queue[Optional[_Job]]',
+             num_parsers: int,
+             stop: threading.Event) -> None:
+    """
+    Reader stage: prefetch the MTF file content.
+    """
+    try:
+        for seq, job in enumerate(jobs):
+            if stop.is_set():
+                break
+            job.seq = seq
+            # the content may have been read by the job source (e.g. from git)
+            if job.data is None and job.error is None and not job.duplicate:
+                try:
+                    job.data = job.mtf_path.read_bytes()
+                except Exception as ex:
+                    job.error = ex
+            __put(parse_queue, job, stop)
+    finally:
+        for _ in range(num_parsers):
+            __put(parse_queue, None, stop)
+
+
+def __parser(parse_queue: 'queue.Queue[Optional[_Job]]',
+             write_queue: 'queue.Queue[Optional[_Job]]',
+             stop: threading.Event,
+             executor: Optional[Executor],
+             output: _Output,
+             budget: Optional[Budget] = None) -> None:
+    """
+    Parser stage: convert the MTF content to a JSON string, bundle line and hash
+    (in this thread, in the given `executor` or in a worker process with the given `budget`).
+    """
+    worker = _BudgetWorker(budget) if budget else None
+    try:
+        while True:
+            job = parse_queue.get()
+            if job is None:
+                break
+            if job.error is None and not job.duplicate and not stop.is_set():
+                try:
+                    if worker:
+                        job.result = worker.convert(job.data or b'', job.rel_path, output)
+                    elif executor:
+                        job.result = executor.submit(__convert_bytes, job.data or b'', job.rel_path, output).result()
+                    else:
+                        job.result = __convert_bytes(job.data or b'', job.rel_path, output)
+                except Exception as ex:
+                    job.error = ex
+            job.data = None
+            __put(write_queue, job, stop)
+    finally:
+        if worker:
+            worker.close()
+        __put(write_queue, None, stop)
+
+
+def __start(jobs: Iterator[_Job],
+            queue_depth: int,
+            threads: int,
+            processes: int,
+            output: _Output,
+            budget: Optional[Budget] = None) -> Tuple[Optional[Executor], List[threading.Thread], 'queue.Queue[Optional[_Job]]',
+                                                      threading.Event]:
+    """
+    Start the reader and parser stages for the given jobs.
+    Returns the executor (if any), the pipeline threads, the write queue and the stop event.
+    With a `budget`, each parser uses its own worker process (instead of a process pool).
+    """
+    executor = ProcessPoolExecutor(processes, mp_context=_process_context()) if processes > 0 and not budget else None
+    num_parsers = processes if processes > 0 else max(threads, 1)
+    parse_queue: 'queue.Queue[Optional[_Job]]' = queue.Queue(maxsize=queue_depth)
+    write_queue: 'queue.Queue[Optional[_Job]]' = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    pipeline = [threading.Thread(target=__reader, args=(jobs, parse_queue, num_parsers, stop), daemon=True)]
+    pipeline += [threading.Thread(target=__parser, args=(parse_queue, write_queue, stop, executor, output, budget), daemon=True)
+                 for _ in range(num_parsers)]
+    for thread in pipeline:
+        thread.start()
+    return executor, pipeline, write_queue, stop
+
+
+def __results(write_queue: 'queue.Queue[Optional[_Job]]', num_parsers: int, stop: threading.Event) -> Iterator[_Job]:
+    """
+    Yield the jobs of the write queue until all parsers are finished.
+    If the pipeline has been stopped, the remaining jobs are drained (not yielded).
+    """
+    finished_parsers = 0
+    while finished_parsers < num_parsers:
+        job = write_queue.get()
+        if job is None:
+            finished_parsers += 1
+        elif not stop.is_set():
+            yield job
+
+
+def __run(jobs: Iterator[_Job],
+          create_dirs: bool,
+          ignore_errors: bool,
+          queue_depth: int,
+          threads: int,
+          processes: int,
+          report: Optional[Path] = None,
+          bundle: Optional[Path] = None,
+          shard: Optional[Tuple[int, int]] = None,
+          skip_unchanged: bool = False,
+          canonical: bool = False,
+          embed_hash: bool = False,
+          index: Optional[Path] = None,
+          validate: bool = False,
+          cache: Optional[ParseCache] = None,
+          budget: Optional[Budget] = None,
+          quarantine: Optional[Path] = None,
+          dedup: Optional[str] = None,
+          deleted: Optional[Sequence[_Job]] = None) -> int:
+    """
+    Run the pipeline for the given jobs and print the results.
+    Write the `report`, `bundle` and `index` files if given.
+    The JSON files of the `deleted` jobs (MTF files that no longer exist) are removed and listed in the report.
+    Files in the `quarantine` file are skipped (if unchanged), files that exceed the `budget` are added to it.
+    If `dedup` is given, files with the same content are parsed once (see 'link_modes').
+    Returns 1 if an error occured, 0 otherwise.
+    """
+    output = _Output(bundle is not None, bundle is not None or index is not None or embed_hash, canonical, embed_hash, validate,
+                     cache=cache)
+    quarantined = load_quarantine(quarantine) if quarantine else {}
+    if quarantined:
+        jobs = __skip_quarantined(jobs, quarantined)
+    if dedup:
+        jobs = __dedup(jobs)
+    executor, pipeline, write_queue, stop = __start(jobs, queue_depth, threads, processes, output, budget)
+
+    # writer stage
+    # -> remember the created directories (instead of calling 'mkdir()' for every file)
+    created_dirs: Set[Path] = set()
+    num_files = num_success = num_skipped = num_quarantined = num_duplicates = 0
+    error_files: List[Tuple[str, str]] = []
+    # files quarantined in this run (MTF path -> content hash and reason)
+    run_quarantine: Dict[str, Dict[str, str]] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    hashes: Dict[str, str] = {}
+    # content hash -> first file with that content
+    originals: Dict[bytes, _Original] = {}
+    error_occured = False
+    bundle_file: Optional[BinaryIO] = None
+    offsets = OffsetIndex()
+    try:
+        if bundle:
+            # also read when writing the bundle lines of duplicates
+            bundle_file = open(bundle, 'w+b')
+        for job in __order_duplicates(__results(write_queue, len(pipeline) - 1, stop)):
+            num_files += 1
+            original = originals[job.source] if job.source is not None and job.duplicate else None
+            bundle_offset = bundle_length = 0
+            error: Optional[Exception] = None
+            try:
+                if job.error is not None:
+                    raise job.error
+                if original is not None:
+                    num_duplicates += 1
+                    if original.error is not None:
+                        raise original.error
+                    result = original.result
+                else:
+                    result = job.result
+                assert result is not None
+                if create_dirs and job.json_path.parent not in created_dirs:
+                    job.json_path.parent.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(job.json_path.parent)
+                if original is not None:
+                    written = __link_json(original.json_path, job.json_path, dedup or 'copy', skip_unchanged)
+                else:
+                    # (replaces the file, i.e. files linked to it by deduplication are not modified)
+                    written = write_json_text(result.text, job.json_path, skip_unchanged)
+                if bundle_file and result.keys:
+                    if original is not None:
+                        # same line with a different path
+                        bundle_file.seek(original.bundle_offset)
+                        prefix_length = len(f'{{"path":{json.dumps(original.rel_path)}'.encode('utf8'))
+                        line = bundle_file.read(original.bundle_length)[prefix_length:]
+                        bundle_file.seek(0, os.SEEK_END)
+                        record = f'{{"path":{json.dumps(job.rel_path)}'.encode('utf8') + line
+                    else:
+                        record = (result.record or '').encode('utf8')
+                    bundle_offset = bundle_file.tell()
+                    bundle_length = len(record)
+                    bundle_file.write(record + b'\n')
+                    offsets.add(job.rel_path, len(record), *result.keys)
+                num_success += 1
+                note = f" (duplicate of '{original.rel_path}')" if original is not None else ''
+                if written:
+                    results[job.rel_path] = {'status': 'converted'}
+                    print(f"'{job.mtf_path}' -> '{job.json_path}' ...  SUCCESS{note}")
+                else:
+                    num_skipped += 1
+                    results[job.rel_path] = {'status': 'unchanged'}
+                    print(f"'{job.mtf_path}' -> '{job.json_path}' ...  SUCCESS (unchanged){note}")
+                if result.sha256:
+                    results[job.rel_path]['sha256'] = hashes[job.rel_path] = result.sha256
+            except QuarantinedError as ex:
+                num_quarantined += 1
+                results[job.rel_path] = {'status': 'quarantined', 'error': ex.reason}
+                run_quarantine[job.rel_path] = {'sha256': ex.sha256, 'reason': ex.reason}
+                print(f"'{job.mtf_path}' -> '{job.json_path}' ...  SKIPPED ({ex})")
+            except Exception as ex:
+                error = ex
+                error_occured = True
+                error_files.append((str(job.mtf_path), str(ex)))
+                results[job.rel_path] = {'status': 'failed', 'error': str(ex)}
+                if isinstance(ex, BudgetError):
+                    run_quarantine[job.rel_path] = {'sha256': ex.sha256, 'reason': str(ex)}
+                print(f"'{job.mtf_path}' -> '{job.json_path}' ...  ERROR: {ex}")
+                if not ignore_errors:
+                    stop.set()
+            if original is not None:
+                results[job.rel_path]['duplicate_of'] = original.rel_path
+            elif job.source is not None:
+                trimmed = job.result._replace(text='', record=None) if job.result else None
+                originals[job.source] = _Original(job.rel_path, job.json_path, trimmed, error, bundle_offset, bundle_length)
+        for thread in pipeline:
+            thread.join()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        if bundle_file:
+            bundle_file.close()
+    for job in deleted or ():
+        try:
+            job.json_path.unlink()
+            print(f"'{job.mtf_path}' -> '{job.json_path}' ...  REMOVED (MTF file deleted)")
+        except FileNotFoundError:
+            pass
+    if bundle:
+        offsets.write(offsets_path(bundle))
+    if report:
+        deleted_files = {} if deleted is None else {'deleted': sorted(job.rel_path for job in deleted), 'num_deleted': len(deleted)}
+        write_report({
+            'version': version,
+            'shards': [shard_str(shard or (1, 1))],
+            'num_files': num_files,
+            'num_success': num_success,
+            'num_written': num_success - num_skipped,
+            'num_skipped': num_skipped,
+            'files': results,
+            'quarantine': run_quarantine,
+            'num_duplicates': num_duplicates,
+            'dedup_ratio': dedup_ratio(num_files, num_duplicates),
+            **deleted_files
+        }, report)
+    if index:
+        write_report(hashes, index)
+    if quarantine:
+        # files of this run are only kept if they have been quarantined again
+        for rel_path in results:
+            quarantined.pop(rel_path, None)
+        quarantined.update(run_quarantine)
+        write_report(quarantined, quarantine)
+    if stop.is_set():
+        return 1
+
+    if ignore_errors:
+        # print statistics
+        print(f"> Converted {num_success} of {num_files} files.")
+        if skip_unchanged:
+            print(f"> Skipped {num_skipped} unchanged files.")
+        if num_quarantined:
+            print(f"> Skipped {num_quarantined} quarantined files.")
+        if dedup:
+            print(f"> Deduplicated {num_duplicates} files (dedup ratio {dedup_ratio(num_files, num_duplicates)}).")
+        if len(error_files) > 0:
+            print("> Failed to convert:")
+            for f, e in error_files:
+                print(f"  {f} ({e})")
+    return 1 if error_occured else 0
+
+
+def convert_dir(mtf_dir: Path,
+                json_dir: Optional[Path] = None,
+                recursive: bool = True,
+                ignore_errors: bool = False,
+                queue_depth: int = queue_depth,
+                threads: int = 1,
+                processes: int = 0,
+                shard: Optional[Tuple[int, int]] = None,
+                report: Optional[Path] = None,
+                bundle: Optional[Path] = None,
+                skip_unchanged: bool = False,
+                canonical: bool = False,
+                embed_hash: bool = False,
+                index: Optional[Path] = None,
+                validate: bool = False,
+                cache: Optional[ParseCache] = None,
+                include: Optional[Sequence[str]] = None,
+                exclude: Optional[Sequence[str]] = None,
+                walkers: int = 1,
+                manifest: Optional[Path] = None,
+                time_budget: Optional[float] = None,
+                memory_budget: Optional[int] = None,
+                quarantine: Optional[Path] = None,
+                dedup: Optional[str] = None) -> int:
+    """
+    Convert all MTF files in the `mtf_dir` folder to JSON (and subfolders if `recursive` is True).
+    The JSON files have the same name but suffix '.json' instead of '.mtf'.
+    If `json_dir` is given, write the JSON file to that directory.
+    If 'ignore_errors' is True, continue with the next file in case of an exception.
+    `queue_depth` limits the nr. of files in each pipeline queue (i.e. the memory usage).
+    The files are parsed by `threads` parser threads, or by a pool of `processes` processes
+    if `processes` is > 0. They are written in order if there's only one parser.
+    If `shard` (I, N) is given, only convert the files of shard I of N (see 'mtf2json.shard').
+    If `report` is given, write the result of each file to that JSON file.
+    If `bundle` is given, also write all mechs to that JSON lines file
+    (one '{"path": <MTF path>, "sha256": <content hash>, "mech": <JSON data>}' object per line)
+    and its offset index (see 'mtf2json.bundle').
+    Reports and bundles use the MTF paths relative to `mtf_dir`.
+    If `skip_unchanged` is True, JSON files that already have the same content are not
+    rewritten (see 'write_json_text()') and counted as 'num_skipped' in the report.
+    If `canonical` is True, the JSON files are serialized canonically, if `embed_hash` is True,
+    they contain the content hash of the mech (see 'to_json()').
+    If `index` is given, write the content hash of each converted mech to that JSON file
+    (MTF path -> hash). The report also contains the hashes if they have been computed.
+    If `validate` is True, the JSON data is validated (see 'validate_mech()') and invalid
+    mechs are treated like conversion errors.
+    If `cache` is given, the MTF files are looked up in that persistent cache before parsing
+    (see 'mtf2json.disk_cache').
+    The files are found by 'discover()' (see 'mtf2json.discovery' for `include`, `exclude`,
+    `walkers` and `manifest`) and converted while the tree is walked.
+    If `time_budget` (seconds) or `memory_budget` (bytes) is given, each file is converted in a worker
+    process (`processes`, or `threads` if 0) that is killed and restarted if the file exceeds the budget.
+    Such files fail and are listed in the 'quarantine' of the report. If `quarantine` is given, they are
+    also added to that JSON file, and the files in it are skipped (status 'quarantined') until they change.
+    If `dedup` ('hardlink', 'reflink' or 'copy') is given, files with the same content are only
+    parsed once: the JSON files of the later ones are links or copies of the first JSON file.
+    The report lists the first file of each duplicate ('duplicate_of') and the 'dedup_ratio'
+    (all files / unique files). Note that hardlinked JSON files share their content, i.e.
+    editing one of them in place also changes the others (conversions replace the files instead).
+    """
+    if not mtf_dir.is_dir():
+        raise ValueError(f"'{mtf_dir}' is not a directory.")
+    if dedup is not None and dedup not in link_modes:
+        raise ValueError(f"Invalid dedup mode '{dedup}' (expected one of {', '.join(link_modes)}).")
+
+    if json_dir:
+        if not json_dir.exists():
+            json_dir.mkdir(parents=True, exist_ok=True)
+        elif not json_dir.is_dir():
+            raise ValueError(f"'{json_dir}' is not a directory.")
+
+    return __run(__iter_jobs(mtf_dir, json_dir, recursive, shard, include, exclude, walkers, manifest), json_dir is not None,
+                 ignore_errors, queue_depth, threads, processes, report, bundle, shard, skip_unchanged,
+                 canonical, embed_hash, index, validate, cache, __budget(time_budget, memory_budget), quarantine, dedup)
+
+
+def convert_git(repo_dir: Path,
+                rev: str,
+                json_dir: Path,
+                subdir: Optional[str] = None,
+                since: Optional[str] = None,
+                recursive: bool = True,
+                ignore_errors: bool = False,
+                queue_depth: int = queue_depth,
+                threads: int = 1,
+                processes: int = 0,
+                shard: Optional[Tuple[int, int]] = None,
+                report: Optional[Path] = None,
+                bundle: Optional[Path] = None,
+                skip_unchanged: bool = False,
+                canonical: bool = False,
+                embed_hash: bool = False,
+                index: Optional[Path] = None,
+                validate: bool = False,
+                cache: Optional[ParseCache] = None,
+                dedup: Optional[str] = None) -> int:
+    """
+    Convert the MTF files of revision `rev` of the git repository `repo_dir` to JSON files in `json_dir`,
+    without a checkout (the files are read by a 'git cat-file' process, see 'mtf2json.gitrepo').
+    If `subdir` is given, only convert the MTF files in that directory of the repository
+    (the JSON files, reports and bundles use the paths relative to it).
+    If `since` is given, only convert the MTF files changed between revision `since` and `rev`.
+    The JSON files of MTF files deleted since then are removed, and the report lists them ('deleted').
+    Note that the report, bundle and index only contain the changed files in that case.
+    See 'convert_dir()' for the remaining arguments.
+    Raises a 'GitError' if the repository or the revisions can't be read.
+    """
+    if json_dir.exists() and not json_dir.is_dir():
+        raise ValueError(f"'{json_dir}' is not a directory.")
+    if dedup is not None and dedup not in link_modes:
+        raise ValueError(f"Invalid dedup mode '{dedup}' (expected one of {', '.join(link_modes)}).")
+    with GitRepo(repo_dir) as repo:
+        commit = repo.resolve(rev)
+        deleted: Optional[List[_Job]] = None
+        if since:
+            changes = repo.diff_tree(repo.resolve(since), commit, subdir)
+            files = changes.changed
+            deleted = []
+            for path in changes.deleted:
+                rel_path = __git_rel_path(path, subdir, recursive, shard)
+                if rel_path is not None:
+                    deleted.append(_Job(Path(path), json_dir / Path(rel_path).with_suffix('.json'), rel_path))
+        else:
+            files = repo.ls_tree(commit, subdir)
+        return __run(__iter_git_jobs(repo, files, json_dir, subdir, recursive, shard), True,
+                     ignore_errors, queue_depth, threads, processes, report, bundle, shard, skip_unchanged,
+                     canonical, embed_hash, index, validate, cache, dedup=dedup, deleted=deleted)
+
+
+def convert_many(mtf_files: Sequence[Path],
+                 json_files: Optional[Sequence[Path]] = None,
+                 ignore_errors: bool = False,
+                 queue_depth: int = queue_depth,
+                 threads: int = 1,
+                 processes: int = 0,
+                 report: Optional[Path] = None,
+                 bundle: Optional[Path] = None,
+                 skip_unchanged: bool = False,
+                 canonical: bool = False,
+                 embed_hash: bool = False,
+                 index: Optional[Path] = None,
+                 validate: bool = False,
+                 cache: Optional[ParseCache] = None,
+                 time_budget: Optional[float] = None,
+                 memory_budget: Optional[int] = None,
+                 quarantine: Optional[Path] = None) -> int:
+    """
+    Convert the given MTF files to JSON. If `json_files` is given, it must contain one JSON
+    file per MTF file. Otherwise the JSON files have the same name but suffix '.json'.
+    See 'convert_dir()' for the remaining arguments (reports, bundles and quarantine files use the given MTF paths).
+    """
+    if json_files is not None and len(json_files) != len(mtf_files):
+        raise ValueError("The number of JSON files must match the number of MTF files.")
+    jobs: Iterable[_Job] = (_Job(mtf_path, json_files[i] if json_files is not None else mtf_path.with_suffix('.json'),
+                                 mtf_path.as_posix())
+                            for i, mtf_path in enumerate(mtf_files))
+    return __run(iter(jobs), False, ignore_errors, queue_depth, threads, processes, report, bundle,
+                 skip_unchanged=skip_unchanged, canonical=canonical, embed_hash=embed_hash, index=index,
+                 validate=validate, cache=cache, budget=__budget(time_budget, memory_budget), quarantine=quarantine)
+
+
+def iter_file_list(stream: BinaryIO, chunk_size: int = 1 << 16) -> Iterator[Path]:
+    """
+    Yield the paths in the given file list (e.g. the output of 'find' on stdin).
+    The paths are separated by NUL characters (e.g. 'find -print0') if the first separator
+    is a NUL character, by newlines otherwise. Empty entries are skipped.
+    The stream is read in chunks, i.e. the paths are yielded while the list is being written.
+    """
+    # read what's available instead of waiting for a full chunk (e.g. from a pipe)
+    read = getattr(stream, 'read1', stream.read)
+    separator: Optional[bytes] = None
+    rest = b''
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        rest += chunk
+        if separator is None:
+            nul, newline = rest.find(b'\0'), rest.find(b'\n')
+            if nul < 0 and newline < 0:
+                continue
+            separator = b'\0' if newline < 0 or 0 <= nul < newline else b'\n'
+        *entries, rest = rest.split(separator)
+        for entry in entries:
+            if separator == b'\n':
+                entry = entry.rstrip(b'\r')
+            if entry:
+                yield Path(os.fsdecode(entry))
+    if separator == b'\n':
+        rest = rest.rstrip(b'\r')
+    if rest:
+        yield Path(os.fsdecode(rest))
+
+
+def __windowed(jobs: Iterator[_Job], window: threading.Semaphore) -> Iterator[_Job]:
+    """
+    Yield the given jobs, each one after acquiring the `window` semaphore
+    (released when the job is finished, i.e. limits the nr. of unfinished jobs).
+    """
+    for job in jobs:
+        window.acquire()
+        yield job
+
+
+def convert_to_jsonl(mtf_files: Iterable[Path],
+                     out: BinaryIO,
+                     queue_depth: int = queue_depth,
+                     threads: int = 1,
+                     processes: int = 0,
+                     validate: bool = False,
+                     buffer_size: int = 1 << 20,
+                     cache: Optional[ParseCache] = None) -> int:
+    """
+    Convert the given MTF files and write one JSON line per file to `out`, in input order
+    (also if the files are parsed in parallel, see 'convert_dir()' for the parallel arguments and `cache`):
+        * '{"path": <MTF path>, "sha256": <content hash>, "mech": <JSON data>}' (like bundle lines)
+        * '{"path": <MTF path>, "error": <error message>}' if the file can't be converted
+    `mtf_files` may be a lazy iterable (e.g. 'iter_file_list()'). The lines are collected
+    and written in blocks of about `buffer_size` bytes. Returns 1 if an error occured, 0 otherwise.
+    At most `queue_depth * (parsers + 2)` files are in flight (read but not written), i.e. the
+    records after a slow file don't pile up in memory while waiting for it.
+    """
+    output = _Output(True, True, True, False, validate, files=False, cache=cache)
+    num_parsers = processes if processes > 0 else max(threads, 1)
+    # the jobs in the queues plus `queue_depth` finished jobs per parser (waiting for their predecessors)
+    window = threading.Semaphore(queue_depth * (num_parsers + 2))
+    jobs = __windowed((_Job(mtf_path, mtf_path, mtf_path.as_posix()) for mtf_path in mtf_files), window)
+    executor, pipeline, write_queue, stop = __start(jobs, queue_depth, threads, processes, output)
+    # jobs that are finished before their predecessors (parallel parsers)
+    pending: Dict[int, _Job] = {}
+    next_seq = 0
+    lines: List[bytes] = []
+    buffered = 0
+    error_occured = False
+    try:
+        for job in __results(write_queue, len(pipeline) - 1, stop):
+            pending[job.seq] = job
+            while next_seq in pending:
+                job = pending.pop(next_seq)
+                next_seq += 1
+                window.release()
+                if job.error is not None or job.result is None or job.result.record is None:
+                    error_occured = True
+                    line = json.dumps({'path': job.rel_path, 'error': str(job.error)}).encode('utf8')
+                else:
+                    line = job.result.record.encode('utf8')
+                lines.append(line)
+                lines.append(b'\n')
+                buffered += len(line) + 1
+                if buffered >= buffer_size:
+                    out.write(b''.join(lines))
+                    lines.clear()
+                    buffered = 0
+        for thread in pipeline:
+            thread.join()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    out.write(b''.join(lines))
+    out.flush()
+    return 1 if error_occured else 0
@@ -0,0 +1,146 @@
+"""
+Random access to bundles (see 'convert_dir()').
+A bundle is a JSON lines file with one '{"path": ..., "sha256": ..., "mech": ...}'
+record per line. The bundle writer also writes an offset index next to the bundle
+('<bundle>.offsets.json'), which maps each source path to the byte offset and length
+of its record, and each MUL id and name (chassis + model) to the source paths.
+'BundleReader' maps the bundle into memory and decodes only the requested records.
+"""
+import json
+import mmap
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def offsets_path(bundle: Path) -> Path:
+    """
+    Return the path of the offset index of the given bundle.
+    """
+    return bundle.with_name(bundle.name + '.offsets.json')
+
+
+def mech_name(chassis: str, model: str = '') -> str:
+    """
+    Return the name used as key in the offset index, e.g. 'Atlas AS7-K'.
+    """
+    return f"{chassis} {model}".strip()
+
+
+class OffsetIndex:
+    """
+    The offset index of a bundle. Records are added in the order in which they are
+    written to the bundle (each record followed by a newline).
+    """
+    def __init__(self) -> None:
+        # size of the bundle
+        self.size = 0
+        # source path -> (offset, length)
+        self.records: Dict[str, Tuple[int, int]] = {}
+        # MUL id / name -> source paths
+        self.mul_ids: Dict[str, List[str]] = {}
+        self.names: Dict[str, List[str]] = {}
+
+    def add(self, rel_path: str, length: int, mul_id: Optional[int], chassis: str, model: str) -> None:
+        """
+        Add the record of `length` bytes that has been written to the end of the bundle.
+        """
+        if rel_path in self.records:
+            raise ValueError(f"File '{rel_path}' is already contained in the bundle.")
+        self.records[rel_path] = (self.size, length)
+        self.size += length + 1
+        if mul_id is not None:
+            self.mul_ids.setdefault(str(mul_id), []).append(rel_path)
+        self.names.setdefault(mech_name(chassis, model), []).append(rel_path)
+
+    def write(self, path: Path) -> None:
+        with open(path, 'w') as f:
+            json.dump({
+                'size': self.size,
+                'records': self.records,
+                'mul_ids': self.mul_ids,
+                'names': self.names
+            }, f, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: Path) -> 'OffsetIndex':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        index = cls()
+        index.size = data['size']
+        index.records = {p: (r[0], r[1]) for p, r in data['records'].items()}
+        index.mul_ids = data['mul_ids']
+        index.names = data['names']
+        return index
+
+
+class BundleReader:
+    """
+    Read single records from a bundle without scanning it:
+    ```
+    with BundleReader(Path('corpus.jsonl')) as bundle:
+        atlas = bundle.by_name('Atlas', 'AS7-K')[0]
+    ```
+    Raises a ValueError if the bundle doesn't match its offset index (e.g. it has been
+    rewritten without the index).
+    """
+    def __init__(self, bundle: Path, offsets: Optional[Path] = None) -> None:
+        self.index = OffsetIndex.load(offsets or offsets_path(bundle))
+        self._file = open(bundle, 'rb')
+        try:
+            size = self._file.seek(0, 2)
+            if size != self.index.size:
+                raise ValueError(f"Bundle '{bundle}' ({size} bytes) doesn't match its offset index ({self.index.size} bytes).")
+            # empty files can't be mapped
+            self._data: Any = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        except BaseException:
+            self._file.close()
+            raise
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> 'BundleReader':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index.records)
+
+    def __contains__(self, rel_path: object) -> bool:
+        return rel_path in self.index.records
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the source paths (in bundle order).
+        """
+        return iter(self.index.records)
+
+    def record(self, rel_path: str) -> Dict[str, Any]:
+        """
+        Return the complete record ('path', 'sha256' and 'mech') of the given source path.
+        Raises a KeyError if the bundle doesn't contain it.
+        """
+        offset, length = self.index.records[rel_path]
+        return json.loads(self._data[offset:offset + length])
+
+    def get(self, rel_path: str) -> Dict[str, Any]:
+        """
+        Return the JSON data of the mech converted from the given source path.
+        """
+        return self.record(rel_path)['mech']
+
+    def by_mul_id(self, mul_id: int) -> List[Dict[str, Any]]:
+        """
+        Return the JSON data of all mechs with the given MUL id.
+        """
+        return [self.get(p) for p in self.index.mul_ids.get(str(mul_id), [])]
+
+    def by_name(self, chassis: str, model: str = '') -> List[Dict[str, Any]]:
+        """
+        Return the JSON data of all mechs with the given chassis and model.
+        """
+        return [self.get(p) for p in self.index.names.get(mech_name(chassis, model), [])]
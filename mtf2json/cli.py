@@ -2,10 +2,19 @@
 import sys
 import json
 import argparse
+import sqlite3
 from pathlib import Path
-import os
-from .mtf2json import read_mtf, write_json, ConversionError, version, mm_commit
-from typing import Optional, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .mtf2json import read_mtf, write_json, to_json, ConversionError, version, mm_commit
+from .batch import convert_dir, convert_git, convert_many, convert_to_jsonl, iter_file_list, default_workers, queue_depth, link_modes
+from .shard import parse_shard, merge_reports, merge_bundles, merge_indexes, write_report
+from . import corpus_stats
+from .corpus_diff import diff_corpora, format_diff
+from .export import export_columnar, chunk_size
+from .validate import check_mech
+from .gitrepo import GitError
+from .disk_cache import ParseCache, open_cache, default_cache_path, max_cache_size
+from .shared_corpus import write_corpus
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -17,6 +26,13 @@ def create_parser() -> argparse.ArgumentParser:
                         nargs='+',
                         help="The MTF file(s) to convert.",
                         metavar="MTF_FILE")
+    parser.add_argument('--files-from', '-f',
+                        type=str,
+                        help="Read the MTF files to convert from the given file ('-' for stdin), separated by newlines or NUL characters.",
+                        metavar="FILE")
+    parser.add_argument('--jsonl',
+                        action='store_true',
+                        help="Write one JSON line per MTF file to stdout (in input order), with an error object for failed files.")
     parser.add_argument('--convert', '-c',
                         action='store_true',
                         help="Convert the MTF file to a JSON file (use same filename with suffix '.json').")
@@ -39,74 +55,415 @@ def create_parser() -> argparse.ArgumentParser:
                         type=str,
                         help="Store all JSON files in the given directory.",
                         metavar="JSON_DIR")
+    parser.add_argument('--git-repo', '-g',
+                        type=str,
+                        help="Read the MTF files from the given git repository (no checkout required, requires --json-dir). "
+                             "--mtf-dir is the directory in the repository.",
+                        metavar="REPO_DIR")
+    parser.add_argument('--rev',
+                        type=str,
+                        default='HEAD',
+                        help="The revision of --git-repo to convert (default: HEAD).",
+                        metavar="REV")
+    parser.add_argument('--since',
+                        type=str,
+                        help="Only convert the MTF files of --git-repo that changed between the given revision and --rev "
+                             "(e.g. $(mtf2json --mm-commit)) and remove the JSON files of deleted MTF files. "
+                             "The --report only contains these files (no --bundle or --index).",
+                        metavar="REV")
     parser.add_argument('--recursive', '-r',
                         action='store_true',
                         help="Recursively convert MTF files in subdirectories.")
+    parser.add_argument('--include',
+                        type=str,
+                        action='append',
+                        help="Only convert the files of --mtf-dir matching the given glob (default: '*.mtf', can be repeated). "
+                             "Globs with '/' match the relative path, others the file name.",
+                        metavar="GLOB")
+    parser.add_argument('--exclude',
+                        type=str,
+                        action='append',
+                        help="Skip the files and directories of --mtf-dir matching the given glob (can be repeated).",
+                        metavar="GLOB")
+    parser.add_argument('--walkers',
+                        type=int,
+                        default=1,
+                        help="List the subdirectories of --mtf-dir in N parallel threads, e.g. on network file systems (default: 1).",
+                        metavar="N")
+    parser.add_argument('--manifest',
+                        type=str,
+                        help="Reuse the directory listings of --mtf-dir stored in the given file by the previous run "
+                             "(if the directories haven't changed) and update it.",
+                        metavar="MANIFEST_FILE")
     parser.add_argument('--ignore-errors', '-i',
                         action='store_true',
                         help="Ignore errors during conversion (continue with next file). Print statistics afterwards.")
+    parser.add_argument('--queue-depth', '-q',
+                        type=int,
+                        default=queue_depth,
+                        help=f"Max. nr. of files buffered between the read, parse and write stages of --mtf-dir (default: {queue_depth}).",
+                        metavar="N")
+    parallel = parser.add_mutually_exclusive_group()
+    parallel.add_argument('--threads', '-t',
+                          type=int,
+                          help="Parse files in N threads (default for --mtf-dir on free-threaded Python builds).",
+                          metavar="N")
+    parallel.add_argument('--processes', '-p',
+                          type=int,
+                          help="Parse files in N processes (default for --mtf-dir on Python builds with GIL).",
+                          metavar="N")
+    parser.add_argument('--validate',
+                        action='store_true',
+                        help="Validate the converted JSON data (structure, types and pips) and treat invalid data as error.")
+    parser.add_argument('--cache',
+                        type=str,
+                        nargs='?',
+                        const='',
+                        help="Look up the MTF files in a persistent parse cache before parsing (and store the results). "
+                             f"Default database: '{default_cache_path()}' ($MTF2JSON_CACHE).",
+                        metavar="DB_FILE")
+    parser.add_argument('--cache-size',
+                        type=int,
+                        default=max_cache_size // (1024 * 1024),
+                        help=f"Max. size of the parse cache in MiB (default: {max_cache_size // (1024 * 1024)}).",
+                        metavar="MIB")
+    parser.add_argument('--time-budget',
+                        type=float,
+                        help="Max. conversion time per file in seconds. Files are converted in worker processes "
+                             "that are killed (and restarted) if a file exceeds the budget (--mtf-dir or multiple --mtf-file).",
+                        metavar="SECONDS")
+    parser.add_argument('--memory-budget',
+                        type=int,
+                        help="Max. additional memory of a worker process per file in MiB "
+                             "(see --time-budget, not enforced on Windows / macOS).",
+                        metavar="MIB")
+    parser.add_argument('--quarantine',
+                        type=str,
+                        help="Add files that exceed the budget to the given JSON file and skip the files in it until they change.",
+                        metavar="QUARANTINE_FILE")
+    parser.add_argument('--dedup',
+                        choices=link_modes,
+                        help="Convert byte-identical files of --mtf-dir (or --git-repo) only once and write the other JSON files as "
+                             "hardlinks, reflinks or copies of the first one (links fall back to copies if unsupported).")
+    parser.add_argument('--skip-unchanged', '-u',
+                        action='store_true',
+                        help="Don't rewrite JSON files that already have the same content (preserves their mtime).")
+    parser.add_argument('--canonical',
+                        action='store_true',
+                        help="Serialize JSON canonically (sorted keys, no whitespace), i.e. equal data results in equal files.")
+    parser.add_argument('--embed-hash',
+                        action='store_true',
+                        help="Add the content hash (SHA-256 of the canonical JSON) to the JSON data (key '_meta').")
+    parser.add_argument('--shard', '-s',
+                        type=str,
+                        help="Only convert shard I of N of --mtf-dir (partitioned by a stable hash of the relative file paths).",
+                        metavar="I/N")
+    parser.add_argument('--report',
+                        type=str,
+                        help="Write the result of each file to the given JSON file (--mtf-dir or multiple --mtf-file).",
+                        metavar="REPORT_FILE")
+    parser.add_argument('--bundle',
+                        type=str,
+                        help="Also write all converted mechs to the given JSON lines file (--mtf-dir or multiple --mtf-file).",
+                        metavar="BUNDLE_FILE")
+    parser.add_argument('--index',
+                        type=str,
+                        help="Write the content hash of each converted mech to the given JSON file (--mtf-dir or multiple --mtf-file).",
+                        metavar="INDEX_FILE")
     return parser
 
 
-def convert_dir(mtf_dir: Path,
-                json_dir: Optional[Path] = None,
-                recursive: bool = True,
-                ignore_errors: bool = False) -> int:
-    """
-    Convert all MTF files in the `mtf_dir` folder to JSON (and subfolders if `recursive` is True).
-    The JSON files have the same name but suffix '.json' instead of '.mtf'.
-    If `json_dir` is given, write the JSON file to that directory.
-    If 'ignore_errors' is True, continue with the next file in case of an exception.
-    """
-    if not mtf_dir.is_dir():
-        raise ValueError(f"'{mtf_dir}' is not a directory.")
-
-    if json_dir:
-        if not json_dir.exists():
-            json_dir.mkdir(parents=True, exist_ok=True)
-        elif not json_dir.is_dir():
-            raise ValueError(f"'{json_dir}' is not a directory.")
-
-    num_files = num_success = 0
-    error_files: List[Tuple[str, str]] = []
-    error_occured = False
-    for root, _, files in os.walk(mtf_dir):
-        files.sort()
-        for file in files:
-            if file.endswith('.mtf'):
-                num_files += 1
-                mtf_path = Path(root) / file
-                if json_dir:
-                    relative_path = mtf_path.relative_to(mtf_dir)
-                    json_path = json_dir / relative_path.with_suffix('.json')
-                    json_path.parent.mkdir(parents=True, exist_ok=True)
-                else:
-                    json_path = mtf_path.with_suffix('.json')
-                try:
-                    print(f"'{mtf_path}' -> '{json_path}' ...  ", end='')
-                    data = read_mtf(mtf_path)
-                    write_json(data, json_path)
-                    num_success += 1
-                    print("SUCCESS")
-                except Exception as ex:
-                    error_occured = True
-                    error_files.append((str(mtf_path), str(ex)))
-                    print(f"ERROR: {ex}")
-                    if not ignore_errors:
-                        return 1
-        if not recursive:
-            break
-    if ignore_errors:
-        # print statistics
-        print(f"> Converted {num_success} of {num_files} files.")
-        if len(error_files) > 0:
-            print("> Failed to convert:")
-            for f, e in error_files:
-                print(f"  {f} ({e})")
-    return 1 if error_occured else 0
+def create_merge_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json merge-shards",
+            description="Combine the reports, bundles or indexes of all shards into one deterministic file.")
+    parser.add_argument('files',
+                        type=str,
+                        nargs='+',
+                        help="The per-shard reports (with --report), bundles (with --bundle) or indexes (with --index).",
+                        metavar="FILE")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--report',
+                        type=str,
+                        help="Merge reports and write the result to the given file.",
+                        metavar="REPORT_FILE")
+    output.add_argument('--bundle',
+                        type=str,
+                        help="Merge bundles and write the result to the given file.",
+                        metavar="BUNDLE_FILE")
+    output.add_argument('--index',
+                        type=str,
+                        help="Merge indexes and write the result to the given file.",
+                        metavar="INDEX_FILE")
+    return parser
+
+
+def merge_shards(argv: List[str]) -> int:
+    """
+    The 'merge-shards' command.
+    """
+    args = create_merge_parser().parse_args(argv)
+    files = [Path(f) for f in args.files]
+    try:
+        if args.report:
+            report = merge_reports(files)
+            write_report(report, Path(args.report))
+            print(f"Merged shards {', '.join(report['shards'])} into '{args.report}' ({report['num_files']} files).")
+        elif args.bundle:
+            num_mechs = merge_bundles(files, Path(args.bundle))
+            print(f"Merged {len(files)} bundles into '{args.bundle}' ({num_mechs} mechs).")
+        else:
+            index = merge_indexes(files)
+            write_report(index, Path(args.index))
+            print(f"Merged {len(files)} indexes into '{args.index}' ({len(index)} mechs).")
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: merging failed with '{e}'")
+        return 1
+    return 0
+
+
+def add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the (mutually exclusive) mech sources of the 'stats' and 'export' commands.
+    """
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--mtf-dir', '-M',
+                        type=str,
+                        help="Convert all MTF files in the given directory (recursively).",
+                        metavar="MTF_DIR")
+    source.add_argument('--json-dir', '-J',
+                        type=str,
+                        help="Load all converted JSON files in the given directory (recursively).",
+                        metavar="JSON_DIR")
+    source.add_argument('--bundle',
+                        type=str,
+                        help="Load all mechs in the given bundle.",
+                        metavar="BUNDLE_FILE")
+
+
+def iter_source(args: argparse.Namespace) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Return an iterator over (path, JSON data) of all mechs in the source given by `args`.
+    """
+    if args.mtf_dir:
+        return corpus_stats.iter_mtf_dir(Path(args.mtf_dir))
+    if args.json_dir:
+        return corpus_stats.iter_json_dir(Path(args.json_dir))
+    return corpus_stats.iter_bundle(Path(args.bundle))
+
+
+def create_stats_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json stats",
+            description="Export derived record sheet statistics (armor, MP, heat, weapons) of all mechs as CSV.")
+    add_source_arguments(parser)
+    parser.add_argument('--output', '-o',
+                        type=str,
+                        help="Write the CSV to the given file (default: stdout).",
+                        metavar="CSV_FILE")
+    return parser
+
+
+def stats(argv: List[str]) -> int:
+    """
+    The 'stats' command.
+    """
+    args = create_stats_parser().parse_args(argv)
+    try:
+        columns = corpus_stats.load_columns(iter_source(args))
+        if args.output:
+            with open(args.output, 'w', newline='') as csv_file:
+                corpus_stats.write_csv(columns, csv_file)
+        else:
+            corpus_stats.write_csv(columns, sys.stdout)
+    except (OSError, ValueError, ConversionError) as e:
+        print(f"Error: computing statistics failed with '{e}'", file=sys.stderr)
+        return 1
+    return 0
+
+
+def create_export_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json export",
+            description="Export all mechs to per-entity tables (mechs, weapons, armor_locations, crit_slots, quirks, fluff).")
+    add_source_arguments(parser)
+    parser.add_argument('--columnar',
+                        type=str,
+                        required=True,
+                        help="Write one CSV file per table to the given directory.",
+                        metavar="DIR")
+    parser.add_argument('--chunk-size',
+                        type=int,
+                        default=chunk_size,
+                        help=f"Max. nr. of rows buffered per table (default: {chunk_size}).",
+                        metavar="N")
+    return parser
+
+
+def export(argv: List[str]) -> int:
+    """
+    The 'export' command.
+    """
+    args = create_export_parser().parse_args(argv)
+    try:
+        num_mechs = export_columnar(iter_source(args), Path(args.columnar), args.chunk_size)
+    except (OSError, ValueError, ConversionError) as e:
+        print(f"Error: export failed with '{e}'")
+        return 1
+    print(f"Exported {num_mechs} mechs to '{args.columnar}'.")
+    return 0
+
+
+def create_diff_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json diff",
+            description="Compare two MTF directories (or two bundles) and report the changed mechs field by field.")
+    parser.add_argument('old',
+                        type=str,
+                        help="The old MTF directory or bundle.",
+                        metavar="OLD")
+    parser.add_argument('new',
+                        type=str,
+                        help="The new MTF directory or bundle.",
+                        metavar="NEW")
+    parser.add_argument('--output', '-o',
+                        type=str,
+                        help="Write the JSON report to the given file.",
+                        metavar="REPORT_FILE")
+    parser.add_argument('--json',
+                        action='store_true',
+                        help="Print the JSON report instead of a summary.")
+    parallel = parser.add_mutually_exclusive_group()
+    parallel.add_argument('--threads', '-t',
+                          type=int,
+                          help="Compare files in N threads (default on free-threaded Python builds).",
+                          metavar="N")
+    parallel.add_argument('--processes', '-p',
+                          type=int,
+                          help="Compare files in N processes (default on Python builds with GIL).",
+                          metavar="N")
+    return parser
+
+
+def diff(argv: List[str]) -> int:
+    """
+    The 'diff' command.
+    """
+    args = create_diff_parser().parse_args(argv)
+    threads, processes = parallel_workers(args)
+    try:
+        report = diff_corpora(Path(args.old), Path(args.new), threads, processes)
+        if args.output:
+            write_report(report, Path(args.output))
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: diff failed with '{e}'")
+        return 1
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        for line in format_diff(report):
+            print(line)
+    return 1 if report['failed'] else 0
+
+
+def create_cache_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json cache",
+            description="Show the statistics of the persistent parse cache, prune it or clear it.")
+    parser.add_argument('action',
+                        choices=['stats', 'prune', 'clear'],
+                        help="'stats': print the nr. of entries and their size, 'prune': remove the entries of other versions "
+                             "and the least recently used entries above --max-size, 'clear': remove all entries.")
+    parser.add_argument('--cache',
+                        type=str,
+                        help=f"The cache database (default: '{default_cache_path()}').",
+                        metavar="DB_FILE")
+    parser.add_argument('--max-size',
+                        type=int,
+                        default=max_cache_size // (1024 * 1024),
+                        help=f"Max. size of the cache in MiB for 'prune' (default: {max_cache_size // (1024 * 1024)}).",
+                        metavar="MIB")
+    return parser
+
+
+def cache(argv: List[str]) -> int:
+    """
+    The 'cache' command.
+    """
+    args = create_cache_parser().parse_args(argv)
+    try:
+        parse_cache = open_cache(Path(args.cache) if args.cache else None, args.max_size * 1024 * 1024)
+        if args.action == 'prune':
+            print(f"Removed {parse_cache.prune()} entries.")
+        elif args.action == 'clear':
+            parse_cache.clear()
+            print(f"Cleared '{parse_cache.path}'.")
+        else:
+            for key, value in parse_cache.stats().items():
+                if key not in ('hits', 'misses'):
+                    print(f"{key}: {value}")
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: cache {args.action} failed with '{e}'")
+        return 1
+    return 0
+
+
+def create_corpus_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+            prog="mtf2json corpus",
+            description="Build a shared corpus file that multiple processes can read without loading it "
+                        "(see 'mtf2json.shared_corpus'). An existing corpus file is replaced atomically.")
+    add_source_arguments(parser)
+    parser.add_argument('--output', '-o',
+                        type=str,
+                        required=True,
+                        help="Write the corpus to the given file.",
+                        metavar="CORPUS_FILE")
+    return parser
+
+
+def corpus(argv: List[str]) -> int:
+    """
+    The 'corpus' command.
+    """
+    args = create_corpus_parser().parse_args(argv)
+    try:
+        num_mechs = write_corpus(iter_source(args), Path(args.output))
+    except (OSError, ValueError, ConversionError) as e:
+        print(f"Error: building the corpus failed with '{e}'")
+        return 1
+    print(f"Wrote {num_mechs} mechs to '{args.output}'.")
+    return 0
+
+
+# commands that are given as first argument, e.g. 'mtf2json merge-shards ...'
+commands: Dict[str, Callable[[List[str]], int]] = {
+    'merge-shards': merge_shards,
+    'stats': stats,
+    'export': export,
+    'diff': diff,
+    'cache': cache,
+    'corpus': corpus,
+}
+
+
+def parallel_workers(args: argparse.Namespace) -> Tuple[int, int]:
+    """
+    Return the nr. of parser (threads, processes) for the given arguments.
+    If neither --threads nor --processes is given, use 'default_workers()'.
+    """
+    if args.threads:
+        return (args.threads, 0)
+    if args.processes:
+        return (1, args.processes)
+    mode, workers = default_workers()
+    return (workers, 0) if mode == 'threads' else (1, workers)
 
 
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        sys.exit(commands[sys.argv[1]](sys.argv[2:]))
+
     parser = create_parser()
     args = parser.parse_args()
 
@@ -117,26 +474,149 @@ def main() -> None:
     if args.mm_commit:
         print(f"{mm_commit}")
         sys.exit(0)
+    parse_cache: Optional[ParseCache] = None
+    if args.cache is not None:
+        try:
+            parse_cache = open_cache(Path(args.cache) if args.cache else None, args.cache_size * 1024 * 1024)
+        except (OSError, sqlite3.Error) as e:
+            print(f"\nError: opening the parse cache failed with '{e}'")
+            sys.exit(1)
+
+    if (args.time_budget is not None or args.memory_budget is not None or args.quarantine) and (args.git_repo or args.jsonl):
+        print("\nError: --time-budget, --memory-budget and --quarantine can't be combined with --git-repo or --jsonl.")
+        parser.print_help()
+        sys.exit(1)
+
+    # options of the directory walk (--mtf-dir only)
+    walk_options = [option for option, value in [('--include', args.include), ('--exclude', args.exclude),
+                                                 ('--walkers', args.walkers != 1), ('--manifest', args.manifest)] if value]
+    # convert the MTF files of a git repository (--mtf-dir is a directory in the repository)
+    if args.git_repo:
+        if args.mtf_file or args.files_from or args.json_file or args.jsonl or not args.json_dir:
+            print("\nError: --git-repo requires --json-dir (and can't be combined with --mtf-file, --files-from or --jsonl).")
+            parser.print_help()
+            sys.exit(1)
+        if walk_options:
+            print(f"\nError: {', '.join(walk_options)} can't be combined with --git-repo.")
+            parser.print_help()
+            sys.exit(1)
+        # a bundle or index of the changed files would replace the complete one of the previous run
+        if args.since and (args.bundle or args.index):
+            print("\nError: --bundle and --index can't be combined with --since.")
+            parser.print_help()
+            sys.exit(1)
+        try:
+            git_shard = parse_shard(args.shard) if args.shard else None
+            threads, processes = parallel_workers(args)
+            sys.exit(convert_git(Path(args.git_repo), args.rev, Path(args.json_dir), args.mtf_dir, args.since, args.recursive,
+                                 args.ignore_errors, args.queue_depth, threads, processes, git_shard,
+                                 Path(args.report) if args.report else None, Path(args.bundle) if args.bundle else None,
+                                 args.skip_unchanged, args.canonical, args.embed_hash,
+                                 Path(args.index) if args.index else None, args.validate, parse_cache, args.dedup))
+        except (GitError, ValueError) as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
+    elif args.rev != 'HEAD' or args.since:
+        print("\nError: --rev and --since require --git-repo.")
+        parser.print_help()
+        sys.exit(1)
 
     # either file conversion or directory conversion is allowed, but not both simultaneously
-    if (args.mtf_file and args.mtf_dir) or (args.json_file and args.json_dir):
-        print("\nError: Specify either --mtf-file or --mtf-dir, and either --json-file or --json-dir, but not both.")
+    if (args.mtf_file and args.mtf_dir) or (args.json_file and args.json_dir) or (args.files_from and (args.mtf_file or args.mtf_dir)):
+        print("\nError: Specify either --mtf-file, --files-from or --mtf-dir, and either --json-file or --json-dir, but not both.")
+        parser.print_help()
+        sys.exit(1)
+    # either --mtf-file, --files-from or --mtf-dir is required
+    if not args.mtf_file and not args.files_from and not args.mtf_dir:
+        print("\nError: Either --mtf-file, --files-from or --mtf-dir must be specified.")
+        parser.print_help()
+        sys.exit(1)
+    if walk_options and not args.mtf_dir:
+        print(f"\nError: {', '.join(walk_options)} can only be used with --mtf-dir.")
+        parser.print_help()
+        sys.exit(1)
+    if args.dedup and not args.mtf_dir:
+        print("\nError: --dedup requires --mtf-dir or --git-repo.")
         parser.print_help()
         sys.exit(1)
-    # either --mtf-file or --mtf-dir is required
-    if not args.mtf_file and not args.mtf_dir:
-        print("\nError: Either --mtf-file or --mtf-dir must be specified.")
+    if args.jsonl and (args.mtf_dir or args.convert or args.json_file or args.report or args.bundle or args.index or args.shard):
+        print("\nError: --jsonl requires --mtf-file or --files-from and writes to stdout only "
+              "(no --convert, --json-file, --json-dir, --report, --bundle, --index or --shard).")
         parser.print_help()
         sys.exit(1)
+
+    # stream the JSON lines to stdout (the file list is read while converting)
+    if args.jsonl:
+        threads, processes = parallel_workers(args)
+        try:
+            if args.files_from and args.files_from != '-':
+                with open(args.files_from, 'rb') as file_list:
+                    sys.exit(convert_to_jsonl(iter_file_list(file_list), sys.stdout.buffer, args.queue_depth,
+                                              threads, processes, args.validate, cache=parse_cache))
+            mtf_files = iter_file_list(sys.stdin.buffer) if args.files_from else (Path(f) for f in args.mtf_file)
+            sys.exit(convert_to_jsonl(mtf_files, sys.stdout.buffer, args.queue_depth, threads, processes, args.validate,
+                                      cache=parse_cache))
+        except OSError as e:
+            print(f"Error: conversion failed with '{e}'", file=sys.stderr)
+            sys.exit(1)
+    if args.files_from:
+        try:
+            if args.files_from == '-':
+                args.mtf_file = [str(p) for p in iter_file_list(sys.stdin.buffer)]
+            else:
+                with open(args.files_from, 'rb') as file_list:
+                    args.mtf_file = [str(p) for p in iter_file_list(file_list)]
+        except OSError as e:
+            print(f"Error: reading the file list failed with '{e}'")
+            sys.exit(1)
+        if not args.mtf_file:
+            print("Error: the file list is empty.")
+            sys.exit(1)
+
     #  nr. of arguments for --mtf-file and --json-file must match
     if args.json_file and len(args.mtf_file) != len(args.json_file):
         print("\nError: The number of JSON files must match the number of MTF files.")
         parser.print_help()
         sys.exit(1)
+    shard: Optional[Tuple[int, int]] = None
+    if args.shard:
+        if not args.mtf_dir:
+            print("\nError: --shard requires --mtf-dir.")
+            parser.print_help()
+            sys.exit(1)
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
+    report = Path(args.report) if args.report else None
+    bundle = Path(args.bundle) if args.bundle else None
+    index = Path(args.index) if args.index else None
     # set convert to True if --json-file or --json-dir are specified (or multiple MTF files)
     if args.json_file or args.json_dir or (args.mtf_file and len(args.mtf_file) > 1):
         args.convert = True
 
+    quarantine = Path(args.quarantine) if args.quarantine else None
+    memory_budget = args.memory_budget * 1024 * 1024 if args.memory_budget else None
+    budgeted = args.time_budget is not None or memory_budget is not None or quarantine is not None
+    if budgeted and not (args.mtf_dir or (args.mtf_file and args.convert)):
+        print("\nError: --time-budget, --memory-budget and --quarantine require --mtf-dir or multiple --mtf-file.")
+        parser.print_help()
+        sys.exit(1)
+
+    # convert given MTF files in parallel (or with report / bundle / budget)
+    if args.mtf_file and args.convert and (args.threads or args.processes or report or bundle or index or budgeted):
+        threads, processes = parallel_workers(args)
+        json_files = [Path(f) for f in args.json_file] if args.json_file else None
+        try:
+            sys.exit(convert_many([Path(f) for f in args.mtf_file], json_files, args.ignore_errors,
+                                  args.queue_depth, threads, processes, report, bundle, args.skip_unchanged,
+                                  args.canonical, args.embed_hash, index, args.validate, parse_cache,
+                                  args.time_budget, memory_budget, quarantine))
+        except ValueError as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
+
     # convert given MTF file(s)
     if args.mtf_file:
         for i, mtf_file in enumerate(args.mtf_file):
@@ -145,7 +625,9 @@ def main() -> None:
                 print(f"File {path} does not exist!")
                 sys.exit(1)
             try:
-                data = read_mtf(path)
+                data = read_mtf(path, parse_cache)
+                if args.validate:
+                    check_mech(data)
             except ConversionError as e:
                 print(f"Failed to convert '{path}': {e}")
                 sys.exit(1)
@@ -154,19 +636,33 @@ def main() -> None:
             if args.convert:
                 json_path = Path(args.json_file[i]) if args.json_file else path.with_suffix('.json')
                 try:
-                    write_json(data, json_path)
-                    print(f"Successfully saved JSON file '{json_path}'.")
+                    if write_json(data, json_path, args.skip_unchanged, args.canonical, args.embed_hash):
+                        print(f"Successfully saved JSON file '{json_path}'.")
+                    else:
+                        print(f"JSON file '{json_path}' is unchanged.")
                 except Exception as e:
                     print(f"Error: writing '{json_path}' failed with '{e}'")
                     sys.exit(1)
             else:
-                print(json.dumps(data))
+                if args.canonical or args.embed_hash:
+                    print(to_json(data, args.canonical, args.embed_hash))
+                else:
+                    print(json.dumps(data))
 
     # convert all MTF files in given directory
     if args.mtf_dir:
         mtf_dir = Path(args.mtf_dir)
         json_dir = Path(args.json_dir) if args.json_dir else None
-        sys.exit(convert_dir(mtf_dir, json_dir, args.recursive, args.ignore_errors))
+        threads, processes = parallel_workers(args)
+        try:
+            sys.exit(convert_dir(mtf_dir, json_dir, args.recursive, args.ignore_errors, args.queue_depth, threads, processes,
+                                 shard, report, bundle, args.skip_unchanged, args.canonical, args.embed_hash, index,
+                                 args.validate, parse_cache, args.include, args.exclude, args.walkers,
+                                 Path(args.manifest) if args.manifest else None, args.time_budget, memory_budget, quarantine,
+                                 args.dedup))
+        except ValueError as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
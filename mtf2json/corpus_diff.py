@@ -0,0 +1,309 @@
+"""
+Semantic diff of two corpora, e.g. two MegaMek checkouts or the bundles of two converter versions.
+The files are paired by their relative path. Pairs with identical content (same bytes of the
+MTF files or same content hash in the bundles) are skipped, all others are converted (in parallel)
+and compared field by field:
+    * weapons added / removed (by name, location and facing, with the quantity)
+    * ammo deltas (per weapon)
+    * armor pip deltas (per location and side)
+    * changed critical slots
+    * quirks added / removed, changed fluff keys
+    * all other changed values (e.g. 'mass' or 'structure.left_arm.pips')
+"""
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Executor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .mtf2json import read_mtf_bytes, metadata_key, version
+from .bundle import mech_name
+from .discovery import discover
+
+
+# sections that are compared separately (not as flat values)
+special_keys = ('weapons', 'critical_slots', 'quirks', 'fluff', metadata_key)
+
+
+def __flatten(data: Any, prefix: str, values: Dict[str, Any]) -> None:
+    """
+    Flatten nested dicts into `values` (dotted path -> value). Lists are kept as values.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            __flatten(value, f"{prefix}.{key}" if prefix else key, values)
+    else:
+        values[prefix] = data
+
+
+def __weapons(data: Dict[str, Any]) -> Tuple['Counter[Tuple[str, str, str]]', 'Counter[Tuple[str, str, str]]']:
+    """
+    Return the weapon quantities and their ammo by (name, location, facing), independent of the slots.
+    """
+    weapons: 'Counter[Tuple[str, str, str]]' = Counter()
+    ammo: 'Counter[Tuple[str, str, str]]' = Counter()
+    for slot in data.get('weapons', {}).values():
+        for name, weapon in slot.items():
+            key = (name, weapon.get('location', ''), weapon.get('facing', ''))
+            weapons[key] += weapon.get('quantity', 1)
+            if 'ammo' in weapon:
+                ammo[key] += weapon['ammo']
+    return weapons, ammo
+
+
+def __weapon_list(weapons: 'Counter[Tuple[str, str, str]]') -> List[Dict[str, Any]]:
+    return [{'name': name, 'location': location, 'facing': facing, 'quantity': quantity}
+            for (name, location, facing), quantity in sorted(weapons.items())]
+
+
+def diff_mechs(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare the JSON data of two versions of a mech. Returns the changes by section
+    (only sections with changes, i.e. an empty dict if the mechs are equal):
+    ```
+    {
+        "weapons": {"added": [{"name": ..., "location": ..., "facing": ..., "quantity": ...}], "removed": [...]},
+        "ammo": [{"name": ..., "location": ..., "facing": ..., "old": 16, "new": 21, "delta": 5}],
+        "armor": {"left_arm": {"old": 20, "new": 24, "delta": 4}, "center_torso.rear": {...}},
+        "critical_slots": {"left_arm": {"3": {"old": "Medium Laser", "new": null}}},
+        "quirks": {"added": [...], "removed": [...]},
+        "fluff": ["overview", ...],
+        "values": {"mass": {"old": 50, "new": 55}, "structure.left_arm.pips": {...}}
+    }
+    ```
+    """
+    changes: Dict[str, Any] = {}
+    (old_weapons, old_ammo), (new_weapons, new_ammo) = __weapons(old), __weapons(new)
+    if old_weapons != new_weapons:
+        changes['weapons'] = {'added': __weapon_list(new_weapons - old_weapons),
+                              'removed': __weapon_list(old_weapons - new_weapons)}
+    # ammo of weapons that exist in both versions (added / removed weapons are reported above)
+    ammo = []
+    for name, location, facing in sorted(old_weapons.keys() & new_weapons.keys()):
+        old_count, new_count = old_ammo[(name, location, facing)], new_ammo[(name, location, facing)]
+        if old_count != new_count:
+            ammo.append({'name': name, 'location': location, 'facing': facing,
+                         'old': old_count, 'new': new_count, 'delta': new_count - old_count})
+    if ammo:
+        changes['ammo'] = ammo
+
+    old_values: Dict[str, Any] = {}
+    new_values: Dict[str, Any] = {}
+    __flatten({k: v for k, v in old.items() if k not in special_keys}, '', old_values)
+    __flatten({k: v for k, v in new.items() if k not in special_keys}, '', new_values)
+    armor: Dict[str, Any] = {}
+    values: Dict[str, Any] = {}
+    for path in sorted(old_values.keys() | new_values.keys()):
+        old_value, new_value = old_values.get(path), new_values.get(path)
+        if old_value == new_value:
+            continue
+        if path.startswith('armor.') and path.endswith('.pips'):
+            location = path[len('armor.'):-len('.pips')]
+            armor[location] = {'old': old_value, 'new': new_value, 'delta': (new_value or 0) - (old_value or 0)}
+        else:
+            values[path] = {'old': old_value, 'new': new_value}
+    if armor:
+        changes['armor'] = armor
+
+    old_slots, new_slots = old.get('critical_slots', {}), new.get('critical_slots', {})
+    slots: Dict[str, Any] = {}
+    for location in sorted(old_slots.keys() | new_slots.keys()):
+        old_location, new_location = old_slots.get(location, {}), new_slots.get(location, {})
+        changed = {slot: {'old': old_location.get(slot), 'new': new_location.get(slot)}
+                   for slot in sorted(old_location.keys() | new_location.keys(), key=int)
+                   if old_location.get(slot) != new_location.get(slot)}
+        if changed:
+            slots[location] = changed
+    if slots:
+        changes['critical_slots'] = slots
+
+    old_quirks, new_quirks = old.get('quirks', []), new.get('quirks', [])
+    if old_quirks != new_quirks:
+        changes['quirks'] = {'added': [q for q in new_quirks if q not in old_quirks],
+                             'removed': [q for q in old_quirks if q not in new_quirks]}
+    old_fluff, new_fluff = old.get('fluff', {}), new.get('fluff', {})
+    fluff = [key for key in sorted(old_fluff.keys() | new_fluff.keys()) if old_fluff.get(key) != new_fluff.get(key)]
+    if fluff:
+        changes['fluff'] = fluff
+    if values:
+        changes['values'] = values
+    return changes
+
+
+def __name(data: Dict[str, Any]) -> str:
+    return mech_name(str(data.get('chassis', '')), str(data.get('model', '')))
+
+
+def __header_name(path: Path) -> str:
+    """
+    Return the mech name of the given MTF file from its 'chassis' and 'model' lines
+    (at the start of the file, i.e. without parsing the whole file).
+    """
+    values: Dict[bytes, str] = {}
+    with open(path, 'rb') as mtf_file:
+        for line in mtf_file:
+            key, colon, value = line.partition(b':')
+            key = key.strip().lower()
+            if colon and key in (b'chassis', b'model') and key not in values:
+                values[key] = value.strip().decode('utf8', errors='mixed')
+                if len(values) == 2:
+                    break
+    return mech_name(values.get(b'chassis', ''), values.get(b'model', ''))
+
+
+def __compare_files(rel_path: str, old: Optional[Path], new: Optional[Path]) -> Tuple[str, str, Any]:
+    """
+    Compare the MTF files of a pair (one of them may be None).
+    Returns (relative path, status, name or changes or error message).
+    """
+    try:
+        if old is None:
+            assert new is not None
+            return (rel_path, 'added', __header_name(new))
+        if new is None:
+            return (rel_path, 'removed', __header_name(old))
+        # compared directly (no hashes), the content is only compared if the sizes are equal
+        old_data, new_data = old.read_bytes(), new.read_bytes()
+        if old_data == new_data:
+            return (rel_path, 'identical', None)
+        old_mech, new_mech = read_mtf_bytes(old_data), read_mtf_bytes(new_data)
+        changes = diff_mechs(old_mech, new_mech)
+        if not changes:
+            return (rel_path, 'equivalent', None)
+        return (rel_path, 'changed', {'name': __name(new_mech), 'changes': changes})
+    except Exception as ex:
+        return (rel_path, 'failed', str(ex))
+
+
+def __mtf_files(mtf_dir: Path) -> Dict[str, Path]:
+    """
+    Return all MTF files in `mtf_dir` (recursively) by their relative path.
+    """
+    return {rel_path: mtf_dir / rel_path for rel_path in discover(mtf_dir)}
+
+
+def __compare_dirs(old_dir: Path, new_dir: Path, threads: int, processes: int) -> Iterator[Tuple[str, str, Any]]:
+    old_files, new_files = __mtf_files(old_dir), __mtf_files(new_dir)
+    rel_paths = sorted(old_files.keys() | new_files.keys())
+    executor: Optional[Executor] = None
+    if processes > 0:
+        executor = ProcessPoolExecutor(processes)
+    elif threads > 1:
+        executor = ThreadPoolExecutor(threads)
+    args = (rel_paths, [old_files.get(p) for p in rel_paths], [new_files.get(p) for p in rel_paths])
+    if executor is None:
+        yield from map(__compare_files, *args)
+        return
+    with executor:
+        # most pairs are identical -> send them in chunks
+        yield from executor.map(__compare_files, *args, chunksize=64)
+
+
+def __bundle_records(bundle: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Return all records of the given bundle by their source path.
+    """
+    with open(bundle, 'rb') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record['path']: record for record in records}
+
+
+def __compare_bundles(old_bundle: Path, new_bundle: Path) -> Iterator[Tuple[str, str, Any]]:
+    old_records, new_records = __bundle_records(old_bundle), __bundle_records(new_bundle)
+    for rel_path in sorted(old_records.keys() | new_records.keys()):
+        old, new = old_records.get(rel_path), new_records.get(rel_path)
+        if old is None:
+            assert new is not None
+            yield (rel_path, 'added', __name(new['mech']))
+        elif new is None:
+            yield (rel_path, 'removed', __name(old['mech']))
+        elif old['sha256'] == new['sha256']:
+            yield (rel_path, 'identical', None)
+        else:
+            changes = diff_mechs(old['mech'], new['mech'])
+            # equal data with different hashes (e.g. hashed by an older version)
+            if not changes:
+                yield (rel_path, 'equivalent', None)
+            else:
+                yield (rel_path, 'changed', {'name': __name(new['mech']), 'changes': changes})
+
+
+def diff_corpora(old: Path, new: Path, threads: int = 1, processes: int = 0) -> Dict[str, Any]:
+    """
+    Compare two corpora, either two MTF directories or two bundles (e.g. converted by
+    different versions of mtf2json). Differing MTF files are converted by `threads` threads
+    or by a pool of `processes` processes if `processes` is > 0.
+    Returns a report with the changes of each mech (see 'diff_mechs()'):
+    ```
+    {
+        "version": ..., "old": ..., "new": ...,
+        "num_files": ..., "num_identical": ..., "num_equivalent": ..., "num_changed": ...,
+        "num_added": ..., "num_removed": ..., "num_failed": ...,
+        "changed": {"<relative path>": {"name": "Atlas AS7-K", "changes": {...}}},
+        "added": {"<relative path>": "<name>"},
+        "removed": {"<relative path>": "<name>"},
+        "failed": {"<relative path>": "<error message>"}
+    }
+    ```
+    'equivalent' files have different MTF content (e.g. comments) or content hashes but the same JSON data.
+    """
+    if old.is_dir() and new.is_dir():
+        results = __compare_dirs(old, new, threads, processes)
+    elif old.is_file() and new.is_file():
+        results = __compare_bundles(old, new)
+    else:
+        raise ValueError(f"'{old}' and '{new}' must both be MTF directories or bundles.")
+
+    counts = dict.fromkeys(('identical', 'equivalent', 'changed', 'added', 'removed', 'failed'), 0)
+    sections: Dict[str, Dict[str, Any]] = {'changed': {}, 'added': {}, 'removed': {}, 'failed': {}}
+    for rel_path, status, result in results:
+        counts[status] += 1
+        if status in sections:
+            sections[status][rel_path] = result
+    return {
+        'version': version,
+        'old': str(old),
+        'new': str(new),
+        'num_files': sum(counts.values()),
+        **{f"num_{status}": count for status, count in counts.items()},
+        **sections
+    }
+
+
+def __format_value(value: Any) -> str:
+    return 'None' if value is None else repr(value) if isinstance(value, str) else str(value)
+
+
+def format_diff(report: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield the lines of a human readable summary of the given report (see 'diff_corpora()').
+    """
+    for rel_path, entry in report['changed'].items():
+        yield f"changed: {rel_path} ({entry['name']})"
+        changes = entry['changes']
+        if 'weapons' in changes:
+            weapons = [f"+{w['quantity']} {w['name']} ({w['location']}, {w['facing']})" for w in changes['weapons']['added']]
+            weapons += [f"-{w['quantity']} {w['name']} ({w['location']}, {w['facing']})" for w in changes['weapons']['removed']]
+            yield f"  weapons: {', '.join(weapons)}"
+        for ammo in changes.get('ammo', []):
+            yield (f"  ammo: {ammo['name']} ({ammo['location']}, {ammo['facing']}): {ammo['delta']:+d} "
+                   f"({ammo['old']} -> {ammo['new']})")
+        for location, pips in changes.get('armor', {}).items():
+            yield f"  armor.{location}: {pips['delta']:+d} ({__format_value(pips['old'])} -> {__format_value(pips['new'])})"
+        for location, slots in changes.get('critical_slots', {}).items():
+            for slot, item in slots.items():
+                yield f"  critical_slots.{location}.{slot}: {__format_value(item['old'])} -> {__format_value(item['new'])}"
+        if 'quirks' in changes:
+            quirks = [f"+{q}" for q in changes['quirks']['added']] + [f"-{q}" for q in changes['quirks']['removed']]
+            yield f"  quirks: {', '.join(quirks)}"
+        if 'fluff' in changes:
+            yield f"  fluff: {', '.join(changes['fluff'])}"
+        for path, value in changes.get('values', {}).items():
+            yield f"  {path}: {__format_value(value['old'])} -> {__format_value(value['new'])}"
+    for status in ('added', 'removed'):
+        for rel_path, name in report[status].items():
+            yield f"{status}: {rel_path} ({name})"
+    for rel_path, error in report['failed'].items():
+        yield f"failed: {rel_path} ({error})"
+    yield (f"> {report['num_files']} files: {report['num_identical']} identical, {report['num_equivalent']} equivalent, "
+           f"{report['num_changed']} changed, {report['num_added']} added, {report['num_removed']} removed, "
+           f"{report['num_failed']} failed")
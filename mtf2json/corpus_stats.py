@@ -0,0 +1,215 @@
+"""
+Derived record sheet statistics of a whole corpus.
+The converted mechs are loaded into columns (one array per value, e.g. the mass or
+the armor pips of a location) and the metrics are computed for all mechs at once:
+    * total and max. armor pips (from the structure pip tables) and the armor coverage
+    * walk, run and jump MP
+    * heat sink capacity (heat dissipation per turn)
+    * nr. of weapons per location
+The columns are NumPy arrays if NumPy is installed (optional dependency),
+stdlib 'array.array' otherwise (same results, but the metrics are computed in Python).
+"""
+import csv
+import json
+import operator
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from .mtf2json import read_mtf, chassis_layouts
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore[assignment]
+
+
+# all armor and weapon locations (of all chassis types)
+locations = ('head', 'center_torso', 'left_torso', 'right_torso', 'left_arm', 'right_arm', 'left_leg', 'right_leg',
+             'front_left_leg', 'front_right_leg', 'rear_left_leg', 'rear_right_leg', 'center_leg')
+# heat dissipation of a single heat sink, by the first matching word of the heat sink type
+heat_sink_dissipation = {'double': 2, 'laser': 2}
+# chassis types (index in the 'config' column)
+chassis_types = tuple(chassis_layouts)
+# max. armor pips by chassis type and `mass // 5` (0 for unsupported masses)
+max_armor_table: List[List[int]] = [
+    [sum(pips) if pips else 0 for pips in layout.max_armor_pips]
+    for layout in chassis_layouts.values()
+]
+# integer columns of 'Columns' (in addition to the armor and weapon columns)
+int_columns = ('config', 'mass', 'walk_mp', 'run_mp', 'jump_mp', 'heat_sinks', 'heat_sink_dissipation')
+
+
+class Columns:
+    """
+    Columnar representation of a set of mechs.
+    """
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        self.chassis: List[str] = []
+        self.models: List[str] = []
+        self.ints: Dict[str, 'array[int]'] = {name: array('q') for name in int_columns}
+        self.armor: Dict[str, 'array[int]'] = {location: array('q') for location in locations}
+        self.weapons: Dict[str, 'array[int]'] = {location: array('q') for location in locations}
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add(self, path: str, data: Dict[str, Any]) -> None:
+        """
+        Add the JSON data of the given mech.
+        """
+        self.paths.append(path)
+        self.chassis.append(str(data.get('chassis', '')))
+        self.models.append(str(data.get('model', '')))
+        config = str(data.get('config', '')).split(' ')[0]
+        self.ints['config'].append(chassis_types.index(config) if config in chassis_types else -1)
+        for key in ('mass', 'walk_mp', 'run_mp', 'jump_mp'):
+            self.ints[key].append(int(data.get(key, 0)))
+        heat_sinks = data.get('heat_sinks', {})
+        self.ints['heat_sinks'].append(int(heat_sinks.get('quantity', 0)))
+        hs_type = str(heat_sinks.get('type', '')).lower()
+        self.ints['heat_sink_dissipation'].append(next((d for t, d in heat_sink_dissipation.items() if t in hs_type), 1))
+
+        armor = data.get('armor', {})
+        for location, column in self.armor.items():
+            section = armor.get(location, {})
+            if 'pips' in section:
+                column.append(section['pips'])
+            else:
+                column.append(section.get('front', {}).get('pips', 0) + section.get('rear', {}).get('pips', 0))
+        weapons: Dict[str, int] = dict.fromkeys(locations, 0)
+        for slot in data.get('weapons', {}).values():
+            if not isinstance(slot, dict):
+                continue
+            for weapon in slot.values():
+                if weapon.get('location') in weapons:
+                    weapons[weapon['location']] += weapon.get('quantity', 1)
+        for location, column in self.weapons.items():
+            column.append(weapons[location])
+
+
+def __vector(values: 'array[int]') -> Any:
+    """
+    Return the given column as vector (a NumPy array shares the memory of the column).
+    """
+    if numpy is not None:
+        return numpy.frombuffer(values, dtype=numpy.int64) if len(values) else numpy.zeros(0, dtype=numpy.int64)
+    return values
+
+
+def __sum(vectors: List[Any]) -> Any:
+    if numpy is not None:
+        return numpy.sum(vectors, axis=0, dtype=numpy.int64)
+    return array('q', map(sum, zip(*vectors)))
+
+
+def __mul(a: Any, b: Any) -> Any:
+    if numpy is not None:
+        return a * b
+    return array('q', map(operator.mul, a, b))
+
+
+def __ratio(a: Any, b: Any) -> Any:
+    """
+    Return a / b (0 if b is 0).
+    """
+    if numpy is not None:
+        return numpy.divide(a, b, out=numpy.zeros(len(a)), where=b != 0)
+    return array('d', (x / y if y else 0.0 for x, y in zip(a, b)))
+
+
+def __max_armor(config: Any, mass: Any) -> Any:
+    """
+    Look up the max. armor pips of all mechs in 'max_armor_table'.
+    """
+    if numpy is not None:
+        table = numpy.array(max_armor_table, dtype=numpy.int64)
+        column = numpy.clip(mass // 5, 0, table.shape[1] - 1)
+        return numpy.where(config >= 0, table[config, column], 0)
+    row_len = len(max_armor_table[0])
+    return array('q', (max_armor_table[c][min(max(m // 5, 0), row_len - 1)] if c >= 0 else 0 for c, m in zip(config, mass)))
+
+
+def compute_stats(columns: Columns) -> Dict[str, Any]:
+    """
+    Compute the derived statistics of all mechs in `columns`.
+    Returns a dictionary of metric name -> vector (in the order of the CSV columns).
+    """
+    ints = {name: __vector(values) for name, values in columns.ints.items()}
+    armor_total = __sum([__vector(v) for v in columns.armor.values()])
+    armor_max = __max_armor(ints['config'], ints['mass'])
+    weapons = {f"weapons_{location}": __vector(v) for location, v in columns.weapons.items()}
+    return {
+        'mass': ints['mass'],
+        'walk_mp': ints['walk_mp'],
+        'run_mp': ints['run_mp'],
+        'jump_mp': ints['jump_mp'],
+        'heat_sinks': ints['heat_sinks'],
+        'heat_capacity': __mul(ints['heat_sinks'], ints['heat_sink_dissipation']),
+        'armor_total': armor_total,
+        'armor_max': armor_max,
+        'armor_coverage': __ratio(armor_total, armor_max),
+        'weapons_total': __sum(list(weapons.values())),
+        **weapons
+    }
+
+
+def load_columns(mechs: Iterable[Tuple[str, Dict[str, Any]]]) -> Columns:
+    """
+    Load the given (path, JSON data) tuples into columns.
+    """
+    columns = Columns()
+    for path, data in mechs:
+        columns.add(path, data)
+    return columns
+
+
+def iter_mtf_dir(mtf_dir: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Convert all MTF files in `mtf_dir` (recursively) and yield (relative path, JSON data).
+    """
+    for root, _, files in sorted(os.walk(mtf_dir)):
+        for file in sorted(files):
+            if file.endswith('.mtf'):
+                path = Path(root) / file
+                yield path.relative_to(mtf_dir).as_posix(), read_mtf(path)
+
+
+def iter_json_dir(json_dir: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Load all JSON files in `json_dir` (recursively) and yield (relative path, JSON data).
+    """
+    for root, _, files in sorted(os.walk(json_dir)):
+        for file in sorted(files):
+            if file.endswith('.json'):
+                path = Path(root) / file
+                with open(path, 'r') as f:
+                    yield path.relative_to(json_dir).as_posix(), json.load(f)
+
+
+def iter_bundle(bundle: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (source path, JSON data) of all mechs in the given bundle.
+    """
+    with open(bundle, 'rb') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['path'], record['mech']
+
+
+def write_csv(columns: Columns, out: TextIO, stats: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Write the statistics of all mechs in `columns` as CSV (one row per mech).
+    """
+    if stats is None:
+        stats = compute_stats(columns)
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['path', 'chassis', 'model', 'config'] + list(stats))
+    configs = [chassis_types[c] if c >= 0 else '' for c in columns.ints['config']]
+    # convert NumPy arrays to Python numbers
+    vectors = [v.tolist() if hasattr(v, 'tolist') else v for v in stats.values()]
+    for i, row in enumerate(zip(*vectors)):
+        writer.writerow([columns.paths[i], columns.chassis[i], columns.models[i], configs[i]]
+                        + [round(v, 4) if isinstance(v, float) else v for v in row])
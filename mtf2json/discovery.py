@@ -0,0 +1,228 @@
+"""
+Discovery of the MTF files in a directory tree.
+The tree is enumerated with 'os.scandir' (the entry types come from the directory listing,
+i.e. no stat call per file) and the files are yielded while the walk is still running, so
+the conversion can start immediately. Options for huge and networked trees:
+    * include / exclude globs (excluded directories are not enumerated at all)
+    * parallel walks of the subtrees (`walkers` threads, e.g. for NFS latencies)
+    * a manifest of the previous walk: the listing of a directory is reused if the
+      modification time of the directory hasn't changed (one stat instead of a listing)
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+from fnmatch import translate
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# default include globs
+default_include = ('*.mtf',)
+# directories modified less than this many ns before the walk aren't reused from the manifest
+# (they may be modified again with the same mtime)
+mtime_margin = 2_000_000_000
+
+# relative directory -> [mtime (ns) or None, file names, directory names]
+Listing = Dict[str, List]
+Matcher = Callable[[str, str], bool]
+
+
+def __compile(patterns: Sequence[str]) -> Matcher:
+    """
+    Return a function that matches (relative path, name) against the given globs.
+    Globs with a '/' are matched against the relative path, others against the name only
+    ('*' also matches '/').
+    """
+    path_patterns = [translate(p) for p in patterns if '/' in p]
+    name_patterns = [translate(p) for p in patterns if '/' not in p]
+    path_re = re.compile('|'.join(path_patterns)).match if path_patterns else None
+    name_re = re.compile('|'.join(name_patterns)).match if name_patterns else None
+
+    def match(rel_path: str, name: str) -> bool:
+        return bool((name_re and name_re(name)) or (path_re and path_re(rel_path)))
+    return match
+
+
+class _Walker:
+    """
+    Lists the directories of a tree (or takes the listings from the previous manifest).
+    """
+    def __init__(self, root: Path, previous: Listing, keep_listing: bool) -> None:
+        self.root = str(root)
+        self.previous = previous
+        self.keep_listing = keep_listing
+        self.listing: Listing = {}
+        self._lock = threading.Lock()
+        self._start = time.time_ns()
+
+    def scan(self, rel_dir: str) -> Tuple[List[str], List[str]]:
+        """
+        Return the (sorted) file and directory names of the given directory.
+        Directories that can't be read are treated as empty (like 'os.walk()').
+        """
+        path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        mtime: Optional[int] = None
+        if self.keep_listing:
+            try:
+                # before the listing -> changes while listing invalidate it
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                return [], []
+            cached = self.previous.get(rel_dir)
+            if cached is not None and cached[0] is not None and cached[0] == mtime:
+                with self._lock:
+                    self.listing[rel_dir] = cached
+                return cached[1], cached[2]
+        files: List[str] = []
+        dirs: List[str] = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    # uses the type of the directory entry (no stat call), symlinks to directories are not followed
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            return [], []
+        files.sort()
+        dirs.sort()
+        if self.keep_listing:
+            assert mtime is not None
+            with self._lock:
+                self.listing[rel_dir] = [mtime if mtime < self._start - mtime_margin else None, files, dirs]
+        return files, dirs
+
+
+def load_manifest(path: Path, root: Path) -> Listing:
+    """
+    Return the directory listings of the given manifest (empty if it doesn't exist
+    or belongs to another root directory).
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('root') != str(root):
+        return {}
+    return manifest.get('dirs', {})
+
+
+def write_manifest(path: Path, root: Path, listing: Listing) -> None:
+    """
+    Write the directory listings to the given manifest (atomically).
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'root': str(root), 'dirs': listing}, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def __files(rel_dir: str, names: List[str], include: Matcher, exclude: Optional[Matcher]) -> List[str]:
+    """
+    Return the relative paths of the included files.
+    """
+    prefix = f"{rel_dir}/" if rel_dir else ''
+    return [f"{prefix}{name}" for name in names
+            if include(f"{prefix}{name}", name) and not (exclude and exclude(f"{prefix}{name}", name))]
+
+
+def __subdirs(rel_dir: str, names: List[str], exclude: Optional[Matcher]) -> List[str]:
+    prefix = f"{rel_dir}/" if rel_dir else ''
+    return [f"{prefix}{name}" for name in names if not (exclude and exclude(f"{prefix}{name}", name))]
+
+
+def __walk(walker: _Walker, recursive: bool, include: Matcher, exclude: Optional[Matcher]) -> Iterator[str]:
+    """
+    Walk the tree depth first (files before subdirectories, both sorted).
+    """
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        files, dirs = walker.scan(rel_dir)
+        yield from __files(rel_dir, files, include, exclude)
+        if recursive:
+            stack.extend(reversed(__subdirs(rel_dir, dirs, exclude)))
+
+
+def __walk_parallel(walker: _Walker, walkers: int, include: Matcher, exclude: Optional[Matcher]) -> Iterator[str]:
+    """
+    Walk the tree in `walkers` threads (the files are yielded in the order in which they are found).
+    """
+    dir_queue: 'queue.Queue[Optional[str]]' = queue.Queue()
+    # lists of files, None when all directories have been listed
+    file_queue: 'queue.Queue[Optional[List[str]]]' = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    # nr. of directories that are queued or being listed
+    pending = [1]
+
+    def work() -> None:
+        while True:
+            rel_dir = dir_queue.get()
+            if rel_dir is None:
+                return
+            try:
+                if not stop.is_set():
+                    files, dirs = walker.scan(rel_dir)
+                    file_queue.put(__files(rel_dir, files, include, exclude))
+                    subdirs = __subdirs(rel_dir, dirs, exclude)
+                    with lock:
+                        pending[0] += len(subdirs)
+                    for subdir in subdirs:
+                        dir_queue.put(subdir)
+            finally:
+                with lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    file_queue.put(None)
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(walkers)]
+    for thread in threads:
+        thread.start()
+    dir_queue.put('')
+    try:
+        while True:
+            files = file_queue.get()
+            if files is None:
+                break
+            yield from files
+    finally:
+        stop.set()
+        for _ in threads:
+            dir_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+
+def discover(root: Path,
+             recursive: bool = True,
+             include: Optional[Sequence[str]] = None,
+             exclude: Optional[Sequence[str]] = None,
+             walkers: int = 1,
+             manifest: Optional[Path] = None) -> Iterator[str]:
+    """
+    Yield the paths (relative to `root`, with '/' as separator) of all files in `root`
+    (and its subdirectories if `recursive` is True) that match one of the `include` globs
+    (default: '*.mtf') and none of the `exclude` globs. Directories matching an `exclude` glob
+    are skipped. Globs with a '/' are matched against the relative path, others against the name.
+    With one walker, the files are yielded depth first (files before subdirectories, both sorted).
+    With `walkers` > 1, the subtrees are listed in parallel threads and the files are yielded
+    in the order in which they are found.
+    If `manifest` is given, the directory listings of the previous walk are reused from that file
+    (if the directories haven't changed) and it's updated after a complete walk.
+    """
+    include_match = __compile(include or default_include)
+    exclude_match = __compile(exclude) if exclude else None
+    walker = _Walker(root, load_manifest(manifest, root) if manifest else {}, manifest is not None)
+    if walkers > 1 and recursive:
+        yield from __walk_parallel(walker, walkers, include_match, exclude_match)
+    else:
+        yield from __walk(walker, recursive, include_match, exclude_match)
+    if manifest:
+        write_manifest(manifest, root, walker.listing)
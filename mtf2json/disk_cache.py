@@ -0,0 +1,217 @@
+"""
+Persistent parse cache, shared by all processes on a machine (CLI invocations, CI jobs, pool workers).
+The JSON data of each converted MTF file is stored in an SQLite database, keyed by the SHA-256 of the
+MTF content, the converter version and the output revision (i.e. a new version or a parser change
+never returns stale data). The database
+is used in WAL mode, so readers don't block each other and writers wait for each other.
+The size of the cache is limited: if it grows beyond `max_size` bytes, the least recently used
+entries (and all entries of other converter versions / output revisions) are removed.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from .mtf2json import read_mtf_bytes, version, output_revision
+
+
+# default max. size of the cached JSON data (bytes)
+max_cache_size = 256 * 1024 * 1024
+# last access times are only updated if they are older (avoids a write for every hit)
+atime_resolution = 3600
+
+
+def default_cache_path() -> Path:
+    """
+    Return the default path of the cache database: '$MTF2JSON_CACHE' if set,
+    '$XDG_CACHE_HOME/mtf2json/parse_cache.sqlite' (or '~/.cache/...') otherwise.
+    """
+    path = os.environ.get('MTF2JSON_CACHE')
+    if path:
+        return Path(path)
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'mtf2json' / 'parse_cache.sqlite'
+
+
+def _cache_version() -> str:
+    """
+    Return the version of the cache entries (converter version and output revision).
+    """
+    return f"{version}+{output_revision}"
+
+
+# open caches of this process (see 'open_cache()')
+__caches: Dict[Tuple[str, int], 'ParseCache'] = {}
+__caches_lock = threading.Lock()
+
+
+def open_cache(path: Optional[Path] = None, max_size: int = max_cache_size) -> 'ParseCache':
+    """
+    Return the cache with the given path (default: 'default_cache_path()') and size.
+    Caches are opened once per process and can be used by multiple threads.
+    """
+    key = (str(path or default_cache_path()), max_size)
+    with __caches_lock:
+        cache = __caches.get(key)
+        if cache is None:
+            cache = __caches[key] = ParseCache(Path(key[0]), max_size)
+        return cache
+
+
+class ParseCache:
+    """
+    An on-disk cache of converted MTF files:
+    ```
+    cache = open_cache()
+    json_data = cache.read_mtf_bytes(mtf_path.read_bytes())
+    ```
+    The cache is thread-safe (one SQLite connection per thread). When sent to another process
+    (e.g. a process pool worker), the worker uses its own instance (see 'open_cache()').
+    """
+    def __init__(self, path: Path, max_size: int = max_cache_size) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # bytes added since the size has been checked
+        self._added = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS mechs ("
+                       "hash TEXT NOT NULL, version TEXT NOT NULL, data BLOB NOT NULL, "
+                       "size INTEGER NOT NULL, atime INTEGER NOT NULL, PRIMARY KEY (hash, version))")
+            db.execute("CREATE INDEX IF NOT EXISTS mechs_atime ON mechs (atime)")
+
+    def __reduce__(self) -> Any:
+        return (open_cache, (self.path, self.max_size))
+
+    def _connection(self) -> sqlite3.Connection:
+        db: Optional[sqlite3.Connection] = getattr(self._local, 'db', None)
+        if db is None:
+            # wait for concurrent writers (other threads and processes) instead of failing
+            db = sqlite3.connect(self.path, timeout=60)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def close(self) -> None:
+        """
+        Close the connection of the calling thread.
+        """
+        db: Optional[sqlite3.Connection] = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def get(self, mtf_data: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached JSON data of the given MTF content (None if it's not cached).
+        """
+        return self._get(hashlib.sha256(mtf_data).hexdigest())
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        db = self._connection()
+        row = db.execute("SELECT data, atime FROM mechs WHERE hash = ? AND version = ?", (key, _cache_version())).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        now = int(time.time())
+        if now - row[1] > atime_resolution:
+            with db:
+                db.execute("UPDATE mechs SET atime = ? WHERE hash = ? AND version = ?", (now, key, _cache_version()))
+        return json.loads(row[0])
+
+    def put(self, mtf_data: bytes, mech_data: Dict[str, Any]) -> None:
+        """
+        Store the JSON data of the given MTF content.
+        """
+        self._put(hashlib.sha256(mtf_data).hexdigest(), mech_data)
+
+    def _put(self, key: str, mech_data: Dict[str, Any]) -> None:
+        data = json.dumps(mech_data, separators=(',', ':')).encode('utf8')
+        db = self._connection()
+        with db:
+            db.execute("INSERT OR REPLACE INTO mechs VALUES (?, ?, ?, ?, ?)",
+                       (key, _cache_version(), data, len(data), int(time.time())))
+        with self._lock:
+            self._added += len(data)
+            check_size = self._added > self.max_size // 16
+            if check_size:
+                self._added = 0
+        if check_size:
+            self.prune()
+
+    def read_mtf_bytes(self, mtf_data: bytes) -> Dict[str, Any]:
+        """
+        Return the JSON data of the given MTF content from the cache, or convert
+        it (see 'read_mtf_bytes()') and store the result.
+        """
+        key = hashlib.sha256(mtf_data).hexdigest()
+        mech_data = self._get(key)
+        if mech_data is None:
+            mech_data = read_mtf_bytes(mtf_data)
+            self._put(key, mech_data)
+        return mech_data
+
+    def prune(self, max_size: Optional[int] = None) -> int:
+        """
+        Remove the entries of other converter versions (or output revisions) and the least recently used entries
+        until the cache is smaller than `max_size` (default: the size of the cache).
+        Returns the nr. of removed entries.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        db = self._connection()
+        with db:
+            # lock the database -> concurrent prunes don't remove too much
+            db.execute("BEGIN IMMEDIATE")
+            removed = db.execute("DELETE FROM mechs WHERE version != ?", (_cache_version(),)).rowcount
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM mechs").fetchone()[0]
+            if total > max_size:
+                rowids = []
+                for rowid, size in db.execute("SELECT rowid, size FROM mechs ORDER BY atime"):
+                    if total <= max_size:
+                        break
+                    rowids.append((rowid,))
+                    total -= size
+                db.executemany("DELETE FROM mechs WHERE rowid = ?", rowids)
+                removed += len(rowids)
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        db = self._connection()
+        with db:
+            db.execute("DELETE FROM mechs")
+        db.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the nr. of entries and their size (in total and of the current version),
+        the max. size and the hits / misses of this process.
+        """
+        db = self._connection()
+        entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM mechs").fetchone()
+        current_entries, current_size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM mechs WHERE version = ?",
+                                                   (_cache_version(),)).fetchone()
+        return {
+            'path': str(self.path),
+            'version': _cache_version(),
+            'entries': entries,
+            'size': size,
+            'current_entries': current_entries,
+            'current_size': current_size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,132 @@
+"""
+Columnar export of converted mechs.
+The nested JSON data is flattened into one CSV file per entity, in a single pass:
+    mechs.csv            one row per mech ('mech_id' is the row index)
+    weapons.csv          one row per weapon slot
+    armor_locations.csv  one row per armor location and side (front / rear)
+    crit_slots.csv       one row per critical slot
+    quirks.csv           one row per quirk
+    fluff.csv            one row per fluff entry (and list item / subkey)
+All tables reference the mech by the integer foreign key 'mech_id'. Rows are
+buffered in chunks of 'chunk_size' rows per table, so the memory usage doesn't
+depend on the size of the corpus.
+"""
+import csv
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, List, Tuple
+
+
+# default nr. of rows buffered per table
+chunk_size = 10000
+
+# columns of the 'mechs' table that are copied from the top level JSON values
+mech_values = ('chassis', 'model', 'mul_id', 'config', 'techbase', 'era', 'source', 'rules_level', 'role',
+               'mass', 'engine', 'myomer', 'walk_mp', 'run_mp', 'jump_mp')
+
+# table name -> columns
+tables: Dict[str, Tuple[str, ...]] = {
+    'mechs': ('mech_id', 'path') + mech_values + ('structure_type', 'armor_type', 'heat_sinks', 'heat_sink_type'),
+    'weapons': ('mech_id', 'slot', 'name', 'location', 'facing', 'quantity', 'ammo'),
+    'armor_locations': ('mech_id', 'location', 'side', 'pips', 'type'),
+    'crit_slots': ('mech_id', 'location', 'slot', 'item'),
+    'quirks': ('mech_id', 'quirk'),
+    # 'subkey' is the index of list values (e.g. manufacturers) or the key of dict values
+    'fluff': ('mech_id', 'key', 'subkey', 'value'),
+}
+
+
+class ColumnarWriter:
+    """
+    Write mechs to per-entity CSV files in `out_dir`:
+    ```
+    with ColumnarWriter(Path('columnar')) as writer:
+        for path, data in mechs:
+            writer.add(path, data)
+    ```
+    """
+    def __init__(self, out_dir: Path, chunk_size: int = chunk_size) -> None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.num_mechs = 0
+        self._files: List[IO[str]] = []
+        self._writers: Dict[str, Any] = {}
+        self._rows: Dict[str, List[Tuple[Any, ...]]] = {}
+        for table, columns in tables.items():
+            f = open(out_dir / f"{table}.csv", 'w', encoding='utf8', newline='')
+            self._files.append(f)
+            self._writers[table] = csv.writer(f, lineterminator='\n')
+            self._writers[table].writerow(columns)
+            self._rows[table] = []
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _append(self, table: str, row: Tuple[Any, ...]) -> None:
+        rows = self._rows[table]
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            self._writers[table].writerows(rows)
+            rows.clear()
+
+    def add(self, path: str, data: Dict[str, Any]) -> int:
+        """
+        Add the JSON data of the given mech and return its 'mech_id'.
+        """
+        mech_id = self.num_mechs
+        self.num_mechs += 1
+        heat_sinks = data.get('heat_sinks', {})
+        self._append('mechs', (mech_id, path) + tuple(data.get(key) for key in mech_values) + (
+                     data.get('structure', {}).get('type'), data.get('armor', {}).get('type'),
+                     heat_sinks.get('quantity'), heat_sinks.get('type')))
+
+        for slot, weapons in data.get('weapons', {}).items():
+            if not isinstance(weapons, dict):
+                continue
+            for name, weapon in weapons.items():
+                self._append('weapons', (mech_id, int(slot), name, weapon.get('location'), weapon.get('facing'),
+                                         weapon.get('quantity'), weapon.get('ammo')))
+        for location, section in data.get('armor', {}).items():
+            if not isinstance(section, dict):
+                continue
+            if 'pips' in section:
+                self._append('armor_locations', (mech_id, location, None, section['pips'], section.get('type')))
+            for side in ('front', 'rear'):
+                if side in section:
+                    self._append('armor_locations', (mech_id, location, side, section[side].get('pips'),
+                                                     section[side].get('type')))
+        for location, slots in data.get('critical_slots', {}).items():
+            for slot, item in slots.items():
+                self._append('crit_slots', (mech_id, location, int(slot), item))
+        for quirk in data.get('quirks', []):
+            self._append('quirks', (mech_id, quirk))
+        for key, value in data.get('fluff', {}).items():
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    self._append('fluff', (mech_id, key, i, item))
+            elif isinstance(value, dict):
+                for subkey, item in value.items():
+                    self._append('fluff', (mech_id, key, subkey, item))
+            else:
+                self._append('fluff', (mech_id, key, None, value))
+        return mech_id
+
+    def close(self) -> None:
+        for table, rows in self._rows.items():
+            self._writers[table].writerows(rows)
+            rows.clear()
+        for f in self._files:
+            f.close()
+
+
+def export_columnar(mechs: Iterable[Tuple[str, Dict[str, Any]]], out_dir: Path, chunk_size: int = chunk_size) -> int:
+    """
+    Export the given (path, JSON data) tuples to per-entity CSV files in `out_dir`.
+    Returns the nr. of exported mechs.
+    """
+    with ColumnarWriter(out_dir, chunk_size) as writer:
+        for path, data in mechs:
+            writer.add(path, data)
+    return writer.num_mechs
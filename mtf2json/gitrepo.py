@@ -0,0 +1,137 @@
+"""
+Read MTF files directly from a local git repository (e.g. a MegaMek clone), without
+checking out a worktree. The file lists come from 'git ls-tree' / 'git diff-tree' and
+the blobs are read through a single persistent 'git cat-file --batch' process.
+"""
+import subprocess
+from pathlib import Path
+from typing import Any, IO, List, NamedTuple, Optional
+
+
+class GitError(Exception):
+    """
+    Raised if a git command fails (e.g. unknown revision or not a git repository).
+    """
+    pass
+
+
+class GitFile(NamedTuple):
+    """
+    A file in a git tree.
+    """
+    # path relative to the repository root
+    path: str
+    # blob id
+    oid: str
+
+
+class Changes(NamedTuple):
+    """
+    The files changed between two revisions.
+    """
+    # added or modified files (in the new revision)
+    changed: List[GitFile]
+    # paths of deleted files
+    deleted: List[str]
+
+
+class GitRepo:
+    """
+    A local git repository:
+    ```
+    with GitRepo(Path('megamek')) as repo:
+        for file in repo.ls_tree('HEAD', 'megamek/data/mekfiles'):
+            data = repo.read_blob(file.oid)
+    ```
+    """
+    def __init__(self, path: Path) -> None:
+        if not path.is_dir():
+            raise GitError(f"'{path}' is not a directory.")
+        self.path = path
+        self._cat_file: Optional['subprocess.Popen[bytes]'] = None
+
+    def __enter__(self) -> 'GitRepo':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the 'git cat-file' process (if it has been started).
+        """
+        if self._cat_file is not None:
+            assert self._cat_file.stdin is not None
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file = None
+
+    def _git(self, *args: str) -> bytes:
+        result = subprocess.run(['git', '-C', str(self.path), *args], capture_output=True)
+        if result.returncode != 0:
+            raise GitError(f"'git {' '.join(args)}' failed: {result.stderr.decode(errors='replace').strip()}")
+        return result.stdout
+
+    def resolve(self, rev: str) -> str:
+        """
+        Return the commit id of the given revision (e.g. a branch, tag or 'HEAD~3').
+        """
+        return self._git('rev-parse', '--verify', '--end-of-options', f"{rev}^{{commit}}").decode().strip()
+
+    def ls_tree(self, rev: str, subdir: Optional[str] = None) -> List[GitFile]:
+        """
+        Return all files of the given revision (in `subdir` if given), sorted by path.
+        """
+        output = self._git('ls-tree', '-r', '-z', '--full-tree', rev, '--', *([subdir] if subdir else []))
+        files = []
+        for entry in output.split(b'\0'):
+            if not entry:
+                continue
+            # '<mode> <type> <oid>\t<path>'
+            info, path = entry.split(b'\t', 1)
+            _, obj_type, oid = info.split(b' ')
+            if obj_type == b'blob':
+                files.append(GitFile(path.decode('utf8', errors='surrogateescape'), oid.decode()))
+        return files
+
+    def diff_tree(self, old_rev: str, new_rev: str, subdir: Optional[str] = None) -> Changes:
+        """
+        Return the files changed between `old_rev` and `new_rev` (in `subdir` if given).
+        Renamed files are reported as deleted and added.
+        """
+        output = self._git('diff-tree', '-r', '-z', '--no-renames', old_rev, new_rev, '--',
+                           *([subdir] if subdir else []))
+        changes = Changes([], [])
+        entries = output.split(b'\0')
+        # ':<old mode> <new mode> <old oid> <new oid> <status>', '<path>'
+        for info, path in zip(entries[0::2], entries[1::2]):
+            _, new_mode, _, new_oid, status = info.split(b' ')
+            rel_path = path.decode('utf8', errors='surrogateescape')
+            if status == b'D':
+                changes.deleted.append(rel_path)
+            elif not new_mode.startswith(b'16'):
+                # not a submodule
+                changes.changed.append(GitFile(rel_path, new_oid.decode()))
+        return changes
+
+    def read_blob(self, oid: str) -> bytes:
+        """
+        Return the content of the given blob. Raises a KeyError if it doesn't exist.
+        """
+        if self._cat_file is None:
+            self._cat_file = subprocess.Popen(['git', '-C', str(self.path), 'cat-file', '--batch'],
+                                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        stdin: Optional[IO[bytes]] = self._cat_file.stdin
+        stdout: Optional[IO[bytes]] = self._cat_file.stdout
+        assert stdin is not None and stdout is not None
+        stdin.write(oid.encode() + b'\n')
+        stdin.flush()
+        # '<oid> <type> <size>' or '<oid> missing'
+        header = stdout.readline().split()
+        if len(header) != 3:
+            if not header:
+                raise GitError("'git cat-file' terminated unexpectedly.")
+            raise KeyError(f"Blob '{oid}' doesn't exist.")
+        data = stdout.read(int(header[2]))
+        stdout.read(1)
+        return data
@@ -0,0 +1,307 @@
+"""
+In-memory inverted index of converted mechs (e.g. for loadout searches):
+    * equipment name -> mechs, with the weapon mounts (location, facing, quantity)
+      and the critical slot positions of each mech
+    * quirks: one bitset per mech over a global quirk vocabulary (+ quirk -> mechs)
+    * string attributes (e.g. 'techbase' or 'rules_level_str') -> mechs
+    * numeric attributes (e.g. 'mass' or 'era'): sorted arrays for range queries
+Conjunctive queries are answered by intersecting the posting sets (smallest first):
+```
+index = build_index(corpus_stats.iter_mtf_dir(mtf_dir))
+index.query(equipment=['ISGaussRifle'], quirks=['command_mech'],
+            attributes={'techbase': 'Inner Sphere'}, ranges={'mass': (80, 100)})
+```
+Mechs can be added and removed incrementally. The index is not thread-safe (use a lock
+if it's modified while other threads query it).
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+
+# string attributes with posting sets
+attribute_keys = ('techbase', 'rules_level_str', 'config', 'role', 'myomer')
+# numeric attributes with sorted arrays
+numeric_keys = ('mass', 'era', 'rules_level', 'walk_mp', 'run_mp', 'jump_mp', 'mul_id')
+# suffixes of critical slot items that are not part of the equipment name
+crit_suffixes = (' (R)', ' (omnipod)')
+
+
+class WeaponMount(NamedTuple):
+    """
+    A mount of a weapon (an entry of the `weapons` section).
+    """
+    location: str
+    facing: str
+    quantity: int
+
+
+class EquipmentEntry(NamedTuple):
+    """
+    The occurrences of an equipment in a mech: the weapon mounts and the
+    critical slots as (location, slot number).
+    """
+    mounts: Tuple[WeaponMount, ...]
+    slots: Tuple[Tuple[str, int], ...]
+
+    @property
+    def quantity(self) -> int:
+        """
+        The total quantity of all mounts.
+        """
+        return sum(m.quantity for m in self.mounts)
+
+
+class _MechEntry(NamedTuple):
+    """
+    The indexed values of a mech (needed to remove it).
+    """
+    equipment: Dict[str, EquipmentEntry]
+    quirks: Tuple[str, ...]
+    attributes: Tuple[Tuple[str, str], ...]
+    numbers: Tuple[Tuple[str, int], ...]
+
+
+class _SortedColumn:
+    """
+    The values of a numeric attribute and the corresponding mech ids, sorted by value.
+    """
+    def __init__(self) -> None:
+        self.values = array('q')
+        self.ids = array('q')
+        # mech id -> value
+        self.by_id: Dict[int, int] = {}
+
+    def add(self, value: int, mech_id: int) -> None:
+        i = bisect_right(self.values, value)
+        self.values.insert(i, value)
+        self.ids.insert(i, mech_id)
+        self.by_id[mech_id] = value
+
+    def remove(self, value: int, mech_id: int) -> None:
+        i = bisect_left(self.values, value)
+        while self.ids[i] != mech_id:
+            i += 1
+        del self.values[i]
+        del self.ids[i]
+        del self.by_id[mech_id]
+
+    def span(self, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        """
+        Return the start and end of the ids with `low` <= value <= `high` (`None` -> unbounded).
+        """
+        start = bisect_left(self.values, low) if low is not None else 0
+        end = bisect_right(self.values, high) if high is not None else len(self.values)
+        return start, end
+
+
+def __crit_equipment(item: str) -> str:
+    """
+    Return the equipment name of a critical slot item, e.g. 'ISMediumPulseLaser (R)' -> 'ISMediumPulseLaser'.
+    """
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in crit_suffixes:
+            if item.endswith(suffix):
+                item = item[:-len(suffix)]
+                stripped = True
+    return item
+
+
+def _mech_entry(mech_data: Mapping[str, Any]) -> _MechEntry:
+    """
+    Extract the indexed values of the given mech.
+    """
+    mounts: Dict[str, List[WeaponMount]] = {}
+    for slot in mech_data.get('weapons', {}).values():
+        for name, details in slot.items():
+            mounts.setdefault(name, []).append(WeaponMount(details['location'], details['facing'], details['quantity']))
+    slots: Dict[str, List[Tuple[str, int]]] = {}
+    for location, location_slots in mech_data.get('critical_slots', {}).items():
+        for slot_number, item in location_slots.items():
+            if item is not None:
+                slots.setdefault(__crit_equipment(item), []).append((location, int(slot_number)))
+    equipment = {name: EquipmentEntry(tuple(mounts.get(name, ())), tuple(slots.get(name, ())))
+                 for name in list(mounts) + [n for n in slots if n not in mounts]}
+    attributes = tuple((key, mech_data[key]) for key in attribute_keys if isinstance(mech_data.get(key), str))
+    numbers = tuple((key, mech_data[key]) for key in numeric_keys
+                    if isinstance(mech_data.get(key), int) and not isinstance(mech_data.get(key), bool))
+    return _MechEntry(equipment, tuple(dict.fromkeys(mech_data.get('quirks', ()))), attributes, numbers)
+
+
+class MechIndex:
+    """
+    An inverted index of mechs, identified by a key (e.g. the source path), see module docs.
+    """
+    def __init__(self) -> None:
+        # mech key <-> dense id (ids of removed mechs are reused)
+        self._ids: Dict[str, int] = {}
+        # ('' for free ids)
+        self._keys: List[str] = []
+        self._free_ids: List[int] = []
+        self._entries: Dict[int, _MechEntry] = {}
+        self._equipment: Dict[str, Dict[int, EquipmentEntry]] = {}
+        self._equipment_mechs: Dict[str, Set[int]] = {}
+        # quirk -> bit (the vocabulary only grows), mech id -> quirk bitset
+        self.quirk_vocabulary: Dict[str, int] = {}
+        self._quirk_masks: Dict[int, int] = {}
+        self._quirk_mechs: Dict[str, Set[int]] = {}
+        self._attributes: Dict[Tuple[str, str], Set[int]] = {}
+        self._columns: Dict[str, _SortedColumn] = {key: _SortedColumn() for key in numeric_keys}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def add(self, key: str, mech_data: Mapping[str, Any]) -> None:
+        """
+        Add the given mech (replaces a mech with the same key).
+        """
+        entry = _mech_entry(mech_data)
+        if key in self._ids:
+            self.remove(key)
+        if self._free_ids:
+            mech_id = self._free_ids.pop()
+            self._keys[mech_id] = key
+        else:
+            mech_id = len(self._keys)
+            self._keys.append(key)
+        self._ids[key] = mech_id
+        self._entries[mech_id] = entry
+        for name, equipment in entry.equipment.items():
+            self._equipment.setdefault(name, {})[mech_id] = equipment
+            self._equipment_mechs.setdefault(name, set()).add(mech_id)
+        mask = 0
+        for quirk in entry.quirks:
+            bit = self.quirk_vocabulary.setdefault(quirk, len(self.quirk_vocabulary))
+            mask |= 1 << bit
+            self._quirk_mechs.setdefault(quirk, set()).add(mech_id)
+        self._quirk_masks[mech_id] = mask
+        for attribute in entry.attributes:
+            self._attributes.setdefault(attribute, set()).add(mech_id)
+        for name, value in entry.numbers:
+            self._columns[name].add(value, mech_id)
+
+    def remove(self, key: str) -> None:
+        """
+        Remove the mech with the given key. Raises a KeyError if it's not indexed.
+        """
+        mech_id = self._ids.pop(key)
+        entry = self._entries.pop(mech_id)
+        for name in entry.equipment:
+            mechs = self._equipment[name]
+            del mechs[mech_id]
+            self._equipment_mechs[name].discard(mech_id)
+            if not mechs:
+                del self._equipment[name]
+                del self._equipment_mechs[name]
+        del self._quirk_masks[mech_id]
+        for quirk in entry.quirks:
+            self._quirk_mechs[quirk].discard(mech_id)
+        for attribute in entry.attributes:
+            self._attributes[attribute].discard(mech_id)
+        for name, value in entry.numbers:
+            self._columns[name].remove(value, mech_id)
+        self._keys[mech_id] = ''
+        self._free_ids.append(mech_id)
+
+    def equipment(self, name: str) -> Dict[str, EquipmentEntry]:
+        """
+        Return the mounts and critical slots of the given equipment for each mech that has it.
+        """
+        return {self._keys[mech_id]: entry for mech_id, entry in self._equipment.get(name, {}).items()}
+
+    def quirk_mask(self, quirks: Iterable[str]) -> Optional[int]:
+        """
+        Return the bitset of the given quirks (None if a quirk is unknown).
+        """
+        mask = 0
+        for quirk in quirks:
+            bit = self.quirk_vocabulary.get(quirk)
+            if bit is None:
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def quirks(self, key: str) -> List[str]:
+        """
+        Return the quirks of the given mech (decoded from its bitset).
+        """
+        mask = self._quirk_masks[self._ids[key]]
+        return [quirk for quirk, bit in self.quirk_vocabulary.items() if mask >> bit & 1]
+
+    def query(self,
+              equipment: Sequence[str] = (),
+              quirks: Sequence[str] = (),
+              attributes: Optional[Dict[str, str]] = None,
+              ranges: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None) -> List[str]:
+        """
+        Return the (sorted) keys of all mechs that have all of the given equipment and quirks,
+        the given string `attributes` (e.g. `{'techbase': 'Clan'}`) and numeric attributes
+        within the given `ranges` (inclusive, `None` -> unbounded, e.g. `{'mass': (80, None)}`).
+        Without any condition, all mechs are returned.
+        Raises a ValueError for attributes that are not indexed (see 'attribute_keys' and 'numeric_keys').
+        """
+        postings: List[Set[int]] = [self._equipment_mechs.get(name, set()) for name in equipment]
+        for key, value in (attributes or {}).items():
+            if key not in attribute_keys:
+                raise ValueError(f"Attribute '{key}' is not indexed (indexed: {', '.join(attribute_keys)}).")
+            postings.append(self._attributes.get((key, value), set()))
+        spans: List[Tuple[_SortedColumn, int, int, int, int]] = []
+        for key, (low, high) in (ranges or {}).items():
+            if key not in numeric_keys:
+                raise ValueError(f"Attribute '{key}' is not indexed (indexed: {', '.join(numeric_keys)}).")
+            column = self._columns[key]
+            start, end = column.span(low, high)
+            spans.append((column, start, end, low if low is not None else -2**63, high if high is not None else 2**63 - 1))
+        mask = self.quirk_mask(quirks)
+        if mask is None:
+            return []
+        if quirks:
+            # the rarest quirk (the others are checked with the bitsets)
+            postings.append(min((self._quirk_mechs[q] for q in quirks), key=len))
+        if not postings and not spans:
+            return sorted(self._ids)
+        # start with the smallest posting set or range
+        postings.sort(key=len)
+        spans.sort(key=lambda s: s[2] - s[1])
+        if spans and (not postings or spans[0][2] - spans[0][1] < len(postings[0])):
+            column, start, end, _, _ = spans.pop(0)
+            result = set(column.ids[start:end])
+        else:
+            result = set(postings.pop(0))
+        for posting in postings:
+            if not result:
+                break
+            result &= posting
+        for column, start, end, low, high in spans:
+            if not result:
+                break
+            if end - start < len(result):
+                result &= set(column.ids[start:end])
+            else:
+                # (mechs without the attribute are not in the column)
+                values = column.by_id
+                result = {mech_id for mech_id in result if mech_id in values and low <= values[mech_id] <= high}
+        if mask and result:
+            masks = self._quirk_masks
+            result = {mech_id for mech_id in result if masks[mech_id] & mask == mask}
+        keys = self._keys
+        return sorted([keys[mech_id] for mech_id in result])
+
+
+def build_index(mechs: Iterable[Tuple[str, Mapping[str, Any]]]) -> MechIndex:
+    """
+    Build an index of the given (key, JSON data) tuples, e.g. from 'corpus_stats.iter_bundle()'
+    or 'SharedCorpus.items()'.
+    """
+    index = MechIndex()
+    for key, mech_data in mechs:
+        index.add(key, mech_data)
+    return index
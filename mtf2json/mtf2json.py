@@ -2,15 +2,25 @@
 Converts MegaMek's MTF format to JSON. Restructures the data to make it easily accessible.
 Adds some data for convenience (e.g. internal structure pips).
 """
+import io
+import os
 import json
-import re
+import hashlib
+import threading
 import codecs
 from math import ceil
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Tuple, Union, Optional, List, cast, TextIO
+from typing import Dict, Any, Tuple, Union, Optional, List, NamedTuple, Callable, Iterator, Iterable, cast, TextIO, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .disk_cache import ParseCache
 
 
 version = "0.1.7"
+# revision of the JSON output: bump it whenever the output of 'read_mtf()' changes (also between
+# releases), cached results of other revisions are never returned (see 'disk_cache')
+output_revision = 1
 mm_commit = "504f6a6fed172fd86db1bce1e481d85cbd9119b8"
 
 
@@ -18,9 +28,13 @@ class ConversionError(Exception):
     pass
 
 
+# The module-level state is either immutable (tuples) or never modified after import
+# (dicts, 'mixed' error handler) or thread-safe ('lru_cache'), so the parser can run
+# in multiple threads in parallel (e.g. on free-threaded Python builds).
+
 # the dictionaries below all contain converted keys,
 # not the original MTF ones (see '__extract_key_value()')
-critical_slot_keys = [
+critical_slot_keys = (
     'left_arm',
     'right_arm',
     'left_torso',
@@ -28,9 +42,14 @@ critical_slot_keys = [
     'center_torso',
     'head',
     'left_leg',
-    'right_leg'
-]
-armor_location_keys = [
+    'right_leg',
+    'front_left_leg',
+    'front_right_leg',
+    'rear_left_leg',
+    'rear_right_leg',
+    'center_leg'
+)
+armor_location_keys = (
     'la_armor',
     'ra_armor',
     'lt_armor',
@@ -41,9 +60,14 @@ armor_location_keys = [
     'rl_armor',
     'rtl_armor',
     'rtr_armor',
-    'rtc_armor'
-]
-fluff_keys = [
+    'rtc_armor',
+    'fll_armor',
+    'frl_armor',
+    'rll_armor',
+    'rrl_armor',
+    'cl_armor'
+)
+fluff_keys = (
     'overview',
     'capabilities',
     'deployment',
@@ -52,7 +76,7 @@ fluff_keys = [
     'primaryfactory',
     'systemmode',
     'systemmanufacturer'
-]
+)
 # internally renamed keys
 renamed_keys = {
     'la_armor': 'left_arm',
@@ -66,10 +90,198 @@ renamed_keys = {
     'rtl_armor': 'left_torso',
     'rtr_armor': 'right_torso',
     'rtc_armor': 'center_torso',
+    'fll_armor': 'front_left_leg',
+    'frl_armor': 'front_right_leg',
+    'rll_armor': 'rear_left_leg',
+    'rrl_armor': 'rear_right_leg',
+    'cl_armor': 'center_leg',
 }
 # keys that should always be stored as strings,
 # even if they can sometimes be numbers
-string_keys = ['model']
+string_keys = ('model',)
+# max. nr. of entries per parse cache (see 'parse_cache_info()')
+parse_cache_size = 8192
+# longer strings are never cached (e.g. malformed lines)
+parse_cache_max_length = 256
+
+# key of the metadata (e.g. the content hash) that can be embedded into the JSON data
+metadata_key = '_meta'
+
+# Static list of internal structure pips for each weight (see 'Mech.java')
+# The tuple order is: (Head, Center Torso, L/R Torso, L/R Arm, L/R Leg)
+weight_pips = {
+    10: (3, 4, 3, 1, 2),
+    15: (3, 5, 4, 2, 3),
+    20: (3, 6, 5, 3, 4),
+    25: (3, 8, 6, 4, 6),
+    30: (3, 10, 7, 5, 7),
+    35: (3, 11, 8, 6, 8),
+    40: (3, 12, 10, 6, 10),
+    45: (3, 14, 11, 7, 11),
+    50: (3, 16, 12, 8, 12),
+    55: (3, 18, 13, 9, 13),
+    60: (3, 20, 14, 10, 14),
+    65: (3, 21, 15, 10, 15),
+    70: (3, 22, 15, 11, 15),
+    75: (3, 23, 16, 12, 16),
+    80: (3, 25, 17, 13, 17),
+    85: (3, 27, 18, 14, 18),
+    90: (3, 29, 19, 15, 19),
+    95: (3, 30, 20, 16, 20),
+    100: (3, 31, 21, 17, 21),
+    105: (4, 32, 22, 17, 22),
+    110: (4, 33, 23, 18, 23),
+    115: (4, 35, 24, 19, 24),
+    120: (4, 36, 25, 20, 25),
+    125: (4, 38, 26, 21, 26),
+    130: (4, 39, 27, 21, 27),
+    135: (4, 41, 28, 22, 28),
+    140: (4, 42, 29, 23, 29),
+    145: (4, 44, 31, 24, 31),
+    150: (4, 45, 32, 25, 32),
+    155: (4, 47, 33, 26, 33),
+    160: (4, 48, 34, 26, 34),
+    165: (4, 50, 35, 27, 35),
+    170: (4, 51, 36, 28, 36),
+    175: (4, 53, 37, 29, 37),
+    180: (4, 54, 38, 30, 38),
+    185: (4, 56, 39, 31, 39),
+    190: (4, 57, 40, 31, 40),
+    195: (4, 59, 41, 32, 41),
+    200: (4, 60, 42, 33, 42),
+}
+# column of each location type in 'weight_pips'
+HEAD, CENTER_TORSO, SIDE_TORSO, ARM, LEG = range(5)
+# max. armor pips per structure pip of the head (9 for 3 pips, 12 for 4 pips of a superheavy)
+# and of all other locations
+head_armor_factor = 3
+armor_factor = 2
+
+
+class ChassisLayout(NamedTuple):
+    """
+    Static layout of a chassis type (see 'chassis_layouts').
+    """
+    # structure and critical slot locations (converted keys)
+    locations: Tuple[str, ...]
+    # nr. of critical slots per location (same order as `locations`)
+    crit_slots: Tuple[int, ...]
+    # structure pips per location (same order as `locations`), indexed by `mass // 5`
+    # -> `None` for masses that are not in 'weight_pips'
+    structure_pips: Tuple[Optional[Tuple[int, ...]], ...]
+    # max. armor pips per location (front + rear), indexed like `structure_pips`
+    max_armor_pips: Tuple[Optional[Tuple[int, ...]], ...]
+
+
+def __build_layout(locations: List[Tuple[str, int, int]]) -> ChassisLayout:
+    """
+    Build the layout from the given list of (location, nr. of critical slots, column in 'weight_pips').
+    """
+    structure_pips: List[Optional[Tuple[int, ...]]] = [None] * (max(weight_pips) // 5 + 1)
+    max_armor_pips: List[Optional[Tuple[int, ...]]] = [None] * len(structure_pips)
+    for mass, pips in weight_pips.items():
+        structure_pips[mass // 5] = tuple(pips[column] for _, _, column in locations)
+        max_armor_pips[mass // 5] = tuple((head_armor_factor if column == HEAD else armor_factor) * pips[column]
+                                          for _, _, column in locations)
+    return ChassisLayout(locations=tuple(location for location, _, _ in locations),
+                         crit_slots=tuple(slots for _, slots, _ in locations),
+                         structure_pips=tuple(structure_pips),
+                         max_armor_pips=tuple(max_armor_pips))
+
+
+__torso_locations = [
+    ('head', 6, HEAD),
+    ('center_torso', 12, CENTER_TORSO),
+    ('left_torso', 12, SIDE_TORSO),
+    ('right_torso', 12, SIDE_TORSO),
+]
+__biped_locations = __torso_locations + [
+    ('left_arm', 12, ARM),
+    ('right_arm', 12, ARM),
+    ('left_leg', 6, LEG),
+    ('right_leg', 6, LEG),
+]
+# all legs of a quad use the leg structure values
+__quad_locations = __torso_locations + [
+    ('front_left_leg', 6, LEG),
+    ('front_right_leg', 6, LEG),
+    ('rear_left_leg', 6, LEG),
+    ('rear_right_leg', 6, LEG),
+]
+__tripod_locations = __biped_locations + [
+    ('center_leg', 6, LEG),
+]
+# layouts of all supported chassis types, built once at import
+# -> the key is the first word of the MTF 'Config:' value (e.g. 'Biped Omnimech' -> 'Biped')
+chassis_layouts: Dict[str, ChassisLayout] = {
+    'Biped': __build_layout(__biped_locations),
+    'LAM': __build_layout(__biped_locations),
+    'Quad': __build_layout(__quad_locations),
+    'Tripod': __build_layout(__tripod_locations),
+}
+
+
+# === parser events (see 'iter_mtf_events()') ===
+# all keys and locations are converted keys
+class KeyValue(NamedTuple):
+    """
+    A flat `key:value` pair, e.g. `mass:100` -> `KeyValue('mass', '100')`.
+    The value is the stripped MTF string (no type conversion).
+    """
+    key: str
+    value: str
+
+
+class SectionStart(NamedTuple):
+    """
+    Start of the `weapons` section or a critical slot section (e.g. `left_arm`).
+    """
+    section: str
+
+
+class WeaponSlot(NamedTuple):
+    """
+    A weapon line of the `weapons` section (see '__add_weapon()').
+    """
+    name: str
+    location: str
+    facing: str
+    quantity: int
+    ammo: Optional[int]
+
+
+class CritSlot(NamedTuple):
+    """
+    A critical slot entry (`item` is `None` for `-Empty-`), see '__add_crit_slot()'.
+    """
+    location: str
+    slot: int
+    item: Optional[str]
+
+
+class ArmorPips(NamedTuple):
+    """
+    The armor pips of a location (see '__add_armor_locations()').
+    `side` is `front` or `rear` for torso locations and `None` otherwise.
+    `type` is only set for patchwork armor.
+    """
+    location: str
+    side: Optional[str]
+    pips: int
+    type: Optional[str]
+
+
+class FluffEntry(NamedTuple):
+    """
+    A fluff `key:value` pair (see '__add_fluff()').
+    """
+    key: str
+    value: str
+
+
+MTFEvent = Union[KeyValue, SectionStart, WeaponSlot, CritSlot, ArmorPips, FluffEntry]
+# an MTF file path, the raw content or an open text stream
+MTFSource = Union[str, Path, bytes, TextIO]
 
 
 def mixed_decoder(error: UnicodeError) -> Tuple[str, int]:
@@ -80,32 +292,51 @@ def mixed_decoder(error: UnicodeError) -> Tuple[str, int]:
 codecs.register_error("mixed", mixed_decoder)
 
 
-def __rename_keys(obj: Any) -> Any:
+def __is_key_line(line: str) -> bool:
     """
-    Rename the keys in the given object according to
-    the `renamed_keys` dictionary.
+    Return 'True' if the given MTF line contains a `key:value` pair.
+    Lines where a `:` is preceded by a `,` are excluded, because they
+    belong to a section (e.g. weapons with ammo, see '__add_weapon()').
+    The line is scanned at most once (no regex), so the classification
+    is linear in the line length, even for huge fluff lines.
     """
-    if isinstance(obj, dict):
-        return {renamed_keys.get(k, k): __rename_keys(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [__rename_keys(i) for i in obj]
-    else:
-        return obj
+    colon = line.rfind(':')
+    if colon < 0:
+        return False
+    # any `,` before the last `:` -> not a key
+    return line.find(',', 0, colon) < 0
+
+
+@lru_cache(maxsize=parse_cache_size)
+def __normalize_key(key: Union[str, bytes]) -> str:
+    """
+    Convert the given MTF key (or location) to our internal representation
+    (all lower case, ' ' replaced by '_'), e.g. 'Left Arm' -> 'left_arm'.
+    The same keys appear in every MTF file, so the results are cached.
+    ASCII keys of the bytes tokenizer are cached as bytes, i.e. they are
+    only decoded once (see '__iter_line_events()').
+    """
+    if isinstance(key, bytes):
+        key = key.decode('ascii')
+    return key.strip().lower().replace(' ', '_')
 
 
 def __extract_key_value(line: str) -> Tuple[str, str]:
     """
     Extract key and value from the given MTF line.
     The key is converted to our internal representation
-    (all lower case, ' ' replaced by '_').
+    (see '__normalize_key()').
     """
     key, value = line.split(':', 1)
-    key = key.strip().lower().replace(' ', '_')
+    if len(key) <= parse_cache_max_length:
+        key = __normalize_key(key)
+    else:
+        key = key.strip().lower().replace(' ', '_')
     value = value.strip()
     return (key, value)
 
 
-def __add_weapon(line: str, weapon_section: Dict[str, Dict[str, Dict[str, Union[str, int]]]]) -> None:
+def __add_weapon(weapon: WeaponSlot, weapon_section: Dict[str, Dict[str, Dict[str, Union[str, int]]]]) -> None:
     """
     Add a weapon to the given `weapons` section dictionary.
     The MTF section starts with the key 'Weapons:', followed by the total nr. of weapons
@@ -180,50 +411,115 @@ def __add_weapon(line: str, weapon_section: Dict[str, Dict[str, Dict[str, Union[
 
         ```
     """
+    # Populate weapon data
+    weapon_data: Dict[str, Dict[str, Union[str, int]]] = {
+        weapon.name: {
+            'location': weapon.location,
+            'facing': weapon.facing,
+            'quantity': weapon.quantity
+        }
+    }
+    if weapon.ammo is not None:
+        weapon_data[weapon.name]['ammo'] = weapon.ammo
+
+    # Add weapon data to the weapon section
     slot_number = len(weapon_section) + 1
-    weapon_data = {}
+    weapon_section[str(slot_number)] = weapon_data
+
 
+def __parse_weapon_line(line: Union[str, bytes]) -> WeaponSlot:
+    """
+    Parse a single weapon slot line (see '__add_weapon()').
+    The location is already converted to our internal representation.
+    ASCII lines of the bytes tokenizer are decoded here, i.e. only on a cache miss.
+    """
+    if isinstance(line, bytes):
+        line = line.decode('ascii')
     # Extract weapon quantity if present
-    quantity_match = re.match(r'(\d+)\s+', line)
-    if quantity_match:
-        quantity = int(quantity_match.group(1))
-        line = line[quantity_match.end():]
+    # -> digits, followed by at least one whitespace
+    digits_end = 0
+    while digits_end < len(line) and line[digits_end].isdecimal():
+        digits_end += 1
+    name_start = digits_end
+    while name_start < len(line) and line[name_start].isspace():
+        name_start += 1
+    if digits_end > 0 and name_start > digits_end:
+        quantity = int(line[:digits_end])
+        line = line[name_start:]
     else:
         quantity = 1
 
     # Extract weapon name
-    weapon_name, line = line.split(',', 1)
+    weapon_name, delimiter, line = line.partition(',')
+    if not delimiter:
+        raise ConversionError(f"Weapon line '{weapon_name}' is missing the ',' delimiter!")
     weapon_name = weapon_name.strip()
 
     # Extract location and facing
-    location_match = re.match(r'([^,]+)(,|$)', line)
-    if location_match:
-        location = location_match.group(1).strip()
-        line = line[location_match.end():]
+    location, _, rest = line.partition(',')
+    if location:
+        line = rest
+        location = location.strip()
         facing = 'rear' if '(R)' in location else 'front'
         location = location.replace('(R)', '').strip()
     else:
         location = line.strip()
         facing = 'front'
+    if len(location) <= parse_cache_max_length:
+        location = __normalize_key(location)
+    else:
+        location = location.lower().replace(' ', '_')
 
     # Extract ammo quantity if present
-    ammo_match = re.search(r'Ammo:(\d+)', line)
-    if ammo_match:
-        ammo = int(ammo_match.group(1))
-    else:
-        ammo = None
+    # -> the first 'Ammo:' that is followed by a number
+    ammo = None
+    ammo_start = line.find('Ammo:')
+    while ammo_start >= 0:
+        digits_start = digits_end = ammo_start + len('Ammo:')
+        while digits_end < len(line) and line[digits_end].isdecimal():
+            digits_end += 1
+        if digits_end > digits_start:
+            ammo = int(line[digits_start:digits_end])
+            break
+        ammo_start = line.find('Ammo:', digits_end)
 
-    # Populate weapon data
-    weapon_data[weapon_name] = {
-        'location': location.lower().replace(' ', '_'),
-        'facing': facing,
-        'quantity': quantity
-    }
-    if ammo is not None:
-        weapon_data[weapon_name]['ammo'] = ammo
+    return WeaponSlot(weapon_name, location, facing, quantity, ammo)
+
+
+# identical weapon lines appear in thousands of MTF files
+# -> cache the parsed (immutable) events (shared by all 'read_mtf()' calls)
+__cached_parse_weapon_line = lru_cache(maxsize=parse_cache_size)(__parse_weapon_line)
 
-    # Add weapon data to the weapon section
-    weapon_section[str(slot_number)] = weapon_data
+
+def parse_cache_info() -> Dict[str, Dict[str, int]]:
+    """
+    Return statistics of the parse caches, e.g.:
+        ```
+        {
+            "weapon_lines": {"hits": 4012, "misses": 851, "size": 851, "max_size": 8192},
+            "keys": {"hits": 98121, "misses": 97, "size": 97, "max_size": 8192}
+        }
+        ```
+    The caches are shared by all 'read_mtf()' calls in a process.
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    for name, info in [('weapon_lines', __cached_parse_weapon_line.cache_info()),
+                       ('keys', __normalize_key.cache_info())]:
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'max_size': info.maxsize or 0
+        }
+    return stats
+
+
+def clear_parse_cache() -> None:
+    """
+    Clear the parse caches (and reset the statistics).
+    """
+    __cached_parse_weapon_line.cache_clear()
+    __normalize_key.cache_clear()
 
 
 def __add_armor(value: str, armor_section: Dict[str, Union[str, Dict[str, Any]]]) -> None:
@@ -268,7 +564,7 @@ def __add_armor(value: str, armor_section: Dict[str, Union[str, Dict[str, Any]]]
         armor_section['tech_base'] = tech_base.strip()
 
 
-def __add_armor_locations(key: str, value: str, armor_section: Dict[str, Any]) -> None:
+def __add_armor_locations(pips: ArmorPips, armor_section: Dict[str, Any]) -> None:
     """
     Add individual armor locations to the given `armor_section` dictionary.
     The armor pips are stored as individual keys in an MTF file:
@@ -349,51 +645,42 @@ def __add_armor_locations(key: str, value: str, armor_section: Dict[str, Any]) -
         },
         ```
     """
-    # Extract subkeys if present
-    parts = value.split(':')
-    if len(parts) == 2:
-        armor_type = parts[0].strip()
-        pips_value = int(parts[1].strip())
-    else:
-        armor_type = None
-        pips_value = int(parts[0].strip())
-
-    # center torso (front and rear)
-    if key in ['ct_armor', 'rtc_armor']:
-        if 'center_torso' not in armor_section:
-            armor_section['center_torso'] = {}
-        side = 'front' if key == 'ct_armor' else 'rear'
-        if side not in armor_section['center_torso']:
-            armor_section['center_torso'][side] = {}
-        armor_section['center_torso'][side]['pips'] = pips_value
-        if armor_type:
-            armor_section['center_torso'][side]['type'] = armor_type
-    # right torso (front and rear)
-    elif key in ['rt_armor', 'rtr_armor']:
-        if 'right_torso' not in armor_section:
-            armor_section['right_torso'] = {}
-        side = 'front' if key == 'rt_armor' else 'rear'
-        if side not in armor_section['right_torso']:
-            armor_section['right_torso'][side] = {}
-        armor_section['right_torso'][side]['pips'] = pips_value
-        if armor_type:
-            armor_section['right_torso'][side]['type'] = armor_type
-    # left torso (front and rear)
-    elif key in ['lt_armor', 'rtl_armor']:
-        if 'left_torso' not in armor_section:
-            armor_section['left_torso'] = {}
-        side = 'front' if key == 'lt_armor' else 'rear'
-        if side not in armor_section['left_torso']:
-            armor_section['left_torso'][side] = {}
-        armor_section['left_torso'][side]['pips'] = pips_value
-        if armor_type:
-            armor_section['left_torso'][side]['type'] = armor_type
+    if pips.side:
+        if pips.location not in armor_section:
+            armor_section[pips.location] = {}
+        if pips.side not in armor_section[pips.location]:
+            armor_section[pips.location][pips.side] = {}
+        location_section = armor_section[pips.location][pips.side]
     else:
-        if key not in armor_section:
-            armor_section[key] = {}
-        armor_section[key]['pips'] = pips_value
-        if armor_type:
-            armor_section[key]['type'] = armor_type
+        if pips.location not in armor_section:
+            armor_section[pips.location] = {}
+        location_section = armor_section[pips.location]
+    location_section['pips'] = pips.pips
+    if pips.type:
+        location_section['type'] = pips.type
+
+
+# torso armor keys -> side
+__armor_sides = {
+    'ct_armor': 'front',
+    'rtc_armor': 'rear',
+    'rt_armor': 'front',
+    'rtr_armor': 'rear',
+    'lt_armor': 'front',
+    'rtl_armor': 'rear',
+}
+
+
+def __parse_armor_pips(key: str, value: str) -> ArmorPips:
+    """
+    Parse the value of an armor location key (see '__add_armor_locations()').
+    """
+    # Extract subkeys if present
+    subkey, delimiter, pips = value.rpartition(':')
+    if ':' in subkey:
+        raise ConversionError(f"Armor location '{key}' contains more than one subkey: '{value}'")
+    armor_type = subkey.strip() if delimiter else None
+    return ArmorPips(renamed_keys[key], __armor_sides.get(key), int(pips.strip()), armor_type)
 
 
 def __add_structure(value: str, structure_section: Dict[str, Any]) -> None:
@@ -474,20 +761,20 @@ def __merge_weapons(mech_data: Dict[str, Any]) -> None:
     mech_data['weapons'] = merged_weapons
 
 
-def __add_biped_structure_pips(mech_data: Dict[str, Any]) -> None:
+def __add_structure_pips(mech_data: Dict[str, Any], layout: ChassisLayout) -> None:
     """
-    Add the structure pips for biped mechs based on the tonnage.
+    Add the structure pips based on the tonnage and chassis layout.
     The structure are not part of an MTF file. Instead, they are
     computed and added later (see 'Mech.java'). We add them to
-    the JSON structure for convenience, like this:
+    the JSON structure for convenience, e.g. for a biped mech:
         ```
         "structure": {
             ...
-            "left_arm": {
-                "pips": 17
-             },
-            "right_arm": {
-                "pips": 17
+            "head": {
+                "pips": 3
+            },
+            "center_torso": {
+                "pips": 31
             },
             "left_torso": {
                 "pips": 21
@@ -495,11 +782,11 @@ def __add_biped_structure_pips(mech_data: Dict[str, Any]) -> None:
             "right_torso": {
                 "pips": 21
             },
-            "center_torso": {
-                "pips": 31
-            },
-            "head": {
-                "pips": 3
+            "left_arm": {
+                "pips": 17
+             },
+            "right_arm": {
+                "pips": 17
             },
             "left_leg": {
                 "pips": 21
@@ -509,69 +796,26 @@ def __add_biped_structure_pips(mech_data: Dict[str, Any]) -> None:
             }
         }
         ```
+    Quads have four legs instead of arms and legs (`front_left_leg`, `front_right_leg`,
+    `rear_left_leg`, `rear_right_leg`) and tripods have an additional `center_leg`.
+    The pips are looked up in the precomputed table of the given `layout`.
     """
-    # Static list of pips for each weight
-    # The list order is: [Head, Center Torso, L/R Torso, L/R Arm, L/R Leg]
-    biped_weight_pips = {
-        10: [3, 4, 3, 1, 2],
-        15: [3, 5, 4, 2, 3],
-        20: [3, 6, 5, 3, 4],
-        25: [3, 8, 6, 4, 6],
-        30: [3, 10, 7, 5, 7],
-        35: [3, 11, 8, 6, 8],
-        40: [3, 12, 10, 6, 10],
-        45: [3, 14, 11, 7, 11],
-        50: [3, 16, 12, 8, 12],
-        55: [3, 18, 13, 9, 13],
-        60: [3, 20, 14, 10, 14],
-        65: [3, 21, 15, 10, 15],
-        70: [3, 22, 15, 11, 15],
-        75: [3, 23, 16, 12, 16],
-        80: [3, 25, 17, 13, 17],
-        85: [3, 27, 18, 14, 18],
-        90: [3, 29, 19, 15, 19],
-        95: [3, 30, 20, 16, 20],
-        100: [3, 31, 21, 17, 21],
-        105: [4, 32, 22, 17, 22],
-        110: [4, 33, 23, 18, 23],
-        115: [4, 35, 24, 19, 24],
-        120: [4, 36, 25, 20, 25],
-        125: [4, 38, 26, 21, 26],
-        130: [4, 39, 27, 21, 27],
-        135: [4, 41, 28, 22, 28],
-        140: [4, 42, 29, 23, 29],
-        145: [4, 44, 31, 24, 31],
-        150: [4, 45, 32, 25, 32],
-        155: [4, 47, 33, 26, 33],
-        160: [4, 48, 34, 26, 34],
-        165: [4, 50, 35, 27, 35],
-        170: [4, 51, 36, 28, 36],
-        175: [4, 53, 37, 29, 37],
-        180: [4, 54, 38, 30, 38],
-        185: [4, 56, 39, 31, 39],
-        190: [4, 57, 40, 31, 40],
-        195: [4, 59, 41, 32, 41],
-        200: [4, 60, 42, 33, 42],
-    }
     if 'mass' not in mech_data:
         raise ConversionError("Mech data must contain 'mass' to calculate structure pips.")
 
     mass = mech_data['mass']
-    if mass not in biped_weight_pips:
+    pips = None
+    if isinstance(mass, int) and mass % 5 == 0 and 0 <= mass // 5 < len(layout.structure_pips):
+        pips = layout.structure_pips[mass // 5]
+    if pips is None:
         raise ConversionError(f"Unsupported mech mass: {mass}")
 
-    pips = biped_weight_pips[mass]
-    mech_data['structure']['head'] = {'pips': pips[0]}
-    mech_data['structure']['center_torso'] = {'pips': pips[1]}
-    mech_data['structure']['left_torso'] = {'pips': pips[2]}
-    mech_data['structure']['right_torso'] = {'pips': pips[2]}
-    mech_data['structure']['left_arm'] = {'pips': pips[3]}
-    mech_data['structure']['right_arm'] = {'pips': pips[3]}
-    mech_data['structure']['left_leg'] = {'pips': pips[4]}
-    mech_data['structure']['right_leg'] = {'pips': pips[4]}
+    structure = mech_data['structure']
+    for location, location_pips in zip(layout.locations, pips):
+        structure[location] = {'pips': location_pips}
 
 
-def __add_crit_slot(line: str, crit_slots_section: Dict[str, Optional[str]]) -> None:
+def __add_crit_slot(slot: CritSlot, crit_slots_section: Dict[str, Optional[str]]) -> None:
     """
     Add a critical slot entry.
     The MDF contains one critical slot section per location. Here's an example for the left arm:
@@ -610,8 +854,7 @@ def __add_crit_slot(line: str, crit_slots_section: Dict[str, Optional[str]]) ->
             },
         ```
         """
-    slot_number = len(crit_slots_section) + 1
-    crit_slots_section[str(slot_number)] = line if line != '-Empty-' else None
+    crit_slots_section[str(slot.slot)] = slot.item
 
 
 def __remove_p_tags(text: str) -> str:
@@ -764,140 +1007,344 @@ def __add_heat_sinks(value: str, heat_sinks_section: Dict[str, Union[int, str]])
     heat_sinks_section['type'] = type_.strip()
 
 
-def __is_biped_mech(config_value: str) -> bool:
+def __chassis_layout(config_value: str) -> ChassisLayout:
     """
-    Return 'True' if given 'Config:' value belongs to a biped mech,
-    'False' otherwise.
+    Return the layout of the chassis type of the given 'Config:' value
+    (e.g. 'Biped', 'Biped Omnimech', 'Quad', 'Tripod' or 'LAM').
+    Raise a `ConversionError` if the chassis type is not supported.
     """
-    # 'Biped' or 'Biped Omnimech'
-    return config_value.startswith("Biped")
+    chassis = config_value.split(' ', 1)[0]
+    if chassis not in chassis_layouts:
+        raise ConversionError(f"Unsupported chassis type '{config_value}' (supported: {', '.join(chassis_layouts)}).")
+    return chassis_layouts[chassis]
 
 
-def __check_compat(file: TextIO) -> None:
+def __check_compat(lines: Iterable[Union[str, bytes]]) -> None:
     """
     Check compatibility of given file.
     We're checking two things:
         1. A key named `Config` must exist
            -> otherwise it's not a valid MTF file
-        2. The value of `Config` must be `Biped`
-          -> we currently only support biped mechs
+        2. The value of `Config` must be a supported chassis type
+          -> see 'chassis_layouts'
     If the check fails, we raise a `ConversionError`.
     """
-    config_found = False
-    for line in file:
-        if line.startswith("Config:"):
-            config_found = True
-            key, value = __extract_key_value(line)
-            # 'Biped' or 'Biped Omnimech'
-            if not __is_biped_mech(value):
-                raise ConversionError("Only 'Biped' mechs are supported.")
-            break
+    for line in lines:
+        if isinstance(line, bytes):
+            if not line.startswith(b"Config:"):
+                continue
+            line = line.decode('utf8', errors='mixed')
+        elif not line.startswith("Config:"):
+            continue
+        key, value = __extract_key_value(line)
+        __chassis_layout(value)
+        return
     # no 'Config:' key -> invalid file
-    if not config_found:
-        raise ConversionError("The MTF file is not valid. 'Config' key is missing.")
-    # reset file pointer
-    file.seek(0)
+    raise ConversionError("The MTF file is not valid. 'Config' key is missing.")
+
 
+# ASCII whitespace removed by 'str.strip()' ('bytes.strip()' keeps '\x1c' - '\x1f')
+__ascii_whitespace = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
 
-def read_mtf(path: Path) -> Dict[str, Any]:
+
+def __iter_text_lines(file: TextIO) -> Iterator[str]:
     """
-    Read given MTF file and return content as JSON.
+    Yield the lines of the given text stream (checked with '__check_compat()' first).
     """
-    mech_data: Dict[str, Any] = {}
+    if not file.seekable():
+        file = io.StringIO(file.read(), newline=None)
+    __check_compat(file)
+    file.seek(0)
+    yield from file
+
 
+def __iter_line_events(lines: Iterable[Union[str, bytes]]) -> Iterator[MTFEvent]:
+    """
+    Tokenize the given MTF lines and yield the parser events.
+    Raw lines (bytes) are tokenized without decoding them: the line is stripped and split
+    into key and value with bytes operations, keys are looked up in the key cache by their
+    raw bytes and only the values that end up in the events are decoded. Only lines with
+    non-ASCII characters (mostly fluff) are decoded first (UTF-8 with CP-1252 fallback)
+    and tokenized as text, so both ways yield the same events.
+    """
     current_section = None
-    with open(path, 'r', encoding='utf8', errors='mixed') as file:
-        __check_compat(file)
-        for line in file:
+    slot_number = 0
+    for line in lines:
+        key: Optional[str] = None
+        if isinstance(line, bytes) and not line.isascii():
+            line = line.decode('utf8', errors='mixed')
+        if isinstance(line, bytes):
+            line = line.strip(__ascii_whitespace)
+            # ord('#') == 35
+            if not line or line[0] == 35:
+                continue
+            # see '__is_key_line()' and '__extract_key_value()'
+            colon = line.rfind(b':')
+            if colon >= 0 and line.find(b',', 0, colon) < 0:
+                key_bytes, _, value_bytes = line.partition(b':')
+                if len(key_bytes) <= parse_cache_max_length:
+                    key = __normalize_key(key_bytes)
+                else:
+                    key = key_bytes.decode('ascii').strip().lower().replace(' ', '_')
+                value = value_bytes.strip(__ascii_whitespace).decode('ascii')
+        else:
             line = line.strip()
             if not line or line.startswith('#'):
                 continue
-
             # === a line with a key ===
             # -> exclude lines where `:` is preceded by `,`
-            #    (see '__add_weapon()')
-            if ':' in line and not re.search(r',[^,]*:', line):
+            #    (see '__is_key_line()' and '__add_weapon()')
+            if __is_key_line(line):
                 key, value = __extract_key_value(line)
-                # = rules_level =
-                # -> add a 'rules_level_str' for convenience
-                if key == 'rules_level':
-                    mech_data['rules_level'] = int(value)
-                    __add_rules_level_str(mech_data)
-                # = heat_sinks =
-                elif key == 'heat_sinks':
-                    mech_data['heat_sinks'] = {}
-                    __add_heat_sinks(value, mech_data['heat_sinks'])
-                # = walk_mp =
-                # -> calculate and add 'run_mp' for convenience
-                elif key == 'walk_mp':
-                    mech_data[key] = int(value)
-                    mech_data['run_mp'] = ceil(int(value) * 1.5)
-                # = armor_pips =
-                elif key == 'armor' or key in armor_location_keys:
-                    if 'armor' not in mech_data:
-                        mech_data['armor'] = {}
-                    if key == 'armor':
-                        __add_armor(value, mech_data['armor'])
-                    elif key in armor_location_keys:
-                        __add_armor_locations(key, value, mech_data['armor'])
-                # = structure =
-                elif key == 'structure':
-                    if 'structure' not in mech_data:
-                        mech_data['structure'] = {}
-                    __add_structure(value, mech_data['structure'])
-                # = critical_slots : section start =
-                # Section structure: starts with any of the keys in 'critical_slot_keys'
-                # and contains one value per line below (until the next section starts)
-                elif key in critical_slot_keys:
-                    current_section = key
-                    if 'critical_slots' not in mech_data:
-                        mech_data['critical_slots'] = {}
-                    mech_data['critical_slots'][current_section] = {}
-                # = weapons : section start =
-                elif key == 'weapons':
-                    current_section = key
-                    mech_data[current_section] = {}
-                # = quirks =
-                # The MTF file can contain multiple 'quirk' entries
-                # that we merge in a single JSON 'quirks' section
-                elif key == 'quirk':
-                    if 'quirks' not in mech_data:
-                        mech_data['quirks'] = []
-                    mech_data['quirks'].append(value)
-                # = fluff =
-                elif key in fluff_keys:
-                    if 'fluff' not in mech_data:
-                        mech_data['fluff'] = {}
-                    __add_fluff(key, value, mech_data['fluff'])
-                # = other key:value pair =
-                else:
-                    # convert to int if possible
-                    # -> except for those keys that should always be strings!
-                    if key not in string_keys:
-                        try:
-                            mech_data[key] = int(value)
-                        except ValueError:
-                            mech_data[key] = value
-                    else:
-                        mech_data[key] = value
-            # === a line without a key ===
-            # a weapon entry
-            elif current_section == 'weapons':
-                if line:
-                    __add_weapon(line, mech_data[current_section])
-            # a critical slot entry
-            elif current_section and current_section in critical_slot_keys:
-                __add_crit_slot(line, mech_data['critical_slots'][current_section])
+
+        if key is not None:
+            # = armor_pips =
+            if key in armor_location_keys:
+                yield __parse_armor_pips(key, value)
+            # = critical_slots / weapons : section start =
+            # Section structure: starts with any of the keys in 'critical_slot_keys'
+            # (or 'weapons') and contains one value per line below (until the next section starts)
+            elif key in critical_slot_keys or key == 'weapons':
+                current_section = key
+                slot_number = 0
+                yield SectionStart(key)
+            # = fluff =
+            elif key in fluff_keys:
+                yield FluffEntry(key, value)
+            # = other key:value pair =
+            else:
+                yield KeyValue(key, value)
+        # === a line without a key ===
+        # a weapon entry
+        elif current_section == 'weapons':
+            if len(line) <= parse_cache_max_length:
+                yield __cached_parse_weapon_line(line)
+            else:
+                yield __parse_weapon_line(line)
+        # a critical slot entry
+        elif current_section:
+            slot_number += 1
+            if isinstance(line, bytes):
+                yield CritSlot(current_section, slot_number, line.decode('ascii') if line != b'-Empty-' else None)
+            else:
+                yield CritSlot(current_section, slot_number, line if line != '-Empty-' else None)
+
+
+def iter_mtf_events(source: MTFSource) -> Iterator[MTFEvent]:
+    """
+    Parse the given MTF source (path, raw content or text stream) and yield
+    one event per MTF line, without building the JSON structure, e.g.:
+        ```
+        KeyValue(key='mass', value='100')
+        ArmorPips(location='left_torso', side='rear', pips=10, type=None)
+        SectionStart(section='weapons')
+        WeaponSlot(name='ISERLargeLaser', location='left_arm', facing='front', quantity=1, ammo=None)
+        SectionStart(section='left_arm')
+        CritSlot(location='left_arm', slot=1, item='Shoulder')
+        FluffEntry(key='overview', value='...')
+        ```
+    Use this instead of 'read_mtf()' to aggregate data over many files with
+    constant memory per file (e.g. weapon frequencies or armor totals).
+    Paths and raw content are tokenized as bytes (UTF-8 with CP-1252 fallback,
+    see '__iter_line_events()'), text streams line by line.
+    """
+    # like text files, '\n', '\r\n' and '\r' are line breaks ('universal newlines')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        lines: Iterable[Union[str, bytes]] = bytes(source).splitlines()
+    elif isinstance(source, (str, Path)):
+        lines = Path(source).read_bytes().splitlines()
+    else:
+        yield from __iter_line_events(__iter_text_lines(source))
+        return
+    __check_compat(lines)
+    yield from __iter_line_events(lines)
+
+
+def parse_mtf_events(source: MTFSource, handler: Callable[[MTFEvent], None]) -> None:
+    """
+    Parse the given MTF source and call `handler` for each event (see 'iter_mtf_events()').
+    """
+    for event in iter_mtf_events(source):
+        handler(event)
+
+
+def __add_key_value(key: str, value: str, mech_data: Dict[str, Any]) -> None:
+    """
+    Add a flat `key:value` pair (i.e. a 'KeyValue' event) to the JSON data.
+    """
+    # = rules_level =
+    # -> add a 'rules_level_str' for convenience
+    if key == 'rules_level':
+        mech_data['rules_level'] = int(value)
+        __add_rules_level_str(mech_data)
+    # = heat_sinks =
+    elif key == 'heat_sinks':
+        mech_data['heat_sinks'] = {}
+        __add_heat_sinks(value, mech_data['heat_sinks'])
+    # = walk_mp =
+    # -> calculate and add 'run_mp' for convenience
+    elif key == 'walk_mp':
+        mech_data[key] = int(value)
+        mech_data['run_mp'] = ceil(int(value) * 1.5)
+    # = armor =
+    elif key == 'armor':
+        if 'armor' not in mech_data:
+            mech_data['armor'] = {}
+        __add_armor(value, mech_data['armor'])
+    # = structure =
+    elif key == 'structure':
+        if 'structure' not in mech_data:
+            mech_data['structure'] = {}
+        __add_structure(value, mech_data['structure'])
+    # = quirks =
+    # The MTF file can contain multiple 'quirk' entries
+    # that we merge in a single JSON 'quirks' section
+    elif key == 'quirk':
+        if 'quirks' not in mech_data:
+            mech_data['quirks'] = []
+        mech_data['quirks'].append(value)
+    # = other key:value pair =
+    else:
+        # convert to int if possible
+        # -> except for those keys that should always be strings!
+        if key not in string_keys:
+            try:
+                mech_data[key] = int(value)
+            except ValueError:
+                mech_data[key] = value
+        else:
+            mech_data[key] = value
+
+
+def __build_mech_data(events: Iterable[MTFEvent]) -> Dict[str, Any]:
+    """
+    Build the JSON data from the given parser events.
+    """
+    mech_data: Dict[str, Any] = {}
+    for event in events:
+        # ordered by frequency
+        if type(event) is CritSlot:
+            __add_crit_slot(event, mech_data['critical_slots'][event.location])
+        elif type(event) is KeyValue:
+            __add_key_value(event.key, event.value, mech_data)
+        elif type(event) is WeaponSlot:
+            __add_weapon(event, mech_data['weapons'])
+        elif type(event) is ArmorPips:
+            if 'armor' not in mech_data:
+                mech_data['armor'] = {}
+            __add_armor_locations(event, mech_data['armor'])
+        elif type(event) is FluffEntry:
+            if 'fluff' not in mech_data:
+                mech_data['fluff'] = {}
+            __add_fluff(event.key, event.value, mech_data['fluff'])
+        elif type(event) is SectionStart:
+            if event.section == 'weapons':
+                mech_data['weapons'] = {}
+            else:
+                if 'critical_slots' not in mech_data:
+                    mech_data['critical_slots'] = {}
+                mech_data['critical_slots'][event.section] = {}
 
     # merge identical weapons
     __merge_weapons(mech_data)
     # add structure pips
-    if __is_biped_mech(mech_data['config']):
-        __add_biped_structure_pips(mech_data)
-    # rename some keys before returning JSON data
-    return __rename_keys(mech_data)
+    __add_structure_pips(mech_data, __chassis_layout(mech_data['config']))
+    return mech_data
+
+
+def read_mtf(path: Path, cache: Optional['ParseCache'] = None) -> Dict[str, Any]:
+    """
+    Read given MTF file and return content as JSON.
+    If `cache` is given, look up the content in that persistent cache first (see 'mtf2json.disk_cache').
+    """
+    if cache is not None:
+        return cache.read_mtf_bytes(path.read_bytes())
+    return __build_mech_data(iter_mtf_events(path))
 
 
-def write_json(data: Dict[str, Any], path: Path) -> None:
-    with open(path, 'w') as json_file:
-        json.dump(data, json_file, indent=4)
+def read_mtf_bytes(data: bytes) -> Dict[str, Any]:
+    """
+    Convert the given MTF file content and return it as JSON.
+    """
+    return __build_mech_data(iter_mtf_events(data))
+
+
+def __unchanged(content: bytes, path: Path) -> bool:
+    """
+    Return True if `path` exists and contains exactly `content`.
+    Compares the file size first, so most changed files are detected without reading them.
+    """
+    try:
+        if os.stat(path).st_size != len(content):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == content
+    except FileNotFoundError:
+        return False
+
+
+def write_json_text(text: str, path: Path, skip_unchanged: bool = False) -> bool:
+    """
+    Write the given JSON string to `path`. The file is written atomically by writing to a
+    temporary file in the same directory and renaming it (i.e. readers never see a partial file).
+    If `skip_unchanged` is True, the file is not touched if it already has the same content
+    (i.e. the mtime is preserved).
+    Returns True if the file has been written, False if it has been skipped.
+    """
+    content = text.encode('utf8')
+    if skip_unchanged and __unchanged(content, path):
+        return False
+    # unique name per thread (and process) -> no conflicts between concurrent writers
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def canonical_json(data: Dict[str, Any]) -> str:
+    """
+    Serialize the given JSON data canonically (sorted keys, no whitespace),
+    i.e. equal data always results in the same string.
+    """
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+def content_hash(data: Dict[str, Any]) -> str:
+    """
+    Return the SHA-256 hash (hex) of the canonical serialization of the given JSON data.
+    The metadata key is ignored, so the hash of data with an embedded hash is the same.
+    """
+    if metadata_key in data:
+        data = {k: v for k, v in data.items() if k != metadata_key}
+    return hashlib.sha256(canonical_json(data).encode('utf8')).hexdigest()
+
+
+def to_json(data: Dict[str, Any], canonical: bool = False, embed_hash: bool = False) -> str:
+    """
+    Serialize the given JSON data, either formatted (like 'write_json()') or canonically.
+    If `embed_hash` is True, add the content hash under the metadata key:
+    `{"_meta": {"sha256": <hash>}, ...}`.
+    """
+    if embed_hash:
+        data = {metadata_key: {'sha256': content_hash(data)},
+                **{k: v for k, v in data.items() if k != metadata_key}}
+    if canonical:
+        return canonical_json(data)
+    return json.dumps(data, indent=4)
+
+
+def write_json(data: Dict[str, Any],
+               path: Path,
+               skip_unchanged: bool = False,
+               canonical: bool = False,
+               embed_hash: bool = False) -> bool:
+    """
+    Write the given JSON data to `path` (see 'write_json_text()' and 'to_json()').
+    Returns True if the file has been written, False if it has been skipped.
+    """
+    return write_json_text(to_json(data, canonical, embed_hash), path, skip_unchanged)
@@ -1,14 +1,96 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple, Optional, Tuple, Union, Callable, Iterator, TextIO
+from .disk_cache import ParseCache
 
 
 version: str
+output_revision: int
 mm_commit: str
+parse_cache_size: int
+parse_cache_max_length: int
+metadata_key: str
+critical_slot_keys: Tuple[str, ...]
+armor_location_keys: Tuple[str, ...]
+fluff_keys: Tuple[str, ...]
+renamed_keys: Dict[str, str]
+string_keys: Tuple[str, ...]
+weight_pips: Dict[int, Tuple[int, int, int, int, int]]
+HEAD: int
+CENTER_TORSO: int
+SIDE_TORSO: int
+ARM: int
+LEG: int
+head_armor_factor: int
+armor_factor: int
 
 
 class ConversionError(Exception):
     ...
 
 
-def read_mtf(path: Path) -> Dict[str, Any]: ...
-def write_json(data: Dict[str, Any], path: Path) -> None: ...
+class ChassisLayout(NamedTuple):
+    locations: Tuple[str, ...]
+    crit_slots: Tuple[int, ...]
+    structure_pips: Tuple[Optional[Tuple[int, ...]], ...]
+    max_armor_pips: Tuple[Optional[Tuple[int, ...]], ...]
+
+
+chassis_layouts: Dict[str, ChassisLayout]
+
+
+def read_mtf(path: Path, cache: Optional[ParseCache] = ...) -> Dict[str, Any]: ...
+def read_mtf_bytes(data: bytes) -> Dict[str, Any]: ...
+def write_json(data: Dict[str, Any],
+               path: Path,
+               skip_unchanged: bool = ...,
+               canonical: bool = ...,
+               embed_hash: bool = ...) -> bool: ...
+def write_json_text(text: str, path: Path, skip_unchanged: bool = ...) -> bool: ...
+def canonical_json(data: Dict[str, Any]) -> str: ...
+def content_hash(data: Dict[str, Any]) -> str: ...
+def to_json(data: Dict[str, Any], canonical: bool = ..., embed_hash: bool = ...) -> str: ...
+def parse_cache_info() -> Dict[str, Dict[str, int]]: ...
+def clear_parse_cache() -> None: ...
+
+
+class KeyValue(NamedTuple):
+    key: str
+    value: str
+
+
+class SectionStart(NamedTuple):
+    section: str
+
+
+class WeaponSlot(NamedTuple):
+    name: str
+    location: str
+    facing: str
+    quantity: int
+    ammo: Optional[int]
+
+
+class CritSlot(NamedTuple):
+    location: str
+    slot: int
+    item: Optional[str]
+
+
+class ArmorPips(NamedTuple):
+    location: str
+    side: Optional[str]
+    pips: int
+    type: Optional[str]
+
+
+class FluffEntry(NamedTuple):
+    key: str
+    value: str
+
+
+MTFEvent = Union[KeyValue, SectionStart, WeaponSlot, CritSlot, ArmorPips, FluffEntry]
+MTFSource = Union[str, Path, bytes, TextIO]
+
+
+def iter_mtf_events(source: MTFSource) -> Iterator[MTFEvent]: ...
+def parse_mtf_events(source: MTFSource, handler: Callable[[MTFEvent], None]) -> None: ...
@@ -0,0 +1,157 @@
+"""
+Deterministic sharding for multi-node corpus conversion.
+A file belongs to shard `I/N` (1 <= I <= N) if a stable hash of its path relative
+to the MTF directory (with '/' separators) modulo N is I - 1. All nodes compute the
+same partition without exchanging file lists, independent of the OS and the order
+in which the files are found.
+Each node writes its own report (and bundle / index), which are combined by 'merge_reports()',
+'merge_bundles()' and 'merge_indexes()' (or 'mtf2json merge-shards').
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .bundle import OffsetIndex, offsets_path
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parse a shard string like '2/4' and return the tuple (2, 4).
+    """
+    try:
+        index, count = (int(v) for v in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}' (expected 'I/N').")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}' (expected 1 <= I <= N).")
+    return (index, count)
+
+
+def shard_str(shard: Tuple[int, int]) -> str:
+    return f"{shard[0]}/{shard[1]}"
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """
+    Return the shard index (1..`count`) of the given relative path.
+    """
+    digest = hashlib.sha1(rel_path.encode('utf8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def in_shard(rel_path: str, shard: Optional[Tuple[int, int]]) -> bool:
+    """
+    Return True if the given relative path belongs to `shard` (or if `shard` is None).
+    """
+    return shard is None or shard_of(rel_path, shard[1]) == shard[0]
+
+
+def write_report(report: Dict[str, Any], path: Path) -> None:
+    """
+    Write the given report with sorted keys (i.e. deterministic, independent of the
+    order in which the files have been converted).
+    """
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=4, sort_keys=True)
+
+
+def dedup_ratio(num_files: int, num_duplicates: int) -> float:
+    """
+    Return the ratio of all files to the files with unique content (1.0 -> no duplicates).
+    """
+    return round(num_files / (num_files - num_duplicates), 3) if num_files > num_duplicates else 1.0
+
+
+def merge_reports(report_files: Sequence[Path]) -> Dict[str, Any]:
+    """
+    Combine the given per-shard reports into one report.
+    Raises a ValueError if the shards don't belong to the same partition,
+    if a shard is given twice or is missing, or if a file is contained in more than one report.
+    """
+    files: Dict[str, Any] = {}
+    quarantine: Dict[str, Any] = {}
+    # files deleted since the previous revision (only in reports of 'convert_git()' with `since`)
+    deleted: Optional[List[str]] = None
+    shards: List[Tuple[int, int]] = []
+    version: Optional[str] = None
+    for report_file in report_files:
+        with open(report_file, 'r') as f:
+            report = json.load(f)
+        if version is not None and report['version'] != version:
+            raise ValueError(f"Report '{report_file}' has been created by a different mtf2json version ({report['version']}).")
+        version = report['version']
+        for shard in report['shards']:
+            index, count = parse_shard(shard)
+            if shards and count != shards[0][1]:
+                raise ValueError(f"Shard {shard} of report '{report_file}' belongs to a different partition.")
+            if (index, count) in shards:
+                raise ValueError(f"Shard {shard} of report '{report_file}' has already been merged.")
+            shards.append((index, count))
+        for rel_path, result in report['files'].items():
+            if rel_path in files:
+                raise ValueError(f"File '{rel_path}' is contained in more than one report.")
+            files[rel_path] = result
+        quarantine.update(report.get('quarantine', {}))
+        if 'deleted' in report:
+            deleted = (deleted or []) + report['deleted']
+    count = shards[0][1] if shards else 0
+    missing = [shard_str((index, count)) for index in range(1, count + 1) if (index, count) not in shards]
+    if missing:
+        raise ValueError(f"Shard(s) {', '.join(missing)} are missing.")
+    # duplicates in different shards are parsed in each shard
+    num_duplicates = sum(1 for r in files.values() if 'duplicate_of' in r)
+    deleted_files = {} if deleted is None else {'deleted': sorted(deleted), 'num_deleted': len(deleted)}
+    return {
+        'version': version,
+        'shards': [shard_str(s) for s in sorted(shards)],
+        'num_files': len(files),
+        'num_success': sum(1 for r in files.values() if r['status'] not in ('failed', 'quarantined')),
+        'num_written': sum(1 for r in files.values() if r['status'] == 'converted'),
+        'num_skipped': sum(1 for r in files.values() if r['status'] == 'unchanged'),
+        'files': files,
+        'quarantine': quarantine,
+        'num_duplicates': num_duplicates,
+        'dedup_ratio': dedup_ratio(len(files), num_duplicates),
+        **deleted_files
+    }
+
+
+def merge_indexes(index_files: Sequence[Path]) -> Dict[str, str]:
+    """
+    Combine the given per-shard indexes (MTF path -> content hash) into one index.
+    Raises a ValueError if a file is contained in more than one index.
+    """
+    index: Dict[str, str] = {}
+    for index_file in index_files:
+        with open(index_file, 'r') as f:
+            for rel_path, sha256 in json.load(f).items():
+                if rel_path in index:
+                    raise ValueError(f"File '{rel_path}' is contained in more than one index.")
+                index[rel_path] = sha256
+    return index
+
+
+def merge_bundles(bundle_files: Sequence[Path], target: Path) -> int:
+    """
+    Combine the given per-shard bundles (JSON lines) into one bundle (with offset index),
+    sorted by the relative MTF path. Returns the nr. of mechs in the bundle.
+    Raises a ValueError if a file is contained in more than one bundle.
+    """
+    records: List[Tuple[str, bytes, Dict[str, Any]]] = []
+    for bundle_file in bundle_files:
+        with open(bundle_file, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records.append((record['path'], line.rstrip(b'\n'), record['mech']))
+    records.sort(key=lambda r: r[0])
+    for (rel_path, _, _), (next_path, _, _) in zip(records, records[1:]):
+        if rel_path == next_path:
+            raise ValueError(f"File '{rel_path}' is contained in more than one bundle.")
+    offsets = OffsetIndex()
+    with open(target, 'wb') as f:
+        for rel_path, line, mech in records:
+            f.write(line + b'\n')
+            offsets.add(rel_path, len(line), mech.get('mul_id'), str(mech.get('chassis', '')), str(mech.get('model', '')))
+    offsets.write(offsets_path(target))
+    return len(records)
@@ -0,0 +1,389 @@
+"""
+A read-only corpus of converted mechs that many processes can share (e.g. the workers of a web server).
+The corpus is built once into a file with a compact binary layout. Each process maps the file into
+memory (i.e. all processes share the same pages of the OS page cache) and reads the mechs through
+lightweight views, without loading or copying the corpus:
+```
+corpus = SharedCorpus(Path('corpus.mtfc'))
+atlas = corpus.get('biped/Atlas_AS7-K.mtf')  # a view
+armor = atlas['armor']['left_torso']['front']['pips']
+data = atlas.to_dict()  # same data as 'read_mtf()'
+```
+The file is replaced atomically when the corpus is regenerated (see 'write_corpus()'), and readers
+switch to the new corpus with 'SharedCorpus.refresh()'. Views of the old corpus remain valid.
+
+Layout (little endian, all offsets are absolute and 32 bit):
+    header       magic, format version, nr. of mechs, nr. of strings, offsets of the sections, size
+    nodes        one tagged node per distinct value (identical subtrees are only stored once)
+    string index start and end of each string in the string data
+    string data  all distinct strings (keys and values), UTF-8 encoded
+    mech index   (path string, root node) of each mech, sorted by path
+"""
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple, Union
+
+
+magic = b'MTFC'
+format_version = 1
+
+# magic, format version, nr. of mechs, nr. of strings, string index, string data, mech index, file size
+_header = struct.Struct('<4sIIIIIII')
+header_size = _header.size
+
+# node tags
+_NULL = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_LIST = 6
+_DICT = 7
+
+_max_offset = 0xFFFFFFFF
+
+
+class _Builder:
+    """
+    Encodes the mechs of a corpus (see 'write_corpus()').
+    """
+    def __init__(self) -> None:
+        self.strings: Dict[str, int] = {}
+        self.nodes: Dict[bytes, int] = {}
+        self.data = bytearray()
+        self.mechs: Dict[str, int] = {}
+
+    def string(self, text: str) -> int:
+        string_id = self.strings.get(text)
+        if string_id is None:
+            string_id = self.strings[text] = len(self.strings)
+        return string_id
+
+    def node(self, value: Any) -> int:
+        """
+        Encode the given JSON value and return the offset of its node.
+        """
+        if value is None:
+            node = struct.pack('<B', _NULL)
+        elif value is True or value is False:
+            node = struct.pack('<B', _TRUE if value else _FALSE)
+        elif isinstance(value, int):
+            try:
+                node = struct.pack('<Bq', _INT, value)
+            except struct.error:
+                raise ValueError(f"Integer {value} exceeds 64 bits.")
+        elif isinstance(value, float):
+            node = struct.pack('<Bd', _FLOAT, value)
+        elif isinstance(value, str):
+            node = struct.pack('<BI', _STR, self.string(value))
+        elif isinstance(value, (list, tuple)):
+            children = [self.node(v) for v in value]
+            node = struct.pack(f'<BI{len(children)}I', _LIST, len(children), *children)
+        elif isinstance(value, dict):
+            entries: List[int] = []
+            for key, child in value.items():
+                if not isinstance(key, str):
+                    raise ValueError(f"Unsupported key type '{type(key).__name__}' (only strings are supported).")
+                entries.append(self.string(key))
+                entries.append(self.node(child))
+            node = struct.pack(f'<BI{len(entries)}I', _DICT, len(value), *entries)
+        else:
+            raise ValueError(f"Unsupported value type '{type(value).__name__}'.")
+        offset = self.nodes.get(node)
+        if offset is None:
+            offset = self.nodes[node] = header_size + len(self.data)
+            self.data += node
+        return offset
+
+    def add(self, rel_path: str, mech_data: Dict[str, Any]) -> None:
+        if rel_path in self.mechs:
+            raise ValueError(f"File '{rel_path}' is already contained in the corpus.")
+        self.mechs[rel_path] = self.node(mech_data)
+
+    def encode(self) -> bytes:
+        """
+        Return the complete corpus file.
+        """
+        mechs = sorted(self.mechs.items())
+        path_ids = [self.string(p) for p, _ in mechs]
+        string_data = bytearray()
+        string_index = [0]
+        for text in self.strings:
+            string_data += text.encode('utf8')
+            string_index.append(len(string_data))
+        string_index_offset = header_size + len(self.data)
+        string_data_offset = string_index_offset + 4 * len(string_index)
+        mech_index_offset = string_data_offset + len(string_data)
+        size = mech_index_offset + 8 * len(mechs)
+        if size > _max_offset:
+            raise ValueError(f"The corpus is too large ({size} bytes, max. {_max_offset}).")
+        mech_index: List[int] = []
+        for path_id, (_, root) in zip(path_ids, mechs):
+            mech_index += (path_id, root)
+        return b''.join([
+            _header.pack(magic, format_version, len(mechs), len(self.strings),
+                         string_index_offset, string_data_offset, mech_index_offset, size),
+            self.data,
+            struct.pack(f'<{len(string_index)}I', *string_index),
+            string_data,
+            struct.pack(f'<{len(mech_index)}I', *mech_index)
+        ])
+
+
+def write_corpus(mechs: Iterable[Tuple[str, Dict[str, Any]]], path: Path) -> int:
+    """
+    Write the given (path, JSON data) tuples to a corpus file and return the nr. of mechs.
+    The file is replaced atomically, i.e. readers see either the old or the new corpus
+    (see 'SharedCorpus.refresh()').
+    """
+    builder = _Builder()
+    for rel_path, mech_data in mechs:
+        builder.add(rel_path, mech_data)
+    data = builder.encode()
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return len(builder.mechs)
+
+
+class _Buffer:
+    """
+    A mapped corpus file (shared by all views of that file).
+    The file is unmapped when the corpus and all of its views are gone.
+    """
+    def __init__(self, path: Path) -> None:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_dev, stat.st_ino)
+            if stat.st_size < header_size:
+                raise ValueError(f"'{path}' is not a corpus file.")
+            self.data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        (file_magic, version, self.num_mechs, self.num_strings, self.string_index,
+         self.string_data, self.mech_index, size) = _header.unpack_from(self.data)
+        if file_magic != magic:
+            raise ValueError(f"'{path}' is not a corpus file.")
+        if version != format_version:
+            raise ValueError(f"Corpus '{path}' has an unsupported format version ({version}, expected {format_version}).")
+        if size != len(self.data):
+            raise ValueError(f"Corpus '{path}' is truncated ({len(self.data)} of {size} bytes).")
+
+    def string_bytes(self, string_id: int) -> memoryview:
+        start, end = struct.unpack_from('<II', self.data, self.string_index + 4 * string_id)
+        return self.data[self.string_data + start:self.string_data + end]
+
+    def string(self, string_id: int) -> str:
+        return str(self.string_bytes(string_id), 'utf8')
+
+    def mech(self, index: int) -> Tuple[int, int]:
+        """
+        Return the path string and root node of the mech with the given index.
+        """
+        return struct.unpack_from('<II', self.data, self.mech_index + 8 * index)
+
+    def find(self, rel_path: str) -> int:
+        """
+        Return the root node of the mech with the given path (binary search).
+        """
+        key = rel_path.encode('utf8')
+        low, high = 0, self.num_mechs
+        while low < high:
+            middle = (low + high) // 2
+            path_id, root = self.mech(middle)
+            path = self.string_bytes(path_id).tobytes()
+            if path == key:
+                return root
+            if path < key:
+                low = middle + 1
+            else:
+                high = middle
+        raise KeyError(rel_path)
+
+    def value(self, offset: int) -> Any:
+        """
+        Return the value of the given node (a view for lists and dicts).
+        """
+        tag = self.data[offset]
+        if tag == _DICT:
+            return DictView(self, offset)
+        if tag == _LIST:
+            return ListView(self, offset)
+        return self.scalar(tag, offset)
+
+    def scalar(self, tag: int, offset: int) -> Any:
+        if tag == _STR:
+            return self.string(struct.unpack_from('<I', self.data, offset + 1)[0])
+        if tag == _INT:
+            return struct.unpack_from('<q', self.data, offset + 1)[0]
+        if tag == _NULL:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _FLOAT:
+            return struct.unpack_from('<d', self.data, offset + 1)[0]
+        raise ValueError(f"Invalid node tag {tag} at offset {offset}.")
+
+    def materialize(self, offset: int) -> Any:
+        """
+        Return the value of the given node as plain Python objects (dicts and lists).
+        """
+        tag = self.data[offset]
+        if tag == _DICT:
+            count = struct.unpack_from('<I', self.data, offset + 1)[0]
+            entries = struct.unpack_from(f'<{2 * count}I', self.data, offset + 5)
+            return {self.string(entries[i]): self.materialize(entries[i + 1]) for i in range(0, 2 * count, 2)}
+        if tag == _LIST:
+            count = struct.unpack_from('<I', self.data, offset + 1)[0]
+            return [self.materialize(child) for child in struct.unpack_from(f'<{count}I', self.data, offset + 5)]
+        return self.scalar(tag, offset)
+
+
+class DictView(Mapping[str, Any]):
+    """
+    A read-only view of a JSON object in a corpus file (keys in the original order).
+    Compares equal to the corresponding dict.
+    """
+    __slots__ = ('_buffer', '_offset', '_count')
+
+    def __init__(self, buffer: _Buffer, offset: int) -> None:
+        self._buffer = buffer
+        self._offset = offset
+        self._count: int = struct.unpack_from('<I', buffer.data, offset + 1)[0]
+
+    def _entry(self, index: int) -> Tuple[int, int]:
+        return struct.unpack_from('<II', self._buffer.data, self._offset + 5 + 8 * index)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._buffer.string(self._entry(i)[0])
+
+    def __getitem__(self, key: str) -> Any:
+        if not isinstance(key, str):
+            raise KeyError(key)
+        key_bytes = key.encode('utf8')
+        for i in range(self._count):
+            key_id, child = self._entry(i)
+            if self._buffer.string_bytes(key_id) == key_bytes:
+                return self._buffer.value(child)
+        raise KeyError(key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return a copy as plain dict (with nested dicts and lists).
+        """
+        return self._buffer.materialize(self._offset)
+
+    def __repr__(self) -> str:
+        return f"DictView({self.to_dict()!r})"
+
+
+class ListView(Sequence[Any]):
+    """
+    A read-only view of a JSON array in a corpus file.
+    Compares equal to the corresponding list.
+    """
+    __slots__ = ('_buffer', '_offset', '_count')
+
+    def __init__(self, buffer: _Buffer, offset: int) -> None:
+        self._buffer = buffer
+        self._offset = offset
+        self._count: int = struct.unpack_from('<I', buffer.data, offset + 1)[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('list index out of range')
+        return self._buffer.value(struct.unpack_from('<I', self._buffer.data, self._offset + 5 + 4 * index)[0])
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (list, ListView)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def to_list(self) -> List[Any]:
+        """
+        Return a copy as plain list (with nested dicts and lists).
+        """
+        return self._buffer.materialize(self._offset)
+
+    def __repr__(self) -> str:
+        return f"ListView({self.to_list()!r})"
+
+
+class SharedCorpus:
+    """
+    Read mechs from a corpus file (see 'write_corpus()') without loading it.
+    The file is mapped into memory, i.e. all processes that read the same corpus
+    share its pages. Call 'refresh()' (e.g. before each request) to switch to a
+    regenerated corpus file.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._buffer = _Buffer(path)
+
+    def refresh(self) -> bool:
+        """
+        Map the corpus file again if it has been replaced. Returns True if it has.
+        Views of the previous file remain valid (it's unmapped when they are gone).
+        """
+        stat = os.stat(self.path)
+        if (stat.st_dev, stat.st_ino) == self._buffer.file_id:
+            return False
+        self._buffer = _Buffer(self.path)
+        return True
+
+    def __len__(self) -> int:
+        return self._buffer.num_mechs
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterate over the source paths (sorted).
+        """
+        buffer = self._buffer
+        for i in range(buffer.num_mechs):
+            yield buffer.string(buffer.mech(i)[0])
+
+    def __contains__(self, rel_path: object) -> bool:
+        if not isinstance(rel_path, str):
+            return False
+        try:
+            self._buffer.find(rel_path)
+        except KeyError:
+            return False
+        return True
+
+    def get(self, rel_path: str) -> DictView:
+        """
+        Return a view of the mech converted from the given source path.
+        Raises a KeyError if the corpus doesn't contain it.
+        """
+        return DictView(self._buffer, self._buffer.find(rel_path))
+
+    def items(self) -> Iterator[Tuple[str, DictView]]:
+        """
+        Iterate over (source path, view) of all mechs (sorted by path).
+        """
+        buffer = self._buffer
+        for i in range(buffer.num_mechs):
+            path_id, root = buffer.mech(i)
+            yield buffer.string(path_id), DictView(buffer, root)
@@ -0,0 +1,277 @@
+"""
+Validation of converted JSON data.
+The expected shape of the data is declared in 'schema' and compiled once (at import)
+into a tree of check functions, so validating a mech costs about as much as walking
+its JSON data once. Schema nodes:
+    * a type (`str`, `int`, `type(None)`): the value must have exactly that type
+      (e.g. `int` doesn't match `bool`)
+    * a dict: the value must be a dict with the given keys
+      -> keys ending with '?' are optional, key '*' matches all other keys
+         (without '*', other keys are not allowed)
+    * a list with one node: the value must be a list of items matching that node
+    * a tuple of nodes: the value must match one of them
+    * `object`: any value
+In addition to the shape, the values are checked against the chassis layout:
+structure pips against the structure pip tables, armor pips against the max. armor
+of each location, the nr. of filled critical slots against the critical slots of each
+location and weapon / critical slot locations against the chassis locations.
+"""
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from .mtf2json import ConversionError, ChassisLayout, chassis_layouts
+
+__pips = {'pips': int, 'type?': str}
+
+schema: Dict[str, Any] = {
+    'chassis': str,
+    'model': str,
+    'mul_id?': int,
+    'config': str,
+    'techbase?': str,
+    'era?': int,
+    'source?': str,
+    'rules_level?': int,
+    'rules_level_str?': str,
+    'role?': str,
+    'quirks?': [str],
+    'mass': int,
+    'engine': str,
+    'structure': {'type': str, 'tech_base?': str, '*': {'pips': int}},
+    'myomer?': str,
+    'heat_sinks': {'quantity': int, 'type': str},
+    'walk_mp': int,
+    'run_mp': int,
+    'jump_mp?': int,
+    'armor': {'type': str, 'tech_base?': str,
+              '*': ({'front': __pips, 'rear': __pips}, __pips)},
+    # slot -> weapon name -> weapon
+    'weapons': {'*': {'*': {'location': str, 'facing': str, 'quantity': int, 'ammo?': int}}},
+    # location -> slot -> item
+    'critical_slots': {'*': {'*': (str, type(None))}},
+    'fluff?': {'*': (str, [str], {'*': str})},
+    '_meta?': {'sha256': str},
+    # other key:value pairs of the MTF file (e.g. 'gyro' or 'cockpit')
+    '*': (str, int),
+}
+
+Check = Callable[[Any, str, List[str]], None]
+
+
+class ValidationError(ConversionError):
+    """
+    Raised by 'check_mech()'. `errors` contains all error messages.
+    """
+    def __init__(self, errors: List[str]) -> None:
+        more = f" (and {len(errors) - 1} more)" if len(errors) > 1 else ''
+        super().__init__(f"Invalid JSON data: {errors[0]}{more}")
+        self.errors = errors
+
+    def __reduce__(self) -> Any:
+        # keep the errors when sent between processes
+        return (ValidationError, (self.errors,))
+
+
+def __type_name(node: Any) -> str:
+    if isinstance(node, type):
+        return 'null' if node is type(None) else node.__name__
+    if isinstance(node, dict):
+        return 'dict'
+    if isinstance(node, list):
+        return 'list'
+    return ' or '.join(__type_name(n) for n in node)
+
+
+def __leaf_types(node: Any) -> Optional[FrozenSet[type]]:
+    """
+    Return the set of allowed types if `node` only checks the type of a value
+    (a type or a tuple of types), None otherwise.
+    """
+    if isinstance(node, type) and node is not object:
+        return frozenset([node])
+    if isinstance(node, tuple) and all(isinstance(n, type) and n is not object for n in node):
+        return frozenset(node)
+    return None
+
+
+def __compile(node: Any) -> Check:
+    """
+    Compile the given schema node into a check function. The check function
+    appends an error message for each mismatch to the given error list.
+    Type checks of dict and list items are inlined (the value must have exactly one
+    of the types, i.e. `int` doesn't match `bool`), paths are only built for errors.
+    """
+    if node is object:
+        return lambda value, path, errors: None
+
+    expected = __type_name(node)
+    types = __leaf_types(node)
+    if types is not None:
+        def check_type(value: Any, path: str, errors: List[str]) -> None:
+            if type(value) not in types:
+                errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+        return check_type
+
+    if isinstance(node, list):
+        item_types = __leaf_types(node[0])
+        check_item = __compile(node[0])
+
+        def check_list(value: Any, path: str, errors: List[str]) -> None:
+            if type(value) is not list:
+                errors.append(f"{path}: expected list, got {type(value).__name__}")
+                return
+            for i, item in enumerate(value):
+                if item_types is None or type(item) not in item_types:
+                    check_item(item, f"{path}[{i}]", errors)
+        return check_list
+
+    if isinstance(node, tuple):
+        alternatives = [__compile(n) for n in node]
+        # dict alternatives are selected by their required keys (e.g. 'front' and 'rear' of torso armor)
+        dict_alternatives = [([k for k in n if k != '*' and not k.endswith('?')], __compile(n))
+                             for n in node if isinstance(n, dict)]
+
+        def check_any(value: Any, path: str, errors: List[str]) -> None:
+            if type(value) is dict:
+                for required, check in dict_alternatives:
+                    if all(key in value for key in required):
+                        check(value, path, errors)
+                        return
+            all_errors: List[List[str]] = []
+            for check in alternatives:
+                alt_errors: List[str] = []
+                check(value, path, alt_errors)
+                if not alt_errors:
+                    return
+                all_errors.append(alt_errors)
+            if type(value) in (dict, list):
+                # report the errors of the best matching alternative
+                best_match = min(all_errors, key=len)
+                errors.extend(best_match)
+            else:
+                errors.append(f"{path}: expected {expected}, got {type(value).__name__}")
+        return check_any
+
+    required = [k for k in node if k != '*' and not k.endswith('?')]
+    # key -> (allowed types or None, check function)
+    keys: Dict[str, Tuple[Optional[FrozenSet[type]], Check]] = {
+        k.rstrip('?'): (__leaf_types(n), __compile(n)) for k, n in node.items() if k != '*'
+    }
+    other = (__leaf_types(node['*']), __compile(node['*'])) if '*' in node else None
+
+    if other is not None and other[0] is not None and not keys and not required:
+        # only values of the given types (e.g. critical slots) -> check all values at once
+        value_types = other[0]
+
+        def check_values(value: Any, path: str, errors: List[str]) -> None:
+            if type(value) is not dict:
+                errors.append(f"{path}: expected dict, got {type(value).__name__}")
+            elif not all(type(item) in value_types for item in value.values()):
+                for key, item in value.items():
+                    if type(item) not in value_types:
+                        errors.append(f"{path}.{key}: expected {__type_name(node['*'])}, got {type(item).__name__}")
+        return check_values
+
+    def check_dict(value: Any, path: str, errors: List[str]) -> None:
+        if type(value) is not dict:
+            errors.append(f"{path}: expected dict, got {type(value).__name__}")
+            return
+        prefix = f"{path}." if path else ''
+        for key in required:
+            if key not in value:
+                errors.append(f"{prefix}{key}: missing")
+        for key, item in value.items():
+            check = keys.get(key, other)
+            if check is None:
+                errors.append(f"{prefix}{key}: unexpected key")
+            elif check[0] is None or type(item) not in check[0]:
+                check[1](item, f"{prefix}{key}", errors)
+    return check_dict
+
+
+__check_schema = __compile(schema)
+
+
+def __pips_of(section: Dict[str, Any]) -> int:
+    if 'pips' in section:
+        return section['pips']
+    return section['front']['pips'] + section['rear']['pips']
+
+
+def __check_layout(data: Dict[str, Any], layout: ChassisLayout, errors: List[str]) -> None:
+    """
+    Check the pips and locations of the (well-formed) data against the chassis layout.
+    """
+    mass = data['mass']
+    structure_pips = layout.structure_pips[mass // 5] if 0 <= mass // 5 < len(layout.structure_pips) and mass % 5 == 0 else None
+    if structure_pips is None:
+        errors.append(f"mass: unsupported value {mass}")
+        return
+    max_armor_pips = layout.max_armor_pips[mass // 5] or ()
+    locations = set(layout.locations)
+    for location, pips, max_armor in zip(layout.locations, structure_pips, max_armor_pips):
+        structure = data['structure'].get(location)
+        if structure is None:
+            errors.append(f"structure.{location}: missing")
+        elif structure['pips'] != pips:
+            errors.append(f"structure.{location}.pips: expected {pips}, got {structure['pips']}")
+        armor = data['armor'].get(location)
+        if armor is None:
+            errors.append(f"armor.{location}: missing")
+            continue
+        for side, section in [('', armor)] if 'pips' in armor else [('.front', armor['front']), ('.rear', armor['rear'])]:
+            if section['pips'] < 0:
+                errors.append(f"armor.{location}{side}.pips: negative value {section['pips']}")
+        if __pips_of(armor) > max_armor:
+            errors.append(f"armor.{location}: {__pips_of(armor)} pips exceed the maximum of {max_armor}")
+    for location in data['structure']:
+        if location not in ('type', 'tech_base') and location not in locations:
+            errors.append(f"structure.{location}: invalid location for {data['config']}")
+    for location in data['armor']:
+        if location not in ('type', 'tech_base') and location not in locations:
+            errors.append(f"armor.{location}: invalid location for {data['config']}")
+    crit_slots = dict(zip(layout.locations, layout.crit_slots))
+    for location, slots in data['critical_slots'].items():
+        if location not in locations:
+            errors.append(f"critical_slots.{location}: invalid location for {data['config']}")
+        else:
+            # (MTF files list 12 slots for all locations, the others are empty)
+            filled = sum(1 for item in slots.values() if item is not None)
+            if filled > crit_slots[location]:
+                errors.append(f"critical_slots.{location}: {filled} filled slots exceed the {crit_slots[location]} slots")
+        if not all(map(str.isdigit, slots)):
+            errors.extend(f"critical_slots.{location}.{slot}: invalid slot" for slot in slots if not slot.isdigit())
+    for slot, weapons in data['weapons'].items():
+        for name, weapon in weapons.items():
+            path = f"weapons.{slot}.{name}"
+            if weapon['location'] not in locations:
+                errors.append(f"{path}.location: invalid location '{weapon['location']}'")
+            if weapon['facing'] not in ('front', 'rear'):
+                errors.append(f"{path}.facing: invalid value '{weapon['facing']}'")
+            if weapon['quantity'] < 1:
+                errors.append(f"{path}.quantity: invalid value {weapon['quantity']}")
+
+
+def validate_mech(data: Dict[str, Any]) -> List[str]:
+    """
+    Validate the given JSON data of a mech (as returned by 'read_mtf()').
+    Returns a list of error messages (empty if the data is valid).
+    """
+    errors: List[str] = []
+    __check_schema(data, '', errors)
+    # the layout checks require well-formed data
+    if errors:
+        return errors
+    layout = chassis_layouts.get(data['config'].split(' ')[0])
+    if layout is None:
+        errors.append(f"config: unsupported chassis type '{data['config']}'")
+    else:
+        __check_layout(data, layout, errors)
+    return errors
+
+
+def check_mech(data: Dict[str, Any]) -> None:
+    """
+    Validate the given JSON data of a mech and raise a 'ValidationError' if it's invalid.
+    """
+    errors = validate_mech(data)
+    if errors:
+        raise ValidationError(errors)
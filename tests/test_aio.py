@@ -0,0 +1,123 @@
+import asyncio
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.aio import aread_mtf, aread_mtf_bytes, aconvert_dir
+from benchmarks.synth import write_dir
+
+
+mtf_folder = Path(__file__).parent / 'mtf/biped'
+
+
+def test_aread_mtf() -> None:
+    async def convert() -> None:
+        for mtf_file in sorted(mtf_folder.glob('*.mtf')):
+            assert await aread_mtf(mtf_file) == read_mtf(mtf_file)
+            assert await aread_mtf_bytes(mtf_file.read_bytes()) == read_mtf(mtf_file)
+    asyncio.run(convert())
+
+
+async def ticker(stop: asyncio.Event, lags: List[float]) -> None:
+    """
+    Measures how late the event loop wakes up after a 1ms sleep.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_event_loop_latency(processes: int) -> None:
+    """
+    Converts a synthetic corpus with 'aconvert_dir()' and checks that the event loop
+    stays responsive (converting all files synchronously would block it for several 100ms).
+    """
+    async def convert(mtf_dir: Path, json_dir: Path) -> List[float]:
+        stop = asyncio.Event()
+        lags: List[float] = []
+        tick = asyncio.ensure_future(ticker(stop, lags))
+        executor = ProcessPoolExecutor(processes) if processes else None
+        try:
+            num_success, error_files = await aconvert_dir(mtf_dir, json_dir, executor=executor)
+        finally:
+            if executor:
+                executor.shutdown()
+        stop.set()
+        await tick
+        assert num_success == 300
+        assert error_files == []
+        return lags
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_files = write_dir(Path(tmpdir) / 'mtf', 300, seed=5)
+        lags = asyncio.run(convert(Path(tmpdir) / 'mtf', Path(tmpdir) / 'json'))
+        assert len(lags) > 10
+        assert max(lags) < 0.1, f"Event loop was blocked for {max(lags) * 1000:.1f}ms"
+        for mtf_file in mtf_files[:20]:
+            json_file = Path(tmpdir) / 'json' / mtf_file.relative_to(Path(tmpdir) / 'mtf').with_suffix('.json')
+            with open(json_file, 'r') as f:
+                assert json.load(f) == read_mtf(mtf_file)
+
+
+def test_cancel() -> None:
+    """
+    Cancels 'aconvert_dir()' and checks that the remaining files are not converted.
+    """
+    async def convert(mtf_dir: Path, json_dir: Path) -> None:
+        task = asyncio.ensure_future(aconvert_dir(mtf_dir, json_dir, concurrency=2))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_dir(Path(tmpdir) / 'mtf', 500, seed=5)
+        asyncio.run(convert(Path(tmpdir) / 'mtf', Path(tmpdir) / 'json'))
+        assert len(list((Path(tmpdir) / 'json').rglob('*.json'))) < 500
+
+
+def test_errors() -> None:
+    """
+    Invalid files are reported with `ignore_errors` and raised otherwise.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_dir = Path(tmpdir) / 'mtf'
+        write_dir(mtf_dir, 10, seed=5)
+        (mtf_dir / 'invalid.mtf').write_text("chassis:Invalid\n")
+        num_success, error_files = asyncio.run(aconvert_dir(mtf_dir, ignore_errors=True))
+        assert num_success == 10
+        assert len(error_files) == 1 and error_files[0][0].endswith('invalid.mtf')
+        with pytest.raises(Exception):
+            asyncio.run(aconvert_dir(mtf_dir))
+
+
+def test_bounded_tasks() -> None:
+    """
+    The nr. of tasks doesn't depend on the nr. of files.
+    """
+    async def convert(mtf_dir: Path, json_dir: Path) -> int:
+        stop = asyncio.Event()
+        max_tasks = 0
+
+        async def count_tasks() -> None:
+            nonlocal max_tasks
+            while not stop.is_set():
+                max_tasks = max(max_tasks, len(asyncio.all_tasks()))
+                await asyncio.sleep(0.001)
+        counter = asyncio.ensure_future(count_tasks())
+        num_success, _ = await aconvert_dir(mtf_dir, json_dir, concurrency=4)
+        stop.set()
+        await counter
+        assert num_success == 300
+        return max_tasks
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_dir(Path(tmpdir) / 'mtf', 300, seed=5)
+        # main task, counter, producer and 4 workers
+        assert asyncio.run(convert(Path(tmpdir) / 'mtf', Path(tmpdir) / 'json')) <= 7
@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf, write_json
+from mtf2json.batch import convert_dir, convert_many, default_workers, free_threaded
+from benchmarks.synth import write_dir
+
+
+@pytest.mark.parametrize('queue_depth, threads', [(1, 1), (64, 1), (4, 3)])
+def test_convert_dir(queue_depth: int, threads: int) -> None:
+    """
+    Converts a synthetic corpus with different pipeline settings and checks that
+    the JSON files are identical to those written by 'write_json()'.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_dir = Path(tmpdir) / 'mtf'
+        json_dir = Path(tmpdir) / 'json'
+        mtf_files = write_dir(mtf_dir, 400, seed=9)
+        assert convert_dir(mtf_dir, json_dir, queue_depth=queue_depth, threads=threads) == 0
+        for mtf_file in mtf_files[::20]:
+            reference = Path(tmpdir) / 'reference.json'
+            write_json(read_mtf(mtf_file), reference)
+            json_file = json_dir / mtf_file.relative_to(mtf_dir).with_suffix('.json')
+            assert json_file.read_bytes() == reference.read_bytes()
+        assert len(list(json_dir.rglob('*.json'))) == 400
+
+
+def test_convert_dir_errors(capsys: pytest.CaptureFixture) -> None:
+    """
+    Without `ignore_errors`, the conversion stops at the first invalid file
+    (no files after it are written). With `ignore_errors`, all valid files are converted.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_dir = Path(tmpdir) / 'mtf'
+        write_dir(mtf_dir, 20, seed=9)
+        # sorted between the generated files
+        (mtf_dir / '0000' / 'Invalid.mtf').write_text("chassis:Invalid\n")
+        json_dir = Path(tmpdir) / 'json'
+        assert convert_dir(mtf_dir, json_dir, queue_depth=2) == 1
+        written = sorted(p.stem for p in json_dir.rglob('*.json'))
+        assert written == sorted(p.stem for p in (mtf_dir / '0000').glob('*.mtf') if p.name < 'Invalid.mtf')
+        assert convert_dir(mtf_dir, json_dir, ignore_errors=True) == 1
+        assert len(list(json_dir.rglob('*.json'))) == 20
+        assert "> Converted 20 of 21 files." in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('threads, processes', [(4, 0), (1, 2)])
+def test_convert_many(threads: int, processes: int) -> None:
+    """
+    Converts a list of files with parser threads and processes.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_files = write_dir(Path(tmpdir) / 'mtf', 40, seed=2)
+        json_files = [Path(tmpdir) / f"{i}.json" for i in range(len(mtf_files))]
+        assert convert_many(mtf_files, json_files, threads=threads, processes=processes) == 0
+        for mtf_file, json_file in zip(mtf_files, json_files):
+            reference = Path(tmpdir) / 'reference.json'
+            write_json(read_mtf(mtf_file), reference)
+            assert json_file.read_bytes() == reference.read_bytes()
+        # default JSON file names
+        assert convert_many(mtf_files[:3], processes=processes) == 0
+        assert all(f.with_suffix('.json').exists() for f in mtf_files[:3])
+        with pytest.raises(ValueError):
+            convert_many(mtf_files, json_files[:1])
+
+
+def test_default_workers() -> None:
+    mode, workers = default_workers()
+    assert workers >= 1
+    assert mode == 'threads' if free_threaded() or workers == 1 else mode == 'processes'
+
+
+def test_write_json_skip_unchanged() -> None:
+    """
+    Identical files are not rewritten (mtime and inode are preserved), changed files are
+    replaced atomically (no temporary files are left behind).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_file = Path(tmpdir) / 'mech.json'
+        data = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+        assert write_json(data, json_file, skip_unchanged=True)
+        os.utime(json_file, (0, 0))
+        inode = json_file.stat().st_ino
+        assert not write_json(data, json_file, skip_unchanged=True)
+        assert json_file.stat().st_mtime == 0 and json_file.stat().st_ino == inode
+        # same size, different content
+        data['chassis'] = data['chassis'][::-1]
+        assert write_json(data, json_file, skip_unchanged=True)
+        assert json_file.stat().st_mtime != 0
+        assert json.loads(json_file.read_text()) == data
+        assert os.listdir(tmpdir) == ['mech.json']
+
+
+def test_convert_dir_skip_unchanged() -> None:
+    """
+    Regenerating a corpus only rewrites the changed files and reports the counts.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 30, seed=5)
+        assert convert_dir(tmp / 'mtf', tmp / 'json', skip_unchanged=True, report=tmp / 'report.json') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert (report['num_written'], report['num_skipped']) == (30, 0)
+        mtf_files[3].write_bytes(mtf_files[3].read_bytes().replace(b'\r\nmodel:', b'\r\nmodel:X', 1))
+        assert convert_dir(tmp / 'mtf', tmp / 'json', skip_unchanged=True, report=tmp / 'report.json') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert (report['num_written'], report['num_skipped']) == (1, 29)
+        assert report['files'][mtf_files[3].relative_to(tmp / 'mtf').as_posix()]['status'] == 'converted'
+
+
+def test_write_json_atomic() -> None:
+    """
+    Files are always replaced (not truncated and written in place),
+    i.e. other links to the old file keep the old content.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_file = Path(tmpdir) / 'mech.json'
+        data = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+        assert write_json(data, json_file)
+        os.link(json_file, Path(tmpdir) / 'link.json')
+        data['chassis'] = 'Other'
+        assert write_json(data, json_file)
+        assert json.loads(json_file.read_text()) == data
+        assert json.loads((Path(tmpdir) / 'link.json').read_text())['chassis'] == 'Atlas'
+        assert sorted(os.listdir(tmpdir)) == ['link.json', 'mech.json']
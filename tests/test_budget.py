@@ -0,0 +1,74 @@
+import json
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.batch import convert_dir, load_quarantine
+from mtf2json.shard import merge_reports
+from benchmarks.synth import write_dir
+from benchmarks.bench_linear import adversarial_mtf
+
+
+def test_time_budget(capsys: pytest.CaptureFixture) -> None:
+    """
+    A file that exceeds the time budget is quarantined (the other files are converted)
+    and skipped in the next run until its content changes.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 10, seed=3)
+        slow = tmp / 'mtf' / 'Slow.mtf'
+        slow.write_bytes(adversarial_mtf('fluff', 40_000_000))
+        quarantine = tmp / 'quarantine.json'
+        kwargs = dict(ignore_errors=True, report=tmp / 'report.json', time_budget=0.05, quarantine=quarantine)
+        assert convert_dir(tmp / 'mtf', tmp / 'json', threads=2, **kwargs) == 1  # type: ignore
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_success'] == 10
+        assert report['files']['Slow.mtf']['status'] == 'failed'
+        assert 'time budget' in report['quarantine']['Slow.mtf']['reason']
+        assert load_quarantine(quarantine) == report['quarantine']
+        assert not (tmp / 'json' / 'Slow.json').exists()
+        assert len(list((tmp / 'json').rglob('*.json'))) == 10
+        # skipped in the next run
+        capsys.readouterr()
+        assert convert_dir(tmp / 'mtf', tmp / 'json', **kwargs) == 0  # type: ignore
+        assert 'SKIPPED' in capsys.readouterr().out
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['files']['Slow.mtf']['status'] == 'quarantined'
+        assert report['quarantine'] == load_quarantine(quarantine)
+        # converted again after it has been fixed
+        slow.write_bytes(adversarial_mtf('fluff', 100))
+        assert convert_dir(tmp / 'mtf', tmp / 'json', **kwargs) == 0  # type: ignore
+        assert (tmp / 'json' / 'Slow.json').exists()
+        assert load_quarantine(quarantine) == {}
+
+
+def test_memory_budget() -> None:
+    """
+    A file that exceeds the memory budget fails without affecting the other files.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 5, seed=4)
+        (tmp / 'mtf' / 'Huge.mtf').write_bytes(adversarial_mtf('fluff', 40_000_000))
+        assert convert_dir(tmp / 'mtf', tmp / 'json', ignore_errors=True, report=tmp / 'report.json',
+                           memory_budget=32 * 2**20) == 1
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_success'] == 5
+        assert 'memory budget' in report['quarantine']['Huge.mtf']['reason']
+        with pytest.raises(ValueError):
+            convert_dir(tmp / 'mtf', tmp / 'json', time_budget=0)
+
+
+def test_merge_quarantine() -> None:
+    """
+    The quarantined files of sharded runs are merged.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 6, seed=3)
+        (tmp / 'mtf' / 'Slow.mtf').write_bytes(adversarial_mtf('fluff', 40_000_000))
+        for i in (1, 2):
+            convert_dir(tmp / 'mtf', tmp / 'json', ignore_errors=True, shard=(i, 2), report=tmp / f"{i}.json", time_budget=0.05)
+        merged = merge_reports([tmp / "1.json", tmp / "2.json"])
+        assert merged['num_files'] == 7 and merged['num_success'] == 6
+        assert list(merged['quarantine']) == ['Slow.mtf']
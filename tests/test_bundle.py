@@ -0,0 +1,52 @@
+import json
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.batch import convert_dir
+from mtf2json.bundle import BundleReader, offsets_path
+from mtf2json.shard import merge_bundles
+from benchmarks.synth import write_dir
+
+
+def test_bundle_reader() -> None:
+    """
+    Reads records by source path, MUL id and name from a bundle and a merged bundle.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 40, seed=7)
+        for i in (1, 2):
+            assert convert_dir(tmp / 'mtf', tmp / 'json', shard=(i, 2), bundle=tmp / f"bundle_{i}.jsonl") == 0
+        merge_bundles([tmp / 'bundle_1.jsonl', tmp / 'bundle_2.jsonl'], tmp / 'bundle.jsonl')
+        for bundle in [tmp / 'bundle_1.jsonl', tmp / 'bundle.jsonl']:
+            with BundleReader(bundle) as reader:
+                assert 0 < len(reader) <= 40
+                for rel_path in reader:
+                    data = read_mtf(tmp / 'mtf' / rel_path)
+                    assert reader.get(rel_path) == data
+                    assert data in reader.by_mul_id(data['mul_id'])
+                    assert data in reader.by_name(data['chassis'], data['model'])
+        with BundleReader(tmp / 'bundle.jsonl') as reader:
+            assert list(reader) == sorted(p.relative_to(tmp / 'mtf').as_posix() for p in mtf_files)
+            assert 'missing.mtf' not in reader
+            with pytest.raises(KeyError):
+                reader.get('missing.mtf')
+            assert reader.by_mul_id(-12345) == []
+
+
+def test_bundle_reader_errors() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 3, seed=7)
+        convert_dir(tmp / 'mtf', tmp / 'json', bundle=tmp / 'bundle.jsonl')
+        with open(tmp / 'bundle.jsonl', 'a') as f:
+            f.write('{}\n')
+        with pytest.raises(ValueError):
+            BundleReader(tmp / 'bundle.jsonl')
+        # empty bundle
+        (tmp / 'mtf2').mkdir()
+        convert_dir(tmp / 'mtf2', tmp / 'json', bundle=tmp / 'empty.jsonl')
+        assert json.loads(offsets_path(tmp / 'empty.jsonl').read_text())['size'] == 0
+        with BundleReader(tmp / 'empty.jsonl') as reader:
+            assert len(reader) == 0
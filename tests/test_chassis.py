@@ -0,0 +1,79 @@
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf, ConversionError, chassis_layouts, weight_pips
+
+
+mtf_folder = Path(__file__).parent / 'mtf'
+
+
+def convert_modified(mtf_file: Path, replacements: dict, append: str = '') -> dict:
+    """
+    Convert a modified copy of the given MTF file.
+    """
+    text = mtf_file.read_bytes().decode('utf8', errors='replace')
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / mtf_file.name
+        path.write_text(text + append, encoding='utf8')
+        return read_mtf(path)
+
+
+def test_layouts() -> None:
+    """
+    Checks the precomputed layouts against the static pip table.
+    """
+    for layout in chassis_layouts.values():
+        assert len(layout.locations) == len(layout.crit_slots)
+        for mass in range(0, 205):
+            pips = layout.structure_pips[mass // 5] if mass // 5 < len(layout.structure_pips) else None
+            if mass % 5 == 0 and mass in weight_pips:
+                assert pips is not None and len(pips) == len(layout.locations)
+                assert pips[0] == weight_pips[mass][0]
+    biped = chassis_layouts['Biped']
+    assert biped.structure_pips[100 // 5] == (3, 31, 21, 21, 17, 17, 21, 21)
+
+
+def test_quad() -> None:
+    """
+    Converts the Blue Flame BLF-21 (quad, 45 tons) and checks the quad specific locations.
+    """
+    data = read_mtf(mtf_folder / 'quad/Blue_Flame_BLF-21.mtf')
+    legs = ['front_left_leg', 'front_right_leg', 'rear_left_leg', 'rear_right_leg']
+    for leg in legs:
+        # quad legs use the leg structure values
+        assert data['structure'][leg] == {'pips': 11}
+        assert data['armor'][leg] == {'pips': 22}
+        assert data['critical_slots'][leg]['1'] == 'Hip'
+    assert 'left_arm' not in data['structure']
+    assert data['structure']['center_torso'] == {'pips': 14}
+
+
+def test_tripod() -> None:
+    """
+    Converts a tripod version of the Atlas AS7-K (100 tons) with a center leg.
+    """
+    center_leg = "\nCenter Leg:\nHip\nUpper Leg Actuator\nLower Leg Actuator\nFoot Actuator\n-Empty-\n-Empty-\n"
+    data = convert_modified(mtf_folder / 'biped/Atlas_AS7-K.mtf',
+                            {'Config:Biped': 'Config:Tripod', 'RL Armor:41': 'RL Armor:41\nCL Armor:40'},
+                            center_leg)
+    assert data['structure']['center_leg'] == {'pips': 21}
+    assert data['structure']['left_arm'] == {'pips': 17}
+    assert data['armor']['center_leg'] == {'pips': 40}
+    assert data['critical_slots']['center_leg']['1'] == 'Hip'
+
+
+def test_lam() -> None:
+    """
+    Converts a LAM version of the Atlas AS7-K (LAMs use the biped layout).
+    """
+    data = convert_modified(mtf_folder / 'biped/Atlas_AS7-K.mtf', {'Config:Biped': 'Config:LAM', 'Mass:100': 'Mass:55'})
+    assert data['structure']['left_leg'] == {'pips': 13}
+    assert data['structure']['head'] == {'pips': 3}
+
+
+@pytest.mark.parametrize('replacements', [{'Config:Biped': 'Config:QuadVee'}, {'Mass:100': 'Mass:47'}, {'Mass:100': 'Mass:205'}])
+def test_unsupported(replacements: dict) -> None:
+    with pytest.raises(ConversionError):
+        convert_modified(mtf_folder / 'biped/Atlas_AS7-K.mtf', replacements)
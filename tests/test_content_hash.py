@@ -0,0 +1,78 @@
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf, to_json, canonical_json, content_hash, metadata_key
+from mtf2json.batch import convert_dir
+from mtf2json.shard import merge_indexes
+from benchmarks.synth import write_dir
+
+
+atlas = Path('tests/mtf/biped/Atlas_AS7-K.mtf')
+
+
+def test_canonical_json() -> None:
+    """
+    The canonical serialization doesn't depend on the key order.
+    """
+    data = read_mtf(atlas)
+    reordered = dict(reversed(list(data.items())))
+    assert canonical_json(data) == canonical_json(reordered)
+    assert content_hash(data) == content_hash(reordered)
+    assert json.loads(canonical_json(data)) == data
+    assert ' ' not in canonical_json({'a': [1, 2], 'b': {'c': 3}})
+    data['mass'] += 5
+    assert content_hash(data) != content_hash(reordered)
+
+
+def test_embed_hash() -> None:
+    data = read_mtf(atlas)
+    embedded = json.loads(to_json(data, embed_hash=True))
+    assert embedded[metadata_key] == {'sha256': content_hash(data)}
+    # the embedded hash is ignored and replaced
+    assert content_hash(embedded) == content_hash(data)
+    assert json.loads(to_json(embedded, canonical=True, embed_hash=True)) == embedded
+    assert to_json(data) == json.dumps(data, indent=4)
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_convert_dir_hashes(processes: int) -> None:
+    """
+    The index, the report, the bundle and the JSON files contain the same hashes.
+    Canonical JSON files (without embedded hash) have the content hash as SHA-256.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 20, seed=6)
+        assert convert_dir(tmp / 'mtf', tmp / 'json', canonical=True, processes=processes,
+                           index=tmp / 'index.json', report=tmp / 'report.json', bundle=tmp / 'bundle.jsonl') == 0
+        index = json.loads((tmp / 'index.json').read_text())
+        report = json.loads((tmp / 'report.json').read_text())
+        assert len(index) == 20
+        for mtf_file in mtf_files:
+            rel_path = mtf_file.relative_to(tmp / 'mtf').as_posix()
+            json_file = tmp / 'json' / Path(rel_path).with_suffix('.json')
+            assert index[rel_path] == report['files'][rel_path]['sha256'] == content_hash(read_mtf(mtf_file))
+            assert hashlib.sha256(json_file.read_bytes()).hexdigest() == index[rel_path]
+        for line in (tmp / 'bundle.jsonl').read_text().splitlines():
+            record = json.loads(line)
+            assert record['sha256'] == index[record['path']] == content_hash(record['mech'])
+
+        assert convert_dir(tmp / 'mtf', tmp / 'json', embed_hash=True) == 0
+        for mtf_file in mtf_files:
+            rel_path = mtf_file.relative_to(tmp / 'mtf').as_posix()
+            data = json.loads((tmp / 'json' / Path(rel_path).with_suffix('.json')).read_text())
+            assert data[metadata_key]['sha256'] == index[rel_path]
+
+
+def test_merge_indexes() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 20, seed=6)
+        convert_dir(tmp / 'mtf', tmp / 'json', index=tmp / 'index.json')
+        for i in (1, 2):
+            convert_dir(tmp / 'mtf', tmp / 'json', shard=(i, 2), index=tmp / f"index_{i}.json")
+        assert merge_indexes([tmp / 'index_2.json', tmp / 'index_1.json']) == json.loads((tmp / 'index.json').read_text())
+        with pytest.raises(ValueError):
+            merge_indexes([tmp / 'index_1.json', tmp / 'index.json'])
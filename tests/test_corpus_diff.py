@@ -0,0 +1,91 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.batch import convert_dir
+from mtf2json.corpus_diff import diff_mechs, diff_corpora, format_diff
+
+
+atlas = Path('tests/mtf/biped/Atlas_AS7-K.mtf')
+
+
+def test_diff_mechs() -> None:
+    old = read_mtf(atlas)
+    assert diff_mechs(old, old) == {}
+    new = json.loads(json.dumps(old))
+    new['mass'] = 95
+    new['armor']['left_arm']['pips'] = 30
+    new['armor']['center_torso']['rear']['pips'] += 2
+    new['critical_slots']['left_arm']['9'] = None
+    new['quirks'].remove('distracting')
+    # move a weapon to another slot (no change) and add one
+    slots = new['weapons']
+    slots['7'] = slots.pop('1')
+    slots['8'] = {'ISMediumLaser': {'location': 'left_arm', 'facing': 'front', 'quantity': 2}}
+    changes = diff_mechs(old, new)
+    assert changes == {
+        'weapons': {'added': [{'name': 'ISMediumLaser', 'location': 'left_arm', 'facing': 'front', 'quantity': 2}],
+                    'removed': []},
+        'armor': {'center_torso.rear': {'old': 14, 'new': 16, 'delta': 2},
+                  'left_arm': {'old': 34, 'new': 30, 'delta': -4}},
+        'critical_slots': {'left_arm': {'9': {'old': 'ISAntiMissileSystem', 'new': None}}},
+        'quirks': {'added': [], 'removed': ['distracting']},
+        'values': {'mass': {'old': 100, 'new': 95}}
+    }
+
+    # changed ammo of an existing weapon
+    new = json.loads(json.dumps(old))
+    new['weapons']['1']['ISGaussRifle']['ammo'] = 21
+    assert diff_mechs(old, new) == {
+        'ammo': [{'name': 'ISGaussRifle', 'location': 'right_torso', 'facing': 'front', 'old': 16, 'new': 21, 'delta': 5}]
+    }
+
+
+@pytest.mark.parametrize('threads, processes', [(1, 0), (3, 0), (1, 2)])
+def test_diff_corpora(threads: int, processes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old, new = Path(tmpdir) / 'old', Path(tmpdir) / 'new'
+        shutil.copytree('tests/mtf/biped', old)
+        shutil.copytree('tests/mtf/biped', new)
+        # changed, equivalent (only an empty line added), removed, added and invalid files
+        text = atlas.read_text()
+        (new / atlas.name).write_text(text.replace('LA Armor:34', 'LA Armor:30').replace('role:Sniper', 'role:Juggernaut'))
+        (new / 'Amarok_3.mtf').write_text('\n' + (old / 'Amarok_3.mtf').read_text())
+        (new / 'Zeus_X_ZEU-X.mtf').unlink()
+        (new / 'new').mkdir()
+        shutil.copy(atlas, new / 'new' / 'Copy.mtf')
+        (new / 'UrbanMech_UM-R96.mtf').write_text('chassis:Invalid\n')
+
+        report = diff_corpora(old, new, threads, processes)
+        num_files = len(list(old.glob('*.mtf'))) + 1
+        assert report['num_files'] == num_files
+        assert (report['num_changed'], report['num_equivalent'], report['num_added'], report['num_removed'],
+                report['num_failed']) == (1, 1, 1, 1, 1)
+        assert report['num_identical'] == num_files - 5
+        assert report['changed'] == {atlas.name: {'name': 'Atlas AS7-K', 'changes': {
+            'armor': {'left_arm': {'old': 34, 'new': 30, 'delta': -4}},
+            'values': {'role': {'old': 'Sniper', 'new': 'Juggernaut'}}
+        }}}
+        assert report['added'] == {'new/Copy.mtf': 'Atlas AS7-K'}
+        assert report['removed'] == {'Zeus_X_ZEU-X.mtf': 'Zeus-X ZEU-X'}
+        assert list(report['failed']) == ['UrbanMech_UM-R96.mtf']
+        lines = list(format_diff(report))
+        assert lines[:3] == [f"changed: {atlas.name} (Atlas AS7-K)", "  armor.left_arm: -4 (34 -> 30)", "  role: 'Sniper' -> 'Juggernaut'"]
+
+
+def test_diff_bundles() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        shutil.copytree('tests/mtf/biped', tmp / 'mtf')
+        convert_dir(tmp / 'mtf', tmp / 'json_old', bundle=tmp / 'old.jsonl')
+        text = atlas.read_text()
+        (tmp / 'mtf' / atlas.name).write_text(text.replace('HD Armor:9', 'HD Armor:8'))
+        convert_dir(tmp / 'mtf', tmp / 'json_new', bundle=tmp / 'new.jsonl')
+        report = diff_corpora(tmp / 'old.jsonl', tmp / 'new.jsonl')
+        assert report['num_changed'] == 1
+        assert report['num_identical'] == report['num_files'] - 1
+        assert report['changed'][atlas.name]['changes'] == {'armor': {'head': {'old': 9, 'new': 8, 'delta': -1}}}
+        with pytest.raises(ValueError):
+            diff_corpora(tmp / 'mtf', tmp / 'new.jsonl')
@@ -0,0 +1,99 @@
+import csv
+import io
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Any, Dict
+import pytest
+from mtf2json.mtf2json import read_mtf, chassis_layouts
+from mtf2json.batch import convert_dir
+from mtf2json import corpus_stats
+from mtf2json.corpus_stats import load_columns, compute_stats, iter_mtf_dir, iter_json_dir, iter_bundle, write_csv
+from benchmarks.synth import write_dir
+
+
+def reference_stats(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the statistics of a single mech directly from its JSON data.
+    """
+    armor_total = armor_max = 0
+    for location, section in data['armor'].items():
+        if isinstance(section, dict) and location in data['structure']:
+            armor_total += section['pips'] if 'pips' in section else section['front']['pips'] + section['rear']['pips']
+            armor_max += (3 if location == 'head' else 2) * data['structure'][location]['pips']
+    weapons = sum(w['quantity'] for slot in data['weapons'].values() for w in slot.values())
+    dissipation = 2 if 'Double' in data['heat_sinks']['type'] else 1
+    return {'armor_total': armor_total, 'armor_max': armor_max, 'run_mp': data['run_mp'],
+            'heat_capacity': data['heat_sinks']['quantity'] * dissipation, 'weapons_total': weapons}
+
+
+def test_fixtures() -> None:
+    mechs = list(iter_mtf_dir(Path('tests/mtf')))
+    stats = compute_stats(load_columns(mechs))
+    assert len(stats['mass']) == len(mechs)
+    for i, (_, data) in enumerate(mechs):
+        for key, value in reference_stats(data).items():
+            assert stats[key][i] == value, (data['chassis'], key)
+    atlas = next(i for i, (path, _) in enumerate(mechs) if path == 'biped/Atlas_AS7-K.mtf')
+    # 304 of 307 pips, 2 ER large lasers in the arms
+    assert stats['armor_coverage'][atlas] == pytest.approx(304 / 307)
+    assert stats['weapons_left_arm'][atlas] == 2 and stats['weapons_center_torso'][atlas] == 2
+
+
+def test_superheavy() -> None:
+    """
+    Superheavy mechs (> 100 tons) have 4 head structure pips, i.e. up to 12 head armor pips.
+    """
+    data = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+    data['mass'] = 150
+    layout = chassis_layouts['Biped']
+    for location, pips in zip(layout.locations, layout.structure_pips[150 // 5] or ()):
+        data['structure'][location]['pips'] = pips
+    data['armor']['head']['pips'] = 12
+    stats = compute_stats(load_columns([('superheavy.mtf', data)]))
+    for key, value in reference_stats(data).items():
+        assert stats[key][0] == value, key
+    # 4 * 3 head pips + 2 * the other structure pips
+    assert stats['armor_max'][0] == 12 + 2 * (45 + 2 * 32 + 2 * 25 + 2 * 32)
+
+
+def test_sources() -> None:
+    """
+    MTF directories, JSON directories and bundles result in the same CSV.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        write_dir(tmp / 'mtf', 30, seed=8)
+        assert convert_dir(tmp / 'mtf', tmp / 'json', bundle=tmp / 'bundle.jsonl') == 0
+        outputs = []
+        for mechs in [iter_mtf_dir(tmp / 'mtf'), iter_json_dir(tmp / 'json'), iter_bundle(tmp / 'bundle.jsonl')]:
+            out = io.StringIO()
+            write_csv(load_columns(mechs), out)
+            # strip the path column (suffixes differ)
+            outputs.append([row[1:] for row in csv.reader(io.StringIO(out.getvalue()))])
+        assert len(outputs[0]) == 31
+        assert outputs[0] == outputs[1]
+        assert sorted(outputs[0]) == sorted(outputs[2])
+
+
+def test_backends(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    NumPy and the stdlib fallback compute the same statistics.
+    """
+    numpy = pytest.importorskip('numpy')
+    columns = load_columns(iter_mtf_dir(Path('tests/mtf')))
+    vectorized = compute_stats(columns)
+    assert isinstance(vectorized['armor_total'], numpy.ndarray)
+    monkeypatch.setattr(corpus_stats, 'numpy', None)
+    fallback = compute_stats(columns)
+    assert isinstance(fallback['armor_total'], array)
+    for key, values in fallback.items():
+        assert list(values) == pytest.approx(vectorized[key].tolist())
+
+
+def test_empty() -> None:
+    stats = compute_stats(load_columns([]))
+    assert all(len(v) == 0 for v in stats.values())
+    out = io.StringIO()
+    write_csv(load_columns([]), out)
+    assert out.getvalue().startswith('path,chassis,model,config,mass,')
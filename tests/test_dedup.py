@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List
+import pytest
+from mtf2json.batch import convert_dir
+from mtf2json.bundle import BundleReader
+from mtf2json.shard import merge_reports
+from benchmarks.synth import write_dir
+
+
+def mirror(mtf_dir: Path, mtf_files: List[Path]) -> List[Path]:
+    """
+    Copy every 3rd file to a mirror folder (and a few of them twice).
+    """
+    copies = []
+    for i, mtf_file in enumerate(mtf_files[::3]):
+        copy = mtf_dir / 'mirror' / mtf_file.relative_to(mtf_dir)
+        copy.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(mtf_file, copy)
+        copies.append(copy)
+        if i % 4 == 0:
+            copies.append(Path(shutil.copyfile(mtf_file, copy.with_name('Copy_' + copy.name))))
+    return copies
+
+
+@pytest.mark.parametrize('mode, threads', [('hardlink', 1), ('hardlink', 4), ('reflink', 2), ('copy', 3)])
+def test_dedup(mode: str, threads: int) -> None:
+    """
+    Duplicates are parsed once, the outputs are identical to those of a run without deduplication.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_dir = tmp / 'mtf'
+        mtf_files = write_dir(mtf_dir, 60, seed=21)
+        copies = mirror(mtf_dir, mtf_files)
+        assert convert_dir(mtf_dir, tmp / 'reference', embed_hash=True, bundle=tmp / 'reference.jsonl') == 0
+        assert convert_dir(mtf_dir, tmp / 'json', threads=threads, embed_hash=True, bundle=tmp / 'bundle.jsonl',
+                           report=tmp / 'report.json', dedup=mode) == 0
+        json_files = sorted(p.relative_to(tmp / 'reference') for p in (tmp / 'reference').rglob('*.json'))
+        assert sorted(p.relative_to(tmp / 'json') for p in (tmp / 'json').rglob('*.json')) == json_files
+        for json_file in json_files:
+            assert (tmp / 'json' / json_file).read_bytes() == (tmp / 'reference' / json_file).read_bytes()
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_duplicates'] == len(copies)
+        assert report['dedup_ratio'] == round(len(json_files) / len(mtf_files), 3)
+        copy = copies[0].relative_to(mtf_dir)
+        original = mtf_files[0].relative_to(mtf_dir)
+        assert report['files'][copy.as_posix()]['duplicate_of'] == original.as_posix()
+        assert report['files'][copy.as_posix()]['sha256'] == report['files'][original.as_posix()]['sha256']
+        linked = os.path.samefile(tmp / 'json' / copy.with_suffix('.json'), tmp / 'json' / original.with_suffix('.json'))
+        assert linked == (mode == 'hardlink')
+        with BundleReader(tmp / 'bundle.jsonl') as bundle, BundleReader(tmp / 'reference.jsonl') as reference:
+            assert sorted(bundle) == sorted(reference)
+            for rel_path in reference:
+                assert bundle.record(rel_path) == reference.record(rel_path)
+        assert not list((tmp / 'json').rglob('.*.tmp'))
+
+
+def test_dedup_rerun() -> None:
+    """
+    Unchanged duplicates are skipped, changing a file with hardlinked duplicates
+    doesn't change the duplicates (also without deduplication).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_dir = tmp / 'mtf'
+        mtf_files = write_dir(mtf_dir, 12, seed=22)
+        copies = mirror(mtf_dir, mtf_files)
+        assert convert_dir(mtf_dir, tmp / 'json', dedup='hardlink') == 0
+        assert convert_dir(mtf_dir, tmp / 'json', skip_unchanged=True, report=tmp / 'report.json', dedup='hardlink') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_skipped'] == report['num_files'] == len(mtf_files) + len(copies)
+        copy_json = tmp / 'json' / copies[0].relative_to(mtf_dir).with_suffix('.json')
+        content = copy_json.read_bytes()
+        mtf_files[0].write_bytes(mtf_files[0].read_bytes().replace(b'\r\nmodel:', b'\r\nmodel:X', 1))
+        for skip_unchanged in (False, True):
+            assert convert_dir(mtf_dir, tmp / 'json', skip_unchanged=skip_unchanged) == 0
+            assert copy_json.read_bytes() == content
+            assert b'"model": "X' in (tmp / 'json' / mtf_files[0].relative_to(mtf_dir).with_suffix('.json')).read_bytes()
+            mtf_files[0].write_bytes(mtf_files[0].read_bytes().replace(b'\r\nmodel:X', b'\r\nmodel:XY', 1))
+        # the changed file is no duplicate anymore (its two copies are duplicates of each other)
+        assert convert_dir(mtf_dir, tmp / 'json', report=tmp / 'report.json', dedup='hardlink') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_duplicates'] == len(copies) - 1
+
+
+def test_dedup_errors(capsys: pytest.CaptureFixture) -> None:
+    """
+    The duplicates of an invalid file fail with the same error, sharded reports are merged.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_dir = tmp / 'mtf'
+        write_dir(mtf_dir, 8, seed=23)
+        for name in ('Invalid.mtf', 'Invalid_Copy.mtf'):
+            (mtf_dir / name).write_text("chassis:Invalid\n")
+        assert convert_dir(mtf_dir, tmp / 'json', ignore_errors=True, report=tmp / 'report.json', dedup='copy') == 1
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_success'] == 8 and report['num_duplicates'] == 1
+        assert report['files']['Invalid_Copy.mtf']['status'] == 'failed'
+        assert report['files']['Invalid_Copy.mtf']['error'] == report['files']['Invalid.mtf']['error']
+        assert "> Deduplicated 1 files (dedup ratio 1.111)." in capsys.readouterr().out
+        for i in (1, 2):
+            convert_dir(mtf_dir, tmp / 'json', ignore_errors=True, shard=(i, 2), report=tmp / f"{i}.json", dedup='copy')
+        merged = merge_reports([tmp / '1.json', tmp / '2.json'])
+        assert merged['num_files'] == 10
+        assert merged['num_duplicates'] == sum(json.loads((tmp / f"{i}.json").read_text())['num_duplicates'] for i in (1, 2))
+        with pytest.raises(ValueError):
+            convert_dir(mtf_dir, tmp / 'json', dedup='symlink')
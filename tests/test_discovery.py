@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+import pytest
+from mtf2json.discovery import discover, load_manifest
+from mtf2json.batch import convert_dir
+from benchmarks.synth import write_dir
+
+
+def walk(root: Path) -> List[str]:
+    """
+    The MTF files found by 'os.walk()'.
+    """
+    return sorted(Path(r, f).relative_to(root).as_posix() for r, _, files in os.walk(root) for f in files if f.endswith('.mtf'))
+
+
+def set_mtimes(root: Path, mtime: float) -> None:
+    for r, dirs, _ in os.walk(root):
+        for d in dirs:
+            os.utime(Path(r, d), (mtime, mtime))
+    os.utime(root, (mtime, mtime))
+
+
+@pytest.mark.parametrize('walkers', [1, 4])
+def test_discover(walkers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        write_dir(root, 200, seed=3)
+        (root / 'notes.txt').write_text('')
+        (root / 'unofficial').mkdir()
+        (root / 'unofficial' / 'Test.mtf').write_text('')
+        files = list(discover(root, walkers=walkers))
+        assert sorted(files) == walk(root)
+        if walkers == 1:
+            # depth first, sorted
+            assert files == sorted(files, key=lambda p: p.split('/'))
+        assert sorted(discover(root, exclude=['unofficial'], walkers=walkers)) == [f for f in walk(root) if 'unofficial' not in f]
+        assert list(discover(root, include=['*.txt'], walkers=walkers)) == ['notes.txt']
+        assert list(discover(root, include=['unofficial/*'], walkers=walkers)) == ['unofficial/Test.mtf']
+        assert list(discover(root, recursive=False, walkers=walkers)) == []
+        assert list(discover(root / 'unofficial', recursive=False, walkers=walkers)) == ['Test.mtf']
+
+
+def test_discover_manifest() -> None:
+    """
+    Unchanged directories are taken from the manifest, changed directories are listed again.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'mtf'
+        manifest = Path(tmpdir) / 'manifest.json'
+        write_dir(root, 50, seed=3)
+        # recently modified directories aren't stored
+        files = list(discover(root, manifest=manifest))
+        assert all(listing[0] is None for listing in load_manifest(manifest, root).values())
+        set_mtimes(root, time.time() - 60)
+        assert list(discover(root, manifest=manifest)) == files
+        listings = load_manifest(manifest, root)
+        assert all(listing[0] is not None for listing in listings.values())
+        # manipulate the manifest of an unchanged directory -> it's used
+        rel_dir = files[0].rsplit('/', 1)[0]
+        listings[rel_dir][1].append('Phantom.mtf')
+        manifest.write_text(json.dumps({'root': str(root), 'dirs': listings}))
+        assert f"{rel_dir}/Phantom.mtf" in discover(root, manifest=manifest)
+        # a new file changes the mtime of its directory
+        (root / rel_dir / 'New.mtf').write_text('')
+        found = list(discover(root, manifest=manifest))
+        assert f"{rel_dir}/New.mtf" in found and f"{rel_dir}/Phantom.mtf" not in found
+        # the manifest of another root isn't used
+        assert load_manifest(manifest, Path(tmpdir)) == {}
+
+
+def test_convert_dir_discovery() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 40, seed=3)
+        excluded = mtf_files[0].parent.name
+        assert convert_dir(tmp / 'mtf', tmp / 'json', exclude=[excluded], walkers=3, manifest=tmp / 'manifest.json') == 0
+        json_files = sorted(p.relative_to(tmp / 'json').with_suffix('.mtf').as_posix() for p in (tmp / 'json').rglob('*.json'))
+        assert json_files == [f for f in walk(tmp / 'mtf') if not f.startswith(excluded + '/')]
+        assert (tmp / 'manifest.json').exists()
@@ -0,0 +1,95 @@
+import json
+import pickle
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.batch import convert_dir
+from mtf2json import disk_cache
+from mtf2json.disk_cache import ParseCache, open_cache
+from benchmarks.synth import write_dir
+
+
+mtf_files = sorted(Path('tests/mtf').rglob('*.mtf'))
+
+
+def test_parse_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ParseCache(Path(tmpdir) / 'cache' / 'cache.sqlite')
+        for _ in range(2):
+            for mtf_file in mtf_files:
+                # same data and key order
+                assert json.dumps(read_mtf(mtf_file, cache)) == json.dumps(read_mtf(mtf_file))
+        assert (cache.hits, cache.misses) == (len(mtf_files), len(mtf_files))
+        stats = cache.stats()
+        assert stats['entries'] == stats['current_entries'] == len(mtf_files)
+        assert stats['size'] > 0
+        # the returned data can be modified
+        read_mtf(mtf_files[0], cache)['mass'] = 0
+        assert read_mtf(mtf_files[0], cache) == read_mtf(mtf_files[0])
+        assert cache.get(b'chassis:Unknown\n') is None
+        cache.clear()
+        assert cache.stats()['entries'] == 0
+
+
+def test_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Entries of other converter versions or output revisions are ignored and removed by 'prune()'.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ParseCache(Path(tmpdir) / 'cache.sqlite')
+        data = mtf_files[0].read_bytes()
+        cache.read_mtf_bytes(data)
+        monkeypatch.setattr(disk_cache, 'version', '0.0.0')
+        assert cache.get(data) is None
+        cache.read_mtf_bytes(data)
+        assert cache.stats()['entries'] == 2
+        assert cache.prune() == 1
+        assert cache.stats()['entries'] == cache.stats()['current_entries'] == 1
+        # same version, changed output
+        monkeypatch.setattr(disk_cache, 'output_revision', disk_cache.output_revision + 1)
+        assert cache.get(data) is None
+        assert cache.read_mtf_bytes(data) == read_mtf(mtf_files[0])
+        assert cache.prune() == 1
+
+
+def test_prune() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ParseCache(Path(tmpdir) / 'cache.sqlite', max_size=20000)
+        for mtf_file in mtf_files:
+            read_mtf(mtf_file, cache)
+        # pruned while adding
+        assert 0 < cache.stats()['size'] <= 20000
+        assert cache.prune(10000) > 0
+        assert cache.stats()['size'] <= 10000
+        entries = cache.stats()['entries']
+        assert cache.prune(0) == entries
+        assert cache.stats()['entries'] == 0
+
+
+def test_open_cache() -> None:
+    """
+    Caches are opened once per process (also when unpickled).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = open_cache(Path(tmpdir) / 'cache.sqlite')
+        assert open_cache(Path(tmpdir) / 'cache.sqlite') is cache
+        assert pickle.loads(pickle.dumps(cache)) is cache
+
+
+@pytest.mark.parametrize('threads, processes', [(3, 0), (1, 2)])
+def test_convert_dir_cache(threads: int, processes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf = write_dir(tmp / 'mtf', 40, seed=5)
+        cache = ParseCache(tmp / 'cache.sqlite')
+        assert convert_dir(tmp / 'mtf', tmp / 'json', threads=threads, processes=processes, cache=cache) == 0
+        assert cache.stats()['entries'] == 40
+        # the workers use the cached data
+        cache.put(mtf[0].read_bytes(), {'chassis': 'Cached'})
+        assert convert_dir(tmp / 'mtf', tmp / 'json2', threads=threads, processes=processes, cache=cache) == 0
+        json_file = Path(mtf[0].relative_to(tmp / 'mtf')).with_suffix('.json')
+        assert json.loads((tmp / 'json2' / json_file).read_text()) == {'chassis': 'Cached'}
+        for mtf_file in mtf[1:]:
+            json_file = Path(mtf_file.relative_to(tmp / 'mtf')).with_suffix('.json')
+            assert (tmp / 'json2' / json_file).read_bytes() == (tmp / 'json' / json_file).read_bytes()
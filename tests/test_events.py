@@ -0,0 +1,113 @@
+import io
+from collections import Counter
+from pathlib import Path
+from typing import List
+import pytest
+from mtf2json.mtf2json import (read_mtf, iter_mtf_events, parse_mtf_events, MTFEvent, KeyValue, SectionStart,
+                               WeaponSlot, CritSlot, ArmorPips, FluffEntry, ConversionError)
+from benchmarks.synth import iter_corpus
+
+
+mtf_folder = Path(__file__).parent / 'mtf/biped'
+
+
+def test_atlas_events() -> None:
+    """
+    Checks the events of the Atlas AS7-K.
+    """
+    events = list(iter_mtf_events(mtf_folder / 'Atlas_AS7-K.mtf'))
+    assert KeyValue('mass', '100') in events
+    assert SectionStart('weapons') in events
+    assert WeaponSlot('ISMediumPulseLaser', 'center_torso', 'rear', 2, None) in events
+    assert WeaponSlot('ISGaussRifle', 'right_torso', 'front', 1, 16) in events
+    assert ArmorPips('center_torso', 'rear', 14, None) in events
+    assert ArmorPips('head', None, 9, None) in events
+    assert CritSlot('left_arm', 1, 'Shoulder') in events
+    assert CritSlot('left_arm', 12, None) in events
+    assert any(isinstance(e, FluffEntry) and e.key == 'overview' for e in events)
+    # crit slots follow their section start
+    index = events.index(SectionStart('head'))
+    assert events[index + 1] == CritSlot('head', 1, 'Life Support')
+
+
+def test_aggregation() -> None:
+    """
+    Aggregates weapons and armor over all examples and compares the result with 'read_mtf()'.
+    """
+    for mtf_file in sorted(mtf_folder.glob('*.mtf')):
+        weapons: Counter = Counter()
+        armor = 0
+
+        def handler(event: MTFEvent) -> None:
+            nonlocal armor
+            if isinstance(event, WeaponSlot):
+                weapons[event.name] += event.quantity
+            elif isinstance(event, ArmorPips):
+                armor += event.pips
+
+        parse_mtf_events(mtf_file, handler)
+        data = read_mtf(mtf_file)
+        expected: Counter = Counter()
+        for slot in data['weapons'].values():
+            for name, details in slot.items():
+                expected[name] += details['quantity']
+        assert weapons == expected
+        expected_armor = 0
+        for location in data['armor'].values():
+            if isinstance(location, dict):
+                expected_armor += location.get('pips', 0)
+                expected_armor += sum(side['pips'] for key, side in location.items() if key in ['front', 'rear'])
+        assert armor == expected_armor
+
+
+def test_sources() -> None:
+    """
+    Bytes and text streams produce the same events as a file path
+    (including the CP-1252 characters of the Dragon Fire).
+    """
+    for name in ['Dragon_Fire_DGR-3F.mtf', 'Atlas_AS7-K.mtf']:
+        path = mtf_folder / name
+        events: List[MTFEvent] = list(iter_mtf_events(path))
+        assert list(iter_mtf_events(path.read_bytes())) == events
+        assert list(iter_mtf_events(str(path))) == events
+        with open(path, 'r', encoding='utf8', errors='mixed') as f:
+            assert list(iter_mtf_events(io.StringIO(f.read()))) == events
+
+
+def text_events(data: bytes) -> List[MTFEvent]:
+    """
+    The events of the text tokenizer.
+    """
+    return list(iter_mtf_events(io.StringIO(data.decode('utf8', errors='mixed'), newline=None)))
+
+
+def test_bytes_tokenizer() -> None:
+    """
+    The bytes tokenizer yields the same events as the text tokenizer.
+    """
+    mtf_files = sorted((mtf_folder.parent).rglob('*.mtf'))
+    corpus = [path.read_bytes() for path in mtf_files] + [content for _, content in iter_corpus(200, seed=7)]
+    for data in corpus:
+        assert list(iter_mtf_events(data)) == text_events(data)
+
+
+def test_bytes_tokenizer_edge_cases() -> None:
+    """
+    Line breaks, whitespace and encodings that differ between bytes and text.
+    """
+    data = (mtf_folder / 'Atlas_AS7-K.mtf').read_bytes()
+    lines = data.splitlines()
+    edge_cases = [
+        b'\r\n'.join(lines),
+        b'\r'.join(lines),
+        # whitespace only removed by 'str.strip()'
+        b'\n'.join(line + b'\x1c\x1f' for line in lines),
+        b'\n'.join(line + b'\xc2\xa0' for line in lines),
+        # CP-1252, UTF-8 and a BOM
+        b'\xef\xbb\xbf' + b'\n'.join(lines).replace(b'Atlas', b'Atl\xe4s').replace(b'Shoulder', b'Sh\xc3\xb6ulder'),
+        b'\n'.join(lines).replace(b'Mass:', b'# comment\n  \n  Mass  :'),
+    ]
+    for case in edge_cases:
+        assert list(iter_mtf_events(case)) == text_events(case)
+    with pytest.raises(ConversionError):
+        list(iter_mtf_events(data.replace(b'Config:', b'Konfig:')))
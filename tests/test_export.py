@@ -0,0 +1,47 @@
+import csv
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+from mtf2json.mtf2json import read_mtf
+from mtf2json.corpus_stats import iter_mtf_dir
+from mtf2json.export import export_columnar, tables
+
+
+def read_table(path: Path) -> List[Dict[str, str]]:
+    with open(path, 'r', encoding='utf8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_export_columnar() -> None:
+    """
+    Exports the fixtures (with a tiny chunk size) and checks that the tables
+    reference the mechs by 'mech_id' and contain all nested values.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out_dir = Path(tmpdir) / 'columnar'
+        mechs = list(iter_mtf_dir(Path('tests/mtf')))
+        assert export_columnar(mechs, out_dir, chunk_size=3) == len(mechs)
+        data = {table: read_table(out_dir / f"{table}.csv") for table in tables}
+        for table, columns in tables.items():
+            assert list(data[table][0].keys()) == list(columns)
+        assert [int(r['mech_id']) for r in data['mechs']] == list(range(len(mechs)))
+
+        atlas_id = next(r['mech_id'] for r in data['mechs'] if r['path'] == 'biped/Atlas_AS7-K.mtf')
+        atlas = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+        mech = next(r for r in data['mechs'] if r['mech_id'] == atlas_id)
+        assert (mech['chassis'], mech['mass'], mech['mul_id'], mech['heat_sinks']) == ('Atlas', '100', '144', '20')
+
+        def rows(table: str) -> List[Dict[str, str]]:
+            return [r for r in data[table] if r['mech_id'] == atlas_id]
+        assert len(rows('weapons')) == len(atlas['weapons'])
+        assert {'slot': '1', 'name': 'ISGaussRifle', 'location': 'right_torso', 'facing': 'front',
+                'quantity': '1', 'ammo': '16', 'mech_id': atlas_id} in rows('weapons')
+        assert sum(int(r['pips']) for r in rows('armor_locations')) == 304
+        assert {'mech_id': atlas_id, 'location': 'center_torso', 'side': 'rear', 'pips': '14', 'type': ''} in rows('armor_locations')
+        assert len(rows('crit_slots')) == sum(len(s) for s in atlas['critical_slots'].values())
+        assert [r['quirk'] for r in rows('quirks')] == atlas['quirks']
+        fluff = rows('fluff')
+        assert {r['key'] for r in fluff} == set(atlas['fluff'])
+        assert {r['subkey']: r['value'] for r in fluff if r['key'] == 'systemmanufacturer'} == atlas['fluff']['systemmanufacturer']
+        assert [r['value'] for r in fluff if r['key'] == 'manufacturer'] == atlas['fluff']['manufacturer']
+        assert next(r['value'] for r in fluff if r['key'] == 'overview') == atlas['fluff']['overview']
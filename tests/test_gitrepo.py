@@ -0,0 +1,122 @@
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.batch import convert_git
+from mtf2json.gitrepo import GitRepo, GitError
+from mtf2json.shard import merge_reports
+
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason="git is not installed")
+
+
+def git(repo: Path, *args: str) -> str:
+    return subprocess.run(['git', '-C', str(repo), '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def create_repo(path: Path) -> Path:
+    """
+    Create a repository with two commits ('v1' and 'v2') of the biped test files in 'data/mechs'.
+    'v2' modifies the Atlas, adds a file and deletes the Zeus.
+    """
+    mechs = path / 'data' / 'mechs'
+    shutil.copytree('tests/mtf/biped', mechs)
+    (path / 'README').write_text('not a mech\n')
+    git(path, 'init', '-q')
+    git(path, 'add', '.')
+    git(path, 'commit', '-q', '-m', 'v1')
+    git(path, 'tag', 'v1')
+    atlas = mechs / 'Atlas_AS7-K.mtf'
+    atlas.write_text(atlas.read_text().replace('LA Armor:34', 'LA Armor:30'))
+    (mechs / 'sub').mkdir()
+    shutil.copy(mechs / 'Amarok_3.mtf', mechs / 'sub' / 'Amarok_3.mtf')
+    (mechs / 'Zeus_X_ZEU-X.mtf').unlink()
+    git(path, 'add', '-A')
+    git(path, 'commit', '-q', '-m', 'v2')
+    git(path, 'tag', 'v2')
+    return mechs
+
+
+def test_git_repo() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'repo'
+        create_repo(path)
+        with GitRepo(path) as repo:
+            files = repo.ls_tree('v1', 'data/mechs')
+            assert [f.path for f in files] == sorted('data/mechs/' + p.name for p in Path('tests/mtf/biped').glob('*.mtf'))
+            for file in files[:5]:
+                assert repo.read_blob(file.oid) == Path('tests/mtf/biped', Path(file.path).name).read_bytes()
+            assert [f.path for f in repo.ls_tree('v1')] == ['README'] + [f.path for f in files]
+            changes = repo.diff_tree('v1', 'v2')
+            assert [f.path for f in changes.changed] == ['data/mechs/Atlas_AS7-K.mtf', 'data/mechs/sub/Amarok_3.mtf']
+            assert changes.deleted == ['data/mechs/Zeus_X_ZEU-X.mtf']
+            assert repo.resolve('v2') == git(path, 'rev-parse', 'HEAD')
+            with pytest.raises(KeyError):
+                repo.read_blob('0' * 40)
+            # the cat-file process is still usable
+            assert repo.read_blob(files[0].oid)
+            with pytest.raises(GitError):
+                repo.resolve('v3')
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_convert_git(processes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mechs = create_repo(tmp / 'repo')
+        assert convert_git(tmp / 'repo', 'v1', tmp / 'json', 'data/mechs', processes=processes,
+                           report=tmp / 'report.json') == 0
+        mtf_files = list(Path('tests/mtf/biped').glob('*.mtf'))
+        assert len(list((tmp / 'json').rglob('*.json'))) == len(mtf_files)
+        for mtf_file in mtf_files[:5]:
+            assert json.loads((tmp / 'json' / mtf_file.with_suffix('.json').name).read_text()) == read_mtf(mtf_file)
+        assert len(json.loads((tmp / 'report.json').read_text())['files']) == len(mtf_files)
+
+        # only the changed files (the worktree isn't used)
+        shutil.rmtree(mechs)
+        assert convert_git(tmp / 'repo', 'v2', tmp / 'json', 'data/mechs', since='v1', processes=processes,
+                           report=tmp / 'report.json') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert sorted(report['files']) == ['Atlas_AS7-K.mtf', 'sub/Amarok_3.mtf']
+        # the JSON file of the deleted Zeus is removed
+        assert report['deleted'] == ['Zeus_X_ZEU-X.mtf'] and report['num_deleted'] == 1
+        assert not (tmp / 'json' / 'Zeus_X_ZEU-X.json').exists()
+        assert len(list((tmp / 'json').rglob('*.json'))) == len(mtf_files)
+        atlas = json.loads((tmp / 'json' / 'Atlas_AS7-K.json').read_text())
+        assert atlas['armor']['left_arm']['pips'] == 30
+        assert (tmp / 'json' / 'sub' / 'Amarok_3.json').exists()
+        with pytest.raises(GitError):
+            convert_git(tmp / 'repo', 'v3', tmp / 'json')
+
+
+def test_convert_git_dedup() -> None:
+    """
+    'sub/Amarok_3.mtf' is a copy of 'Amarok_3.mtf' in 'v2'.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        create_repo(tmp / 'repo')
+        assert convert_git(tmp / 'repo', 'v2', tmp / 'json', 'data/mechs', report=tmp / 'report.json', dedup='hardlink') == 0
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_duplicates'] == 1
+        assert report['files']['sub/Amarok_3.mtf']['duplicate_of'] == 'Amarok_3.mtf'
+        assert (tmp / 'json' / 'sub' / 'Amarok_3.json').samefile(tmp / 'json' / 'Amarok_3.json')
+
+
+def test_convert_git_since_shards() -> None:
+    """
+    Each shard removes and reports its deleted files, the merged report lists all of them.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        create_repo(tmp / 'repo')
+        for i in (1, 2):
+            assert convert_git(tmp / 'repo', 'v2', tmp / 'json', 'data/mechs', since='v1', shard=(i, 2),
+                               report=tmp / f"report_{i}.json") == 0
+        merged = merge_reports([tmp / 'report_1.json', tmp / 'report_2.json'])
+        assert merged['deleted'] == ['Zeus_X_ZEU-X.mtf'] and merged['num_deleted'] == 1
+        assert sorted(merged['files']) == ['Atlas_AS7-K.mtf', 'sub/Amarok_3.mtf']
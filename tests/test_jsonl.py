@@ -0,0 +1,85 @@
+import io
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, List
+import pytest
+from mtf2json.mtf2json import read_mtf, content_hash
+from mtf2json import batch
+from mtf2json.batch import convert_to_jsonl, iter_file_list
+from benchmarks.synth import write_dir
+
+
+@pytest.mark.parametrize('data', [
+    b'a.mtf\nb c.mtf\n\nd.mtf',
+    b'a.mtf\r\nb c.mtf\r\nd.mtf\r\n',
+    b'a.mtf\0b c.mtf\0\0d.mtf\0',
+])
+def test_iter_file_list(data: bytes) -> None:
+    """
+    Newline and NUL separated lists (read in small chunks) yield the same paths.
+    """
+    assert list(iter_file_list(io.BytesIO(data), chunk_size=3)) == [Path('a.mtf'), Path('b c.mtf'), Path('d.mtf')]
+
+
+def test_iter_file_list_nul_with_newlines() -> None:
+    assert list(iter_file_list(io.BytesIO(b'a.mtf\0b\nc.mtf\0'))) == [Path('a.mtf'), Path('b\nc.mtf')]
+    assert list(iter_file_list(io.BytesIO(b''))) == []
+
+
+@pytest.mark.parametrize('threads, processes', [(1, 0), (4, 0), (1, 2)])
+def test_convert_to_jsonl(threads: int, processes: int) -> None:
+    """
+    One line per file in input order, also with parallel parsers and small buffers.
+    Failed files result in error objects instead of stopping the conversion.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 60, seed=4)
+        (tmp / 'Invalid.mtf').write_text("chassis:Invalid\n")
+        files = mtf_files[:30] + [tmp / 'Invalid.mtf', tmp / 'Missing.mtf'] + mtf_files[30:]
+        out = io.BytesIO()
+        assert convert_to_jsonl(iter(files), out, queue_depth=2, threads=threads, processes=processes,
+                                buffer_size=1000) == 1
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r['path'] for r in records] == [f.as_posix() for f in files]
+        for mtf_file, record in zip(files[:30], records):
+            assert record['mech'] == read_mtf(mtf_file)
+            assert record['sha256'] == content_hash(record['mech'])
+        assert 'error' in records[30] and 'mech' not in records[30]
+        assert 'error' in records[31] and 'mech' not in records[31]
+
+        out = io.BytesIO()
+        assert convert_to_jsonl(mtf_files, out, threads=threads, processes=processes) == 0
+        assert len(out.getvalue().splitlines()) == 60
+
+
+def test_convert_to_jsonl_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    A slow file doesn't let the other parsers run ahead without limit
+    (the finished records wait for it in memory).
+    """
+    convert_bytes = getattr(batch, '__convert_bytes')
+    read: List[Path] = []
+    pulled_while_slow: List[int] = []
+
+    def slow_convert(data: bytes, rel_path: str, output: Any) -> Any:
+        if rel_path == read[0].as_posix() and not pulled_while_slow:
+            time.sleep(0.5)
+            pulled_while_slow.append(len(read))
+        return convert_bytes(data, rel_path, output)
+
+    def files(mtf_files: List[Path]) -> Iterator[Path]:
+        for mtf_file in mtf_files:
+            read.append(mtf_file)
+            yield mtf_file
+
+    monkeypatch.setattr(batch, '__convert_bytes', slow_convert)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        mtf_files = write_dir(Path(tmpdir), 10, seed=5) * 20
+        out = io.BytesIO()
+        assert convert_to_jsonl(files(mtf_files), out, queue_depth=2, threads=4) == 0
+        assert len(out.getvalue().splitlines()) == 200
+        # window of 2 * (4 + 2) jobs (+ 1 file pulled by the blocked reader)
+        assert pulled_while_slow[0] <= 13
@@ -0,0 +1,121 @@
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.mech_index import WeaponMount, build_index
+from mtf2json.shared_corpus import SharedCorpus, write_corpus
+from benchmarks.synth import iter_corpus
+from mtf2json import read_mtf_bytes
+
+
+def load_mechs() -> Dict[str, Dict[str, Any]]:
+    mechs = {p.as_posix(): read_mtf(p) for p in sorted(Path('tests/mtf').rglob('*.mtf'))}
+    mechs.update((path, read_mtf_bytes(content)) for path, content in iter_corpus(300, seed=13))
+    return mechs
+
+
+def weapons(data: Dict[str, Any]) -> List[str]:
+    """
+    Weapons and critical slot items.
+    """
+    items = [item.replace(' (R)', '') for slots in data.get('critical_slots', {}).values() for item in slots.values() if item]
+    return [name for slot in data.get('weapons', {}).values() for name in slot] + items
+
+
+def scan(mechs: Dict[str, Dict[str, Any]], condition: Callable[[Dict[str, Any]], bool]) -> List[str]:
+    return sorted(key for key, data in mechs.items() if condition(data))
+
+
+def test_query() -> None:
+    """
+    The query results match a scan over all mechs.
+    """
+    mechs = load_mechs()
+    index = build_index(mechs.items())
+    assert len(index) == len(mechs)
+    assert index.query() == sorted(mechs)
+    assert index.query(equipment=['ISGaussRifle']) == scan(mechs, lambda d: 'ISGaussRifle' in weapons(d))
+    assert index.query(equipment=['ISGaussRifle', 'ISLRM20'], ranges={'mass': (80, None)}) == \
+        scan(mechs, lambda d: {'ISGaussRifle', 'ISLRM20'} <= set(weapons(d)) and d['mass'] >= 80)
+    assert index.query(quirks=['command_mech']) == scan(mechs, lambda d: 'command_mech' in d.get('quirks', []))
+    assert index.query(quirks=['command_mech', 'imp_com'], attributes={'techbase': 'Inner Sphere'},
+                       ranges={'mass': (70, 100), 'era': (None, 3060)}) == \
+        scan(mechs, lambda d: {'command_mech', 'imp_com'} <= set(d.get('quirks', [])) and d['techbase'] == 'Inner Sphere'
+             and 70 <= d['mass'] <= 100 and d['era'] <= 3060)
+    assert index.query(attributes={'rules_level_str': 'Standard'}, ranges={'mass': (20, 35)}) == \
+        scan(mechs, lambda d: d['rules_level_str'] == 'Standard' and 20 <= d['mass'] <= 35)
+    assert index.query(equipment=['Unknown']) == []
+    assert index.query(quirks=['unknown']) == []
+    with pytest.raises(ValueError):
+        index.query(attributes={'chassis': 'Atlas'})
+    with pytest.raises(ValueError):
+        index.query(ranges={'armor': (1, 2)})
+
+
+def test_equipment() -> None:
+    mechs = load_mechs()
+    index = build_index(mechs.items())
+    atlas = 'tests/mtf/biped/Atlas_AS7-K.mtf'
+    entry = index.equipment('ISMediumPulseLaser')[atlas]
+    assert entry.mounts == (WeaponMount('center_torso', 'rear', 2),)
+    assert entry.quantity == 2
+    # rear mounted crit slots, e.g. 'ISMediumPulseLaser (R)'
+    assert entry.slots == (('center_torso', 11), ('center_torso', 12))
+    assert index.equipment('ISGauss Ammo')[atlas].slots == (('right_arm', 9), ('right_arm', 10))
+    assert index.equipment('ISGauss Ammo')[atlas].mounts == ()
+    assert index.quirks(atlas) == mechs[atlas]['quirks']
+
+
+def test_add_remove() -> None:
+    mechs = load_mechs()
+    index = build_index(mechs.items())
+    full = {q: index.query(quirks=[q]) for q in index.quirk_vocabulary}
+    removed = sorted(mechs)[::3]
+    for key in removed:
+        index.remove(key)
+    assert len(index) == len(mechs) - len(removed)
+    remaining = {k: v for k, v in mechs.items() if k not in removed}
+    assert index.query(ranges={'mass': (None, 50)}) == scan(remaining, lambda d: d['mass'] <= 50)
+    assert index.query(equipment=['ISGaussRifle']) == scan(remaining, lambda d: 'ISGaussRifle' in weapons(d))
+    with pytest.raises(KeyError):
+        index.remove(removed[0])
+    # add again (reusing ids) and replace existing mechs
+    for key in removed:
+        index.add(key, mechs[key])
+    index.add(removed[0], {**mechs[removed[0]], 'mass': 5})
+    assert index.query(ranges={'mass': (5, 5)}) == [removed[0]]
+    index.add(removed[0], mechs[removed[0]])
+    assert {q: index.query(quirks=[q]) for q in index.quirk_vocabulary} == full
+    assert index.query(ranges={'mass': (None, 50)}) == scan(mechs, lambda d: d['mass'] <= 50)
+    # a failing add doesn't change the index
+    with pytest.raises(KeyError):
+        index.add(removed[0], {'weapons': {'1': {'ISGaussRifle': {}}}})
+    assert removed[0] in index and len(index) == len(mechs)
+
+
+def test_shared_corpus_index() -> None:
+    """
+    The index can be built from the views of a shared corpus.
+    """
+    mechs = load_mechs()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_corpus(mechs.items(), Path(tmpdir) / 'corpus.mtfc')
+        index = build_index(SharedCorpus(Path(tmpdir) / 'corpus.mtfc').items())
+    assert index.query(equipment=['ISERLargeLaser'], quirks=['command_mech']) == \
+        build_index(mechs.items()).query(equipment=['ISERLargeLaser'], quirks=['command_mech'])
+
+
+def test_range_missing_attribute() -> None:
+    """
+    Mechs without a numeric attribute don't match a range of it
+    (also if the range is filtered by lookup instead of intersection).
+    """
+    mechs = {f"mech_{i}": {'mass': 20 + i % 80, 'quirks': ['x'] if i % 2 else [], **({'mul_id': i} if i % 3 else {})}
+             for i in range(300)}
+    index = build_index(mechs.items())
+    # the range covers more mechs than the quirk -> filtered by lookup
+    assert index.query(quirks=['x'], ranges={'mul_id': (0, None)}) == \
+        scan(mechs, lambda d: 'x' in d['quirks'] and 'mul_id' in d)
+    assert index.query(attributes={}, quirks=['x'], ranges={'mass': (None, 60), 'mul_id': (None, 100)}) == \
+        scan(mechs, lambda d: 'x' in d['quirks'] and d['mass'] <= 60 and d.get('mul_id', 101) <= 100)
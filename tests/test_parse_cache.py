@@ -0,0 +1,34 @@
+from pathlib import Path
+from mtf2json.mtf2json import read_mtf, parse_cache_info, clear_parse_cache
+
+
+mtf_folder = Path(__file__).parent / 'mtf/biped'
+
+
+def test_parse_cache_hits() -> None:
+    """
+    Converts all biped examples twice and checks that the second pass is served
+    from the parse caches and produces identical results.
+    """
+    clear_parse_cache()
+    mtf_files = sorted(mtf_folder.glob('*.mtf'))
+    first = [read_mtf(f) for f in mtf_files]
+    stats = parse_cache_info()
+    weapon_misses = stats['weapon_lines']['misses']
+    assert weapon_misses > 0
+    assert stats['weapon_lines']['size'] == weapon_misses
+    second = [read_mtf(f) for f in mtf_files]
+    assert first == second
+    stats = parse_cache_info()
+    # no new weapon lines in the second pass
+    assert stats['weapon_lines']['misses'] == weapon_misses
+    assert stats['weapon_lines']['hits'] >= weapon_misses
+    assert stats['keys']['hits'] > stats['keys']['misses']
+
+
+def test_clear_parse_cache() -> None:
+    read_mtf(mtf_folder / 'Atlas_AS7-K.mtf')
+    clear_parse_cache()
+    for info in parse_cache_info().values():
+        assert info['hits'] == info['misses'] == info['size'] == 0
+        assert info['max_size'] > 0
@@ -0,0 +1,87 @@
+import json
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.batch import convert_dir
+from mtf2json.shard import parse_shard, shard_of, merge_reports, merge_bundles, write_report
+from benchmarks.synth import write_dir
+
+
+def test_parse_shard() -> None:
+    assert parse_shard('2/4') == (2, 4)
+    assert parse_shard('1/1') == (1, 1)
+    for value in ['0/4', '5/4', '1/0', '1', 'a/b', '1/2/3']:
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_shard_of() -> None:
+    """
+    The shard of a path is stable (doesn't depend on the process / hash seed)
+    and the paths are distributed over all shards.
+    """
+    assert shard_of('0000/Atlas_AS7-K_0000000.mtf', 4) == shard_of('0000/Atlas_AS7-K_0000000.mtf', 4)
+    assert shard_of('anything', 1) == 1
+    counts = [0] * 4
+    for n in range(1000):
+        counts[shard_of(f"{n // 100:04d}/Mech_{n:07d}.mtf", 4) - 1] += 1
+    assert all(150 < c < 350 for c in counts)
+
+
+def test_convert_shards() -> None:
+    """
+    Converts a corpus in 3 shards and checks that the merged report and bundle
+    contain every file exactly once and are identical to those of an unsharded run.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_dir = tmp / 'mtf'
+        mtf_files = write_dir(mtf_dir, 90, seed=4)
+        for i in range(1, 4):
+            assert convert_dir(mtf_dir, tmp / 'json', shard=(i, 3),
+                               report=tmp / f"report_{i}.json", bundle=tmp / f"bundle_{i}.jsonl") == 0
+        assert len(list((tmp / 'json').rglob('*.json'))) == 90
+
+        # shards are disjoint
+        shard_files = [set(json.loads((tmp / f"report_{i}.json").read_text())['files']) for i in range(1, 4)]
+        assert sum(len(f) for f in shard_files) == 90
+        assert set.union(*shard_files) == {p.relative_to(mtf_dir).as_posix() for p in mtf_files}
+
+        # merging is independent of the order of the shards
+        merged = merge_reports([tmp / f"report_{i}.json" for i in (3, 1, 2)])
+        assert merged['shards'] == ['1/3', '2/3', '3/3']
+        assert merged['num_files'] == merged['num_success'] == 90
+        assert merge_bundles([tmp / f"bundle_{i}.jsonl" for i in (2, 3, 1)], tmp / 'merged.jsonl') == 90
+
+        # single node run
+        assert convert_dir(mtf_dir, tmp / 'json', report=tmp / 'report.json', bundle=tmp / 'bundle.jsonl') == 0
+        write_report(merged, tmp / 'merged.json')
+        report = json.loads((tmp / 'report.json').read_text())
+        assert json.loads((tmp / 'merged.json').read_text())['files'] == report['files']
+        merge_bundles([tmp / 'bundle.jsonl'], tmp / 'sorted.jsonl')
+        assert (tmp / 'merged.jsonl').read_bytes() == (tmp / 'sorted.jsonl').read_bytes()
+
+        record = json.loads((tmp / 'merged.jsonl').read_text().splitlines()[0])
+        assert record['mech'] == read_mtf(mtf_dir / record['path'])
+
+
+def test_merge_errors() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_dir = tmp / 'mtf'
+        write_dir(mtf_dir, 10, seed=4)
+        convert_dir(mtf_dir, tmp / 'json', shard=(1, 2), report=tmp / 'a.json', bundle=tmp / 'a.jsonl')
+        convert_dir(mtf_dir, tmp / 'json', shard=(1, 3), report=tmp / 'b.json')
+        # same shard twice
+        with pytest.raises(ValueError):
+            merge_reports([tmp / 'a.json', tmp / 'a.json'])
+        with pytest.raises(ValueError):
+            merge_bundles([tmp / 'a.jsonl', tmp / 'a.jsonl'], tmp / 'merged.jsonl')
+        # different partitions
+        with pytest.raises(ValueError):
+            merge_reports([tmp / 'a.json', tmp / 'b.json'])
+        # incomplete partition
+        convert_dir(mtf_dir, tmp / 'json', shard=(2, 3), report=tmp / 'c.json')
+        with pytest.raises(ValueError, match='Shard\\(s\\) 3/3 are missing'):
+            merge_reports([tmp / 'b.json', tmp / 'c.json'])
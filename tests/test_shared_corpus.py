@@ -0,0 +1,101 @@
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf
+from mtf2json.shared_corpus import SharedCorpus, DictView, ListView, write_corpus
+from mtf2json.cli import corpus
+from benchmarks.synth import write_dir
+
+
+def test_shared_corpus() -> None:
+    """
+    The views return the same data as 'read_mtf()' (including the key order).
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        mtf_files = write_dir(tmp / 'mtf', 60, seed=11) + sorted(Path('tests/mtf').rglob('*.mtf'))
+        mechs = {p.name: read_mtf(p) for p in mtf_files}
+        assert write_corpus(mechs.items(), tmp / 'corpus.mtfc') == len(mechs)
+        # identical values are stored once
+        assert (tmp / 'corpus.mtfc').stat().st_size < sum(len(json.dumps(m)) for m in mechs.values())
+        shared = SharedCorpus(tmp / 'corpus.mtfc')
+        assert len(shared) == len(mechs)
+        assert list(shared) == sorted(mechs)
+        for name, data in mechs.items():
+            view = shared.get(name)
+            assert isinstance(view, DictView)
+            assert view == data and data == view
+            assert json.dumps(view.to_dict()) == json.dumps(data)
+            assert list(view) == list(data)
+            assert name in shared
+        view = shared.get(mtf_files[0].name)
+        assert isinstance(view['quirks'], ListView)
+        assert view['quirks'][-1] == view['quirks'].to_list()[-1]
+        assert view['quirks'][:2] == mechs[mtf_files[0].name]['quirks'][:2]
+        assert view.get('missing') is None
+        with pytest.raises(KeyError):
+            shared.get('missing.mtf')
+        assert 'missing.mtf' not in shared
+        assert [p for p, _ in shared.items()] == list(shared)
+
+
+def test_shared_corpus_swap() -> None:
+    """
+    A regenerated corpus is used after 'refresh()', views of the old corpus stay valid.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'corpus.mtfc'
+        atlas = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+        write_corpus([('atlas.mtf', atlas)], path)
+        shared = SharedCorpus(path)
+        old_view = shared.get('atlas.mtf')
+        assert not shared.refresh()
+        write_corpus([('atlas.mtf', {**atlas, 'mass': 1}), ('other.mtf', {'chassis': 'Other'})], path)
+        assert len(shared) == 1
+        assert shared.refresh()
+        assert len(shared) == 2
+        assert shared.get('atlas.mtf')['mass'] == 1
+        assert old_view == atlas
+        assert list(Path(tmpdir).iterdir()) == [path]
+
+
+def test_shared_corpus_processes() -> None:
+    """
+    Another process reads the same corpus file.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'corpus.mtfc'
+        atlas = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+        write_corpus([('atlas.mtf', atlas)], path)
+        code = ("import json, sys; from pathlib import Path; from mtf2json.shared_corpus import SharedCorpus; "
+                "print(json.dumps(SharedCorpus(Path(sys.argv[1])).get('atlas.mtf').to_dict()))")
+        output = subprocess.run([sys.executable, '-c', code, str(path)], check=True, capture_output=True, text=True).stdout
+        assert json.loads(output) == atlas
+
+
+def test_shared_corpus_errors() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'corpus.mtfc'
+        with pytest.raises(ValueError):
+            write_corpus([('a.mtf', {}), ('a.mtf', {})], path)
+        with pytest.raises(ValueError):
+            write_corpus([('a.mtf', {'set': {1}})], path)
+        assert not path.exists()
+        path.write_bytes(b'{"chassis": "Atlas"}' * 4)
+        with pytest.raises(ValueError):
+            SharedCorpus(path)
+        write_corpus([('a.mtf', {'chassis': 'Atlas'})], path)
+        path.write_bytes(path.read_bytes()[:-1])
+        with pytest.raises(ValueError):
+            SharedCorpus(path)
+
+
+def test_corpus_command() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / 'corpus.mtfc'
+        assert corpus(['--mtf-dir', 'tests/mtf', '--output', str(path)]) == 0
+        shared = SharedCorpus(path)
+        assert shared.get('biped/Atlas_AS7-K.mtf') == read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
@@ -0,0 +1,66 @@
+import io
+import tarfile
+import tempfile
+import zipfile
+from pathlib import Path
+from mtf2json.mtf2json import read_mtf
+from mtf2json.validate import validate_mech
+from benchmarks.synth import iter_corpus, memory_corpus, write_dir, write_archive, masses, cp1252_chars
+
+
+def test_reproducible() -> None:
+    """
+    Same seed -> same corpus, different seed -> different corpus.
+    Generating a corpus in parts must yield the same files as generating it at once.
+    """
+    corpus = memory_corpus(50, seed=42)
+    assert corpus == memory_corpus(50, seed=42)
+    assert corpus != memory_corpus(50, seed=43)
+    parts = dict(iter_corpus(25, seed=42))
+    parts.update(iter_corpus(25, seed=42, start=25))
+    assert corpus == parts
+
+
+def test_generated_files_convert() -> None:
+    """
+    Writes a generated corpus to a directory and checks that all files can be converted
+    and that the mutations (mass, patchwork armor, CP-1252 fluff) actually occur.
+    """
+    found_masses = set()
+    patchwork = cp1252 = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = write_dir(Path(tmpdir), 400, seed=7)
+        assert len(files) == 400
+        for mtf_file in files:
+            data = read_mtf(mtf_file)
+            found_masses.add(data['mass'])
+            assert data['structure']['head']['pips'] > 0
+            assert validate_mech(data) == []
+            if data['armor']['type'] == 'Patchwork':
+                patchwork = True
+            if any(c in str(data['fluff']) for c in cp1252_chars):
+                cp1252 = True
+    assert found_masses == set(masses)
+    assert patchwork
+    assert cp1252
+
+
+def test_archives() -> None:
+    """
+    Writes a generated corpus to in-memory ZIP and TAR archives and compares the content.
+    """
+    corpus = memory_corpus(20, seed=3)
+    zip_buffer = io.BytesIO()
+    write_archive(zip_buffer, 20, seed=3, fmt='zip')
+    with zipfile.ZipFile(zip_buffer) as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == corpus
+    tar_buffer = io.BytesIO()
+    write_archive(tar_buffer, 20, seed=3, fmt='tar')
+    tar_buffer.seek(0)
+    with tarfile.open(fileobj=tar_buffer) as tf:
+        content = {}
+        for member in tf.getmembers():
+            f = tf.extractfile(member)
+            assert f is not None
+            content[member.name] = f.read()
+        assert content == corpus
@@ -0,0 +1,114 @@
+import copy
+import json
+import pickle
+import re
+import tempfile
+from pathlib import Path
+import pytest
+from mtf2json.mtf2json import read_mtf, to_json, chassis_layouts
+from mtf2json.batch import convert_dir
+from mtf2json.validate import validate_mech, check_mech, ValidationError
+from benchmarks.synth import write_dir
+
+
+atlas = read_mtf(Path('tests/mtf/biped/Atlas_AS7-K.mtf'))
+
+
+def test_fixtures() -> None:
+    for mtf_file in Path('tests/mtf').rglob('*.mtf'):
+        assert validate_mech(read_mtf(mtf_file)) == [], mtf_file
+    # embedded hashes and JSON round trips are valid too
+    assert validate_mech(json.loads(to_json(atlas, embed_hash=True))) == []
+
+
+def test_structure_errors() -> None:
+    data = copy.deepcopy(atlas)
+    del data['chassis']
+    data['mass'] = '100'
+    data['quirks'] = ['stable', 1]
+    data['walk_mp'] = True
+    data['armor']['head'] = {'pip': 9}
+    data['critical_slots']['head']['1'] = 5
+    data['weapons']['1']['ISGaussRifle']['location'] = None
+    data['unknown'] = [1]
+    assert sorted(validate_mech(data)) == sorted([
+        "chassis: missing",
+        "mass: expected int, got str",
+        "quirks[1]: expected str, got int",
+        "walk_mp: expected int, got bool",
+        "armor.head.pips: missing",
+        "armor.head.pip: unexpected key",
+        "critical_slots.head.1: expected str or null, got int",
+        "weapons.1.ISGaussRifle.location: expected str, got NoneType",
+        "unknown: expected str or int, got list",
+    ])
+
+
+def test_layout_errors() -> None:
+    data = copy.deepcopy(atlas)
+    data['armor']['head']['pips'] = 10
+    data['armor']['center_torso']['rear']['pips'] = 20
+    data['armor']['left_arm']['pips'] = -1
+    data['structure']['left_leg']['pips'] = 20
+    data['weapons']['1']['ISGaussRifle']['location'] = 'front_left_leg'
+    data['critical_slots']['tail'] = {'1': None}
+    data['critical_slots']['head'].update({'11': 'ISGaussRifle', '12': 'ISGaussRifle'})
+    assert sorted(validate_mech(data)) == sorted([
+        "armor.head: 10 pips exceed the maximum of 9",
+        "armor.center_torso: 67 pips exceed the maximum of 62",
+        "armor.left_arm.pips: negative value -1",
+        "structure.left_leg.pips: expected 21, got 20",
+        "weapons.1.ISGaussRifle.location: invalid location 'front_left_leg'",
+        "critical_slots.tail: invalid location for Biped",
+        "critical_slots.head: 7 filled slots exceed the 6 slots",
+    ])
+    data['mass'] = 102
+    assert validate_mech(data) == ["mass: unsupported value 102"]
+    data['config'] = 'Wheeled'
+    assert validate_mech(data) == ["config: unsupported chassis type 'Wheeled'"]
+
+
+def test_superheavy() -> None:
+    """
+    Superheavy mechs have 4 head structure pips, i.e. up to 12 head armor pips.
+    """
+    data = copy.deepcopy(atlas)
+    data['mass'] = 150
+    layout = chassis_layouts['Biped']
+    for location, pips in zip(layout.locations, layout.structure_pips[150 // 5] or ()):
+        data['structure'][location]['pips'] = pips
+    data['armor']['head']['pips'] = 12
+    assert validate_mech(data) == []
+    data['armor']['head']['pips'] = 13
+    assert validate_mech(data) == ["armor.head: 13 pips exceed the maximum of 12"]
+
+
+def test_check_mech() -> None:
+    check_mech(atlas)
+    data = copy.deepcopy(atlas)
+    data['mass'] = None
+    data['era'] = None
+    with pytest.raises(ValidationError) as e:
+        check_mech(data)
+    assert e.value.errors == ["era: expected int, got NoneType", "mass: expected int, got NoneType"]
+    assert str(e.value) == "Invalid JSON data: era: expected int, got NoneType (and 1 more)"
+    assert pickle.loads(pickle.dumps(e.value)).errors == e.value.errors
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_convert_dir_validate(processes: int) -> None:
+    """
+    Every 4th synthetic mech gets too much head armor, i.e. it's invalid.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        for mtf_file in write_dir(tmp / 'mtf', 20, seed=3)[::4]:
+            mtf_file.write_bytes(re.sub(rb'(?i)(HD armor:(?:[^:\r\n]*:)?)\d+', rb'\g<1>99', mtf_file.read_bytes()))
+        num_valid = sum(1 for mtf_file in (tmp / 'mtf').rglob('*.mtf') if not validate_mech(read_mtf(mtf_file)))
+        assert num_valid == 15
+        assert convert_dir(tmp / 'mtf', tmp / 'json', ignore_errors=True, validate=True, processes=processes,
+                           report=tmp / 'report.json') == 1
+        report = json.loads((tmp / 'report.json').read_text())
+        assert report['num_success'] == num_valid == len(list((tmp / 'json').rglob('*.json')))
+        errors = [r['error'] for r in report['files'].values() if r['status'] == 'failed']
+        assert all(e.startswith("Invalid JSON data: armor.") for e in errors)
@@ -0,0 +1,25 @@
+import pytest
+from benchmarks.bench_linear import cases, call_ratio, scaling_ratio
+
+
+@pytest.mark.parametrize('case', list(cases))
+def test_linear_calls(case: str) -> None:
+    """
+    Converts MTF files with adversarial lines of 64 KiB and 1 MiB and checks that the nr.
+    of function calls scales (at most) linearly with the line length (deterministic supplement
+    of 'test_linear_scaling()', each builtin call counts once).
+    """
+    ratio = call_ratio(case, 64 * 1024, factor=16)
+    assert ratio <= 16, f"Function calls of case '{case}' don't scale linearly (ratio {ratio:.1f})"
+
+
+@pytest.mark.parametrize('case', list(cases))
+def test_linear_scaling(case: str) -> None:
+    """
+    Checks that the conversion time scales (roughly) linearly with the line length, including
+    the work inside builtin calls (e.g. a quadratic 'str.find()' loop). The bound is generous
+    (the time per byte may grow by 2.5x) to allow for timing noise, quadratic scaling results
+    in a ratio of ~256.
+    """
+    ratio = scaling_ratio(case, 64 * 1024, factor=16, repeat=5)
+    assert ratio < 40, f"Conversion time of case '{case}' does not scale linearly (ratio {ratio:.1f})"